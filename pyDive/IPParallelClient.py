@@ -29,6 +29,14 @@ import sys
 view = None
 #: number of processes per node
 ppn = None
+#: host name of each :term:`engine`
+hostnames = None
+#: MPI rank of each :term:`engine`
+target2rank = None
+#: remote variables of garbage collected objects which are not yet deleted, mapped to their target ranks
+free_list = {}
+#: number of dead remote variables collected before they are deleted in a single call
+free_threshold = 64
 
 def init(profile='mpi'):
     """Initialize pyDive.
@@ -38,6 +46,7 @@ def init(profile='mpi'):
     """
     # init direct view
     global view
+    free_list.clear()
 
     client = Client(profile=profile)
     client.clear()
@@ -53,7 +62,10 @@ def init(profile='mpi'):
         os.environ["onTarget"] = 'True'
         from pyDive import structured
         from pyDive import algorithm
+        from pyDive import sorting
         from pyDive.distribution import interengine
+        from pyDive.distribution import expression
+        from pyDive.distribution import shm
         try:
             import pyDive.arrays.local.h5_ndarray
         except ImportError:
@@ -73,6 +85,7 @@ def init(profile='mpi'):
     def hostname():
         import socket
         return socket.gethostname()
+    global hostnames
     hostnames = view.apply(interactive(hostname))
     global ppn
     ppn = max(Counter(hostnames).values())
@@ -81,6 +94,8 @@ def init(profile='mpi'):
     get_rank = interactive(lambda: MPI.COMM_WORLD.Get_rank())
     all_ranks = view.apply(get_rank)
     view['target2rank'] = all_ranks
+    global target2rank
+    target2rank = all_ranks
 
 def getView():
     global view
@@ -91,3 +106,37 @@ def getPPN():
     global ppn
     assert ppn is not None, "pyDive.init() has not been called yet."
     return ppn
+
+def free(name, targets):
+    """Schedule the deletion of the remote variable *name*. Deletions are deferred and issued together
+    with the next array creation or in a single call as soon as :obj:`free_threshold` variables are collected.
+
+    :param str name: name of the remote variable
+    :param ints targets: :term:`engine` ranks holding the variable
+    """
+    free_list[name] = targets
+    if len(free_list) >= free_threshold:
+        flush_free_list()
+
+def free_code(targets):
+    """Returns a statement deleting all scheduled remote variables which only exist on *targets* and removes them
+    from :obj:`free_list`. Prepend it to the next command sent to *targets*. Returns an empty string if there is
+    nothing to delete.
+    """
+    targets = set(targets)
+    names = [name for name, name_targets in free_list.items() if set(name_targets) <= targets]
+    for name in names:
+        del free_list[name]
+    if not names:
+        return ""
+    return "for _name in %s: globals().pop(_name, None)\n" % repr(names)
+
+def flush_free_list():
+    """Delete all scheduled remote variables (see :func:`free`) immediately."""
+    if view is None or not free_list:
+        return
+    names = free_list.keys()
+    targets = set(target for name_targets in free_list.values() for target in name_targets)
+    free_list.clear()
+    # engines which do not hold a variable just skip it
+    view.execute("for _name in %s: globals().pop(_name, None)" % repr(names), targets=sorted(targets))
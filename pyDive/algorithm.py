@@ -28,10 +28,13 @@ if onTarget == 'False':
     from arrays.h5_ndarray import h5_ndarray
     from cloned_ndarray.cloned_ndarray import cloned_ndarray
     import IPParallelClient as com
-    from IPython.parallel import interactive
     from fragment import fragment, hdd_arraytypes
     from structured import VirtualArrayOfStructs
+    import structured
+    import futures
+    from distribution import kernels
 import numpy as np
+from collections import OrderedDict
 
 def map(f, *arrays, **kwargs):
     """Applies *f* on :term:`engine` on local arrays related to *arrays*.
@@ -104,56 +107,120 @@ def map(f, *arrays, **kwargs):
                     array_names.append(repr(it_other_arrays.next()))
                     continue
 
-            view.apply(interactive(map_wrapper), interactive(f), array_names, **kwargs)
+            kernels.apply(map_wrapper, view.targets, kernels.reference(f, view.targets), array_names, **kwargs)
     else:
         array_names = [repr(a) for a in arrays]
-        view.apply(interactive(map_wrapper), interactive(f), array_names, **kwargs)
+        kernels.apply(map_wrapper, view.targets, kernels.reference(f, view.targets), array_names, **kwargs)
 
     view.targets = tmp_targets # restore target list
+    __modified(arrays)
+
+def __modified(arrays):
+    # *f* may have written to any of *arrays*, so their local copies on the client are outdated
+    for a in arrays:
+        if type(a) == VirtualArrayOfStructs:
+            __modified([leaf for name, leaf in structured.treeItems(a.structOfArrays)])
+        elif hasattr(a, "version"):
+            a.version.increment()
+
+def stencil_map(f, array, *arrays, **kwargs):
+    """Applies *f* on :term:`engine` on the local array of *array* including ghost layers holding the adjacent
+    elements of the neighbouring engines (see :meth:`exchange_halos`), followed by the local arrays of *arrays*.
+    Example: ::
+
+        field = pyDive.array(np.random.rand(256, 256))
+        laplace = pyDive.zeros_like(field)
+
+        def five_point(f, out):
+            out[:] = f[:-2, 1:-1] + f[2:, 1:-1] + f[1:-1, :-2] + f[1:-1, 2:] - 4.0 * f[1:-1, 1:-1]
+
+        pyDive.stencil_map(five_point, field, laplace, periodic=True)
+
+    :param callable f: function to be called on :term:`engine`. Has to accept *numpy-arrays* and *kwargs*
+    :param array: distributed array whose ghost layers are exchanged
+    :param arrays: further distributed arrays, distributed like *array*
+    :param kwargs: user-specified keyword arguments passed to *f*. The keywords *width* (default: 1) and *periodic*
+        (default: ``False``) are reserved, they are passed to :meth:`exchange_halos`.
+    :raises AssertionError: if *arrays* are not distributed like *array*
+    """
+    width = kwargs.pop("width", 1)
+    periodic = kwargs.pop("periodic", False)
+    assert all(a.is_distributed_like(array) for a in arrays), "all arrays have to be distributed like the first one"
+
+    def stencil_wrapper(f, array_name, array_names, **kwargs):
+        f(globals()[array_name + "_ghosts"], *[globals()[name] for name in array_names], **kwargs)
 
-def reduce(array, op):
-    """Perform a tree-like reduction over all axes of *array*.
+    array.exchange_halos(width, periodic)
+    kernels.apply(stencil_wrapper, array.target_ranks, kernels.reference(f, array.target_ranks),\
+        array.name, [repr(a) for a in arrays], **kwargs)
+    __modified(arrays)
+
+def reduce(array, op, axis=None, keepdims=False, allreduce=False):
+    """Perform a tree-like reduction over all axes of *array* or along *axis*.
+    Example: ::
+
+        fieldE = pyDive.ones(shape=[64, 64, 64])
+
+        plane = pyDive.reduce(fieldE, np.add, axis=2) # distributed 64x64-array
+        line = pyDive.reduce(fieldE, np.add, axis=(1,2)) # distributed 64-array
 
     :param array: *pyDive.ndarray*, *pyDive.h5_ndarray* or *pyDive.cloned_ndarray* to be reduced
     :param numpy-ufunc op: reduce operation, e.g. *numpy.add*.
+    :param ints axis: axis or axes along which the reduction is performed. Defaults to ``None`` meaning all axes.
+    :param bool keepdims: if ``True`` the reduced axes are kept with size one.
+    :param bool allreduce: if ``True`` the result of a reduction over all axes is kept on all :term:`engines <engine>`
+        of *array* instead of being sent to the client.
+    :return: Reduction over all axes: scalar or, if *allreduce* is set, *pyDive.cloned_ndarray* holding the scalar.
+        Reduction along *axis*: distributed array, distributed like *array*
+        on the remaining axes, or a numpy-array if no distributed axis remains.
+
+    The local arrays are reduced on each :term:`engine` first. In a reduction over all axes the partial results
+    are then combined by MPI, first among the engines of each cluster node, then across the nodes, so that only
+    the final value reaches the client (see :func:`__reduce_mpi`).
+    Along a distributed axis the partial results are combined in a binary tree by MPI so that only engines
+    holding the final result take part in the result array.
 
     If the hdf5 data exceeds the memory limit (currently 25% of the combined main memory of all cluster nodes)\
-    the data will be read block-wise so that a block fits into memory.
+    the data will be read block-wise so that a block fits into memory. Reductions along *axis* are not available
+    for hdf5 data.
+
+    Within :func:`pyDive.futures.nonblocking` a :class:`pyDive.futures.Future` of the result is returned.
     """
-    def reduce_wrapper(array_name, op_name):
+    if axis is not None:
+        assert not allreduce, "allreduce is available for reductions over all axes only"
+        return __reduce_axes(array, op, axis, keepdims)
+    if keepdims:
+        result = reduce(array, op)
+        shape = (1,) * len(array.shape)
+        if not com.getView().block:
+            return futures.Future(result.async_results, lambda: np.reshape(result.result(), shape))
+        return np.reshape(result, shape)
+
+    def reduce_wrapper(array_name, op_name, accumulator, combine):
         array = globals()[array_name]
         op =  eval("np." + op_name)
-        return algorithm.__tree_reduce(array, axis=None, op=op) # reduction over all axes
+        result = algorithm.__tree_reduce(array, axis=None, op=op) # reduction over all axes
+        return algorithm.__reduce_partial(globals(), result, op_name, accumulator, combine)
 
     view = com.getView()
 
-    tmp_targets = view.targets # save current target list
     if type(array) == VirtualArrayOfStructs:
-        view.targets = array.firstArray.target_ranks
+        targets = array.firstArray.target_ranks
     else:
-        view.targets = array.target_ranks
-
-    result = None
+        targets = array.target_ranks
+    accumulator, combine, result = __reduction(targets, allreduce)
 
     if (hasattr(array, "arraytype") and array.arraytype in hdd_arraytypes) or type(array) in hdd_arraytypes:
+        # partial results of the fragments are accumulated on the engines
         for chunk in fragment(array):
-            array_name = repr(chunk)
-
-            targets_results = view.apply(interactive(reduce_wrapper), array_name, op.__name__)
-            chunk_result = op.reduce(targets_results) # reduce over targets' results
-
-            if result is None:
-                result = chunk_result
-            else:
-                result = op(result, chunk_result)
+            kernels.apply(reduce_wrapper, targets, repr(chunk), op.__name__, accumulator, None)
+        targets_results = kernels.apply(__combine_wrapper, targets, accumulator, op.__name__, combine)
     else:
-        array_name = repr(array)
+        targets_results = kernels.apply(reduce_wrapper, targets, repr(array), op.__name__, None, combine)
 
-        targets_results = view.apply(interactive(reduce_wrapper), array_name, op.__name__)
-        result = op.reduce(targets_results) # reduce over targets' results
-
-    view.targets = tmp_targets # restore target list
-    return result
+    if not view.block:
+        return futures.Future([targets_results], lambda: __finish_reduction(targets_results.get(), result))
+    return __finish_reduction(targets_results, result)
 
 def mapReduce(map_func, reduce_op, *arrays, **kwargs):
     """Applies *map_func* on :term:`engine` on local arrays related to *arrays*
@@ -168,31 +235,34 @@ def mapReduce(map_func, reduce_op, *arrays, **kwargs):
     :param callable f: function to be called on :term:`engine`. Has to accept *numpy-arrays* and *kwargs*
     :param numpy-ufunc reduce_op: reduce operation, e.g. *numpy.add*.
     :param arrays: list of arrays including *pyDive.ndarrays*, *pyDive.h5_ndarrays* or *pyDive.cloned_ndarrays*
-    :param kwargs: user-specified keyword arguments passed to *f*
+    :param kwargs: user-specified keyword arguments passed to *f*. The keyword *allreduce* is reserved:
+        if ``True`` the result is kept on all :term:`engines <engine>` as a *pyDive.cloned_ndarray*
+        instead of being sent to the client (see :func:`reduce`).
     :raises AssertionError: if the *shapes* of *pyDive.ndarrays* and *pyDive.h5_ndarrays* do not match
     :raises AssertionError: if the *distaxes* attributes of *pyDive.ndarrays* and *pyDive.h5_ndarrays* do not match
 
     Notes:
         - If the hdf5 data exceeds the memory limit (currently 25% of the combined main memory of all cluster nodes)\
             the data will be read block-wise so that a block fits into memory.
+        - The results of *map_func* are combined on the engines by MPI, only the final value reaches the client.
         - *mapReduce* chooses the list of *engines* from the **first** element of *arrays*. On these engines the mapReduce will be executed.\
             If the first array is a *pyDive.h5_ndarray* all engines will be used.
         - *mapReduce* is not writing data back to a *pyDive.h5_ndarray* yet.
         - *mapReduce* does not equalize the element distribution of *pyDive.ndarrays* before execution.
     """
-    def mapReduce_wrapper(map_func, reduce_op_name, array_names, **kwargs):
+    def mapReduce_wrapper(map_func, reduce_op_name, array_names, accumulator, combine, **kwargs):
         arrays = [globals()[array_name] for array_name in array_names]
         reduce_op =  eval("np." + reduce_op_name)
-        return algorithm.__tree_reduce(map_func(*arrays, **kwargs), axis=None, op=reduce_op)
+        result = algorithm.__tree_reduce(map_func(*arrays, **kwargs), axis=None, op=reduce_op)
+        return algorithm.__reduce_partial(globals(), result, reduce_op_name, accumulator, combine)
 
+    allreduce = kwargs.pop("allreduce", False)
     view = com.getView()
-    tmp_targets = view.targets # save current target list
     if type(arrays[0]) == VirtualArrayOfStructs:
-        view.targets = arrays[0].firstArray.target_ranks
+        targets = arrays[0].firstArray.target_ranks
     else:
-        view.targets = arrays[0].target_ranks
-
-    result = None
+        targets = arrays[0].target_ranks
+    accumulator, combine, result = __reduction(targets, allreduce)
 
     hdd_arrays = [a for a in arrays if (hasattr(a, "arraytype") and a.arraytype in hdd_arraytypes) or type(a) in hdd_arraytypes]
     if hdd_arrays:
@@ -215,46 +285,434 @@ def mapReduce(map_func, reduce_op, *arrays, **kwargs):
                     array_names.append(repr(it_other_arrays.next()))
                     continue
 
-            targets_results = view.apply(interactive(mapReduce_wrapper),\
-                interactive(map_func), reduce_op.__name__, array_names, **kwargs)
-
-            fragment_result = reduce_op.reduce(targets_results) # reduce over targets' results
-            if result is None:
-                result = fragment_result
-            else:
-                result = reduce_op(result, fragment_result)
+            # partial results of the fragments are accumulated on the engines
+            kernels.apply(mapReduce_wrapper, targets, kernels.reference(map_func, targets),\
+                reduce_op.__name__, array_names, accumulator, None, **kwargs)
+        targets_results = kernels.apply(__combine_wrapper, targets, accumulator, reduce_op.__name__, combine)
     else:
         array_names = [repr(a) for a in arrays]
-        targets_results = view.apply(interactive(mapReduce_wrapper),\
-            interactive(map_func), reduce_op.__name__, array_names, **kwargs)
+        targets_results = kernels.apply(mapReduce_wrapper, targets, kernels.reference(map_func, targets),\
+            reduce_op.__name__, array_names, None, combine, **kwargs)
+
+    if not view.block:
+        return futures.Future([targets_results], lambda: __finish_reduction(targets_results.get(), result))
+    return __finish_reduction(targets_results, result)
+
+def histogram(a, bins=10, range=None, weights=None, density=False, allreduce=False):
+    """Computes the histogram of *a* like *numpy.histogram*. Each :term:`engine` bins its local elements,
+    the bin counts are summed up by MPI (see :func:`reduce`). Example: ::
+
+        fieldE = pyDive.h5.open(filename, "fields/E/x")
+        counts, edges = pyDive.histogram(fieldE, bins=100) # streamed through pyDive.fragment
+
+    :param a: *pyDive.ndarray*, *pyDive.h5_ndarray* or a structured array with a single leaf
+    :param bins: number of equal-width bins or the bin edges
+    :param (float, float) range: lower and upper edge of the bins. Defaults to the minimum and maximum of *a*,
+        which are determined in a preceding pass over the data.
+    :param weights: array of the same shape as *a* holding a weight per element
+    :param bool density: if ``True`` the result is normalized to a probability density
+    :param bool allreduce: if ``True`` the bin counts are kept on all :term:`engines <engine>` as
+        a *pyDive.cloned_ndarray* instead of being sent to the client.
+    :return: tuple of bin counts and bin edges
+    """
+    if type(a) == VirtualArrayOfStructs:
+        assert len(__leaf_paths(a.structOfArrays)) == 1, "structured arrays need a single leaf, use histogramdd instead"
+    else:
+        a = [a]
+    counts, edges = histogramdd(a, bins=[bins],\
+        range=[range] if range is not None else None, weights=weights, density=density, allreduce=allreduce)
+    return counts, edges[0]
+
+def histogramdd(sample, bins=10, range=None, weights=None, density=False, fields=None, allreduce=False):
+    """Computes the multidimensional histogram of *sample* like *numpy.histogramdd*. Each :term:`engine` bins its
+    local elements, the bin counts are summed up by MPI (see :func:`reduce`). Example: ::
+
+        particles = pyDive.h5.open(filename, "particles/e")
+        counts, edges = pyDive.histogramdd(particles, bins=(64, 256), fields=("position/x", "momentum/x"),
+                                           weights="weighting")
+
+    If one of the arrays is stored on hard disk the data is streamed through :func:`pyDive.fragment`.
+
+    :param sample: list of D arrays of equal shape (*pyDive.ndarray* or *pyDive.h5_ndarray*) holding the coordinates
+        of each element or a structured array.
+    :param bins: number of equal-width bins or the bin edges, for all dimensions or for each dimension.
+    :param range: lower and upper edge of the bins for each dimension. A dimension whose range is ``None``
+        is spanned by the minimum and maximum of its coordinate, which are determined in a preceding pass over the data.
+    :param weights: array holding a weight per element or, if *sample* is structured, the path of its leaf.
+    :param bool density: if ``True`` the result is normalized to a probability density
+    :param strs fields: paths of the leaves of a structured *sample* to be binned. Defaults to all leaves
+        in alphabetical order.
+    :param bool allreduce: if ``True`` the bin counts are kept on all :term:`engines <engine>` as
+        a *pyDive.cloned_ndarray* instead of being sent to the client.
+    :return: tuple of bin counts and a list of the bin edges of each dimension
+    """
+    def range_wrapper(array_names, accumulator, combine):
+        samples = algorithm.__local_samples(globals(), array_names)
+        partial = np.array([s.min() if s.size else np.inf for s in samples]\
+            + [-s.max() if s.size else np.inf for s in samples], dtype=np.float64)
+        return algorithm.__reduce_partial(globals(), partial, "minimum", accumulator, combine)
+
+    def histogram_wrapper(array_names, weighted, edges, accumulator, combine):
+        samples = algorithm.__local_samples(globals(), array_names)
+        local_weights = samples.pop() if weighted else None
+        if len(samples) == 1:
+            counts = np.histogram(samples[0], bins=edges[0], weights=local_weights)[0]
+        else:
+            counts = np.histogramdd(samples, bins=edges, weights=local_weights)[0]
+        return algorithm.__reduce_partial(globals(), counts, "add", accumulator, combine)
 
-        result = reduce_op.reduce(targets_results) # reduce over targets' results
+    assert not (density and allreduce), "density is not available for allreduce"
 
-    view.targets = tmp_targets # restore target list
+    if type(sample) == VirtualArrayOfStructs:
+        if fields is None:
+            fields = __leaf_paths(sample.structOfArrays)
+        if type(weights) is str:
+            weights = sample[weights]
+        sample = [sample[field] for field in fields]
+    arrays = list(sample) + ([weights] if weights is not None else [])
+    ndim = len(sample)
+
+    first = arrays[0]
+    assert all(a.shape == first.shape for a in arrays), "all arrays must have the same shape"
+    arrays = [a if a.is_distributed_like(first) else a.dist_like(first) for a in arrays]
+    is_hdd = any(type(a) in hdd_arraytypes for a in arrays)
+
+    view = com.getView()
+    targets = first.target_ranks
+
+    def run(wrapper, arrays, *args):
+        # apply *wrapper* on the local arrays, fragment by fragment if necessary
+        accumulator, combine, result = __reduction(targets, allreduce and wrapper is histogram_wrapper)
+        if is_hdd:
+            for fragments in fragment(*arrays):
+                if len(arrays) == 1:
+                    fragments = [fragments]
+                kernels.apply(wrapper, targets, [repr(f) for f in fragments], *(args + (accumulator, None)))
+            targets_results = kernels.apply(__combine_wrapper, targets, accumulator,\
+                "minimum" if wrapper is range_wrapper else "add", combine)
+        else:
+            targets_results = kernels.apply(wrapper, targets, [repr(a) for a in arrays], *(args + (None, combine)))
+        return targets_results, result
 
+    # bins and ranges of each dimension
+    if type(bins) in (list, tuple) and len(bins) == ndim and np.ndim(bins[0]) <= 1:
+        bins = list(bins)
+    else:
+        bins = [bins] * ndim
+    if range is None:
+        range = [None] * ndim
+    range = list(range)
+
+    if any(r is None for r, b in zip(range, bins) if np.ndim(b) == 0):
+        targets_results, result = run(range_wrapper, arrays[:ndim])
+        if not view.block:
+            targets_results = targets_results.get()
+        extrema = __finish_reduction(targets_results, result)
+        for i in xrange(ndim):
+            if range[i] is None:
+                lower, upper = extrema[i], -extrema[ndim + i]
+                if lower > upper:
+                    # no elements at all
+                    lower, upper = 0.0, 1.0
+                elif lower == upper:
+                    lower, upper = lower - 0.5, upper + 0.5
+                range[i] = (lower, upper)
+
+    edges = [np.asarray(b, dtype=np.float64) if np.ndim(b) == 1 else np.linspace(r[0], r[1], b + 1)\
+        for b, r in zip(bins, range)]
+
+    targets_results, result = run(histogram_wrapper, arrays, weights is not None, edges)
+
+    def finish(targets_results):
+        counts = __finish_reduction(targets_results, result)
+        if density:
+            volumes = np.ones(())
+            for e in edges:
+                volumes = np.multiply.outer(volumes, np.diff(e))
+            counts = counts / (counts.sum() * volumes)
+        return counts, edges
+
+    if not view.block:
+        return futures.Future([targets_results], lambda: finish(targets_results.get()))
+    return finish(targets_results)
+
+def __leaf_paths(tree, prefix=""):
+    # paths of all leaves of a tree of arrays in alphabetical order
+    paths = []
+    for key in sorted(tree):
+        if type(tree[key]) is dict:
+            paths += __leaf_paths(tree[key], prefix + key + "/")
+        else:
+            paths.append(prefix + key)
+    return paths
+
+def __local_samples(namespace, array_names):
+    # flattened local arrays, loaded from disk if necessary. Engines without a local array get empty ones.
+    samples = []
+    for array_name in array_names:
+        local_array = namespace.get(array_name, np.empty(0))
+        if hasattr(local_array, "load"):
+            local_array = local_array.load()
+        samples.append(np.ravel(local_array))
+    return samples
+
+def __reduce_axes(array, op, axes, keepdims):
+    # reduce *array* along each of *axes*, beginning with the last one
+    assert hasattr(array, "distaxes") and not type(array) in hdd_arraytypes,\
+        "reduction along an axis requires a distributed array in memory"
+    if type(axes) not in (list, tuple):
+        axes = (axes,)
+    axes = sorted(set((axis + len(array.shape)) % len(array.shape) for axis in axes))[::-1]
+
+    result = array
+    for axis in axes:
+        result = __reduce_axis(result, op, axis, keepdims)
+
+    if result.distaxes:
+        return result
+
+    # no distributed axis left
+    view = com.getView()
+    local_result = view.pull(result.name, targets=result.target_ranks[0])
+    finish = lambda local_result: local_result[()] if not result.shape else local_result
+    if not view.block:
+        return futures.Future([local_result], lambda: finish(local_result.get()))
+    return finish(local_result)
+
+def __reduce_axis(array, op, axis, keepdims):
+    def reduce_axis_wrapper(array_name, result_name, op_name, axis, keepdims, groups):
+        result = algorithm.__tree_reduce_axis_mpi(globals()[array_name], getattr(np, op_name), axis, keepdims,\
+            groups[MPI.COMM_WORLD.Get_rank()])
+        if result is not None:
+            globals()[result_name] = result
+
+    # engines sharing the coordinates of all distributed axes but *axis* form a group.
+    # Groups are ordered like *target_ranks*, engines within a group are ordered along *axis*.
+    groups = OrderedDict()
+    num_targets = [len(target_offsets_axis) for target_offsets_axis in array.target_offsets]
+    for target, rank_idx_vector in zip(array.target_ranks, np.ndindex(*num_targets)):
+        if axis in array.distaxes:
+            i = array.distaxes.index(axis)
+            rank_idx_vector = rank_idx_vector[:i] + rank_idx_vector[i+1:]
+        groups.setdefault(rank_idx_vector, []).append(target)
+
+    rank_groups = {}
+    for group in groups.values():
+        for target in group:
+            rank_groups[com.target2rank[target]] = [com.target2rank[t] for t in group]
+
+    # properties of the resulting array
+    new_target_ranks = [group[0] for group in groups.values()]
+    new_distaxes = []
+    new_target_offsets = []
+    for distaxis, target_offsets in zip(array.distaxes, array.target_offsets):
+        if distaxis == axis:
+            continue
+        new_distaxes.append(distaxis if keepdims or distaxis < axis else distaxis - 1)
+        new_target_offsets.append(target_offsets)
+    new_shape = list(array.shape)
+    if keepdims:
+        new_shape[axis] = 1
+    else:
+        del new_shape[axis]
+    dtype = op.reduce(np.zeros(1, dtype=array.dtype)).dtype
+
+    result = array.__class__(new_shape, dtype, new_distaxes, new_target_offsets, new_target_ranks,\
+        no_allocation=True, **array.kwargs)
+    kernels.apply(reduce_axis_wrapper, array.target_ranks, array.name, result.name, op.__name__, axis, keepdims, rank_groups)
     return result
 
-def __tree_reduce(array, axis=None, op=np.add):
-    # reduce all axes
-    if axis is None:
-        result = array
-        for axis in range(len(array.shape))[::-1]:
-            result = __tree_reduce(result, axis=axis, op=op)
+#: maps the name of a numpy-ufunc to the name of the equivalent MPI operation and the dtype kinds MPI supports it for.
+#: Partial results of other ufuncs or dtypes are combined by pickling.
+mpi_ops = {"add" : ("SUM", "iufc"), "multiply" : ("PROD", "iufc"), "maximum" : ("MAX", "iuf"), "minimum" : ("MIN", "iuf"),
+    "logical_and" : ("LAND", "biu"), "logical_or" : ("LOR", "biu"), "logical_xor" : ("LXOR", "biu"),
+    "bitwise_and" : ("BAND", "iu"), "bitwise_or" : ("BOR", "iu"), "bitwise_xor" : ("BXOR", "iu")}
+
+reduction_id = 0
+
+def __reduction(targets, allreduce):
+    # Returns the engine variable accumulating the partial results of fragments, the arguments of
+    # the final combination by MPI and the cloned array receiving the result of an allreduce.
+    global reduction_id
+    reduction_id += 1
+    result = cloned_ndarray([], None, list(targets), True) if allreduce else None
+    ranks = [com.target2rank[target] for target in targets]
+    return "reduce_partial%d" % reduction_id, (ranks, allreduce, repr(result)), result
+
+def __combine_wrapper(accumulator, op_name, combine):
+    return algorithm.__combine_mpi(globals(), globals().pop(accumulator), op_name, *combine)
+
+def __finish_reduction(targets_results, result):
+    # client-side result of a reduction whose partial results have been combined on the engines
+    if result is None:
+        value = targets_results[0]
+        return value[()] if np.ndim(value) == 0 else value
+    result.shape, result.dtype = list(targets_results[0][0]), targets_results[0][1]
+    result.nbytes = np.dtype(result.dtype).itemsize * np.prod(result.shape)
+    return result
+
+def __reduce_partial(namespace, partial, op_name, accumulator, combine):
+    # Adds the partial result of a fragment to *namespace[accumulator]* or, if *accumulator* is None,
+    # combines the partial results of all engines by MPI.
+    if accumulator is None:
+        return __combine_mpi(namespace, partial, op_name, *combine)
+    if accumulator in namespace:
+        partial = getattr(np, op_name)(namespace[accumulator], partial)
+    namespace[accumulator] = partial
+
+def __combine_mpi(namespace, partial, op_name, ranks, allreduce, result_name):
+    result = __reduce_mpi(partial, op_name, ranks, allreduce)
+    if not allreduce:
         return result
+    namespace[result_name] = result
+    return result.shape, result.dtype
+
+# communicators of reduction groups, keyed by the engine's and the group's MPI ranks
+reduce_comms = {}
+
+def __reduce_comms(ranks):
+    # Returns the communicator of the engines of *ranks* sharing the node with this engine and the communicator
+    # of the first engines of all nodes (COMM_NULL on all other engines). The first engine of *ranks* has rank 0
+    # in both.
+    from mpi4py import MPI
+    comm = MPI.COMM_WORLD
+    key = (comm.Get_rank(), tuple(ranks))
+    if key not in reduce_comms:
+        group_comm = comm.Create_group(comm.Get_group().Incl(ranks))
+        node_comm = group_comm.Split_type(MPI.COMM_TYPE_SHARED)
+        leader_comm = group_comm.Split(0 if node_comm.Get_rank() == 0 else MPI.UNDEFINED)
+        reduce_comms[key] = (node_comm, leader_comm)
+    return reduce_comms[key]
+
+def __reduce_mpi(value, op_name, ranks, allreduce):
+    # Combine the partial results *value* of the engines *ranks* (MPI ranks) within each node first,
+    # then across the nodes. The result is returned on the first engine of *ranks*, None on all others.
+    # If *allreduce* the result is returned on all engines.
+    from mpi4py import MPI
+    node_comm, leader_comm = __reduce_comms(ranks)
+    is_leader = leader_comm != MPI.COMM_NULL
+    op = getattr(np, op_name)
+    result = np.array(value)
+
+    mpi_op, kinds = mpi_ops.get(op_name, (None, ""))
+    if result.dtype.kind in kinds:
+        mpi_op = getattr(MPI, mpi_op)
+        node_comm.Reduce(MPI.IN_PLACE if node_comm.Get_rank() == 0 else result, result, op=mpi_op, root=0)
+        if is_leader and allreduce:
+            leader_comm.Allreduce(MPI.IN_PLACE, result, op=mpi_op)
+        elif is_leader:
+            leader_comm.Reduce(MPI.IN_PLACE if leader_comm.Get_rank() == 0 else result, result, op=mpi_op, root=0)
+        if allreduce:
+            node_comm.Bcast(result, root=0)
+    else:
+        for comm in (node_comm, leader_comm if is_leader else None):
+            if comm is None:
+                continue
+            partials = comm.gather(result, root=0)
+            if partials is not None:
+                result = __combine(partials, op)
+        if allreduce:
+            if is_leader:
+                result = leader_comm.bcast(result, root=0)
+            result = node_comm.bcast(result, root=0)
+
+    if allreduce or MPI.COMM_WORLD.Get_rank() == ranks[0]:
+        return result
+    return None
+
+def __combine(values, op):
+    result = values[0]
+    for value in values[1:]:
+        result = op(result, value)
+    return result
 
-    assert 0 <= axis and axis < len(array.shape)
-    result = np.rollaxis(array, axis)
+#: MPI tag of the messages combining partial results of a reduction along an axis
+reduce_tag = 32766
+
+def __tree_reduce_axis_mpi(array, op, axis, keepdims, group):
+    # Reduce the local *array* along *axis* and combine the partial results of the engines in *group*
+    # (MPI ranks) in a binary tree. The result is returned on the first engine of *group*, None on all others.
+    from mpi4py import MPI
+    comm = MPI.COMM_WORLD
+
+    result = np.asarray(__tree_reduce(array, axis=axis, op=op))
+    if keepdims:
+        result = np.expand_dims(result, axis)
+    if not result.flags.c_contiguous:
+        result = result.copy()
+
+    idx = group.index(comm.Get_rank())
+    step = 1
+    while step < len(group):
+        if idx % (2 * step):
+            comm.Send(result, dest=group[idx - step], tag=reduce_tag)
+            return None
+        if idx + step < len(group):
+            partial = np.empty_like(result)
+            comm.Recv(partial, source=group[idx + step], tag=reduce_tag)
+            op(result, partial, out=result)
+        step *= 2
+    return result
 
-    while True:
-        l = result.shape[0]
+#: number of bytes of the local array which are reduced at once by numpy within :func:`__tree_reduce`
+reduce_block_bytes = 2**18
+#: maximum number of elements along the reduction axis which are reduced at once by numpy.
+#: The partial results of these blocks are combined pairwise.
+reduce_block_length = 8192
 
-        # if axis is small enough to neglect rounding errors do a faster numpy-reduce
-        if l < 10000:
-            return op.reduce(result, axis=0)
+def __tree_reduce(array, axis=None, op=np.add, out=None):
+    # Pairwise reduction of *array* along *axis* (all axes if None) into *out*.
+    # The axis is processed in blocks which fit into the cache and are reduced by numpy. The partial results
+    # of the blocks are combined pairwise, like the digits of a binary counter, within a fixed set of
+    # buffers of the result's size. Thus the data is read only once and no temporaries of the size of *array*
+    # are created while the rounding error grows with the logarithm of the axis length only.
+    array = np.asarray(array)
 
-        if l % 2 == 0:
-            result = op(result[0:l/2], result[l/2:])
-        else:
-            tmp = result[-1]
-            result = op(result[0:l/2], result[l/2:-1])
-            result[0] = op(result[0], tmp)
+    # reduce all axes
+    if axis is None:
+        if array.ndim == 0:
+            return array
+        if array.flags.c_contiguous:
+            return __tree_reduce(array.reshape(-1), axis=0, op=op, out=out)
+        result = array
+        for axis in range(array.ndim)[::-1]:
+            result = __tree_reduce(result, axis=axis, op=op, out=out if axis == 0 else None)
+        return result
+
+    assert 0 <= axis and axis < array.ndim
+    rows = np.rollaxis(array, axis)
+    length = rows.shape[0]
+    row_bytes = array.itemsize * int(np.prod(rows.shape[1:]))
+    block_length = int(min(reduce_block_length, max(1, reduce_block_bytes // max(1, row_bytes))))
+
+    if length <= block_length:
+        return op.reduce(rows, axis=0, out=out)
+
+    first = np.asarray(op.reduce(rows[:block_length], axis=0))
+    spare = [first] # unused buffers
+    stack = [] # pairs of level and partial result. A partial result of level n covers 2**n blocks.
+    for begin in range(0, length, block_length):
+        partial = spare.pop() if spare else np.empty_like(first)
+        if begin > 0:
+            op.reduce(rows[begin:begin+block_length], axis=0, out=partial)
+
+        level = 0
+        while stack and stack[-1][0] == level:
+            previous = stack.pop()[1]
+            op(previous, partial, out=previous)
+            spare.append(partial)
+            partial = previous
+            level += 1
+        stack.append((level, partial))
+
+    # combine the remaining partial results, beginning with the smallest
+    result = stack.pop()[1]
+    while stack:
+        previous = stack.pop()[1]
+        op(previous, result, out=previous)
+        result = previous
+
+    if out is not None:
+        out[...] = result
+        return out
+    return result[()] if result.ndim == 0 else result
@@ -31,26 +31,28 @@ factories.update(multiple_axes.generate_factories_like(ndarray, ("empty_like", "
 
 globals().update(factories)
 
-def array(array_like, distaxes='all'):
+def array(array_like, distaxes='all', planner=None):
     """Create a pyDive.ndarray instance from an array-like object.
 
     :param array_like: Any object exposing the array interface, e.g. numpy-array, python sequence, ...
     :param ints distaxes: distributed axes. Defaults to 'all' meaning each axis is distributed.
+    :param planner: planner of the engine grid (see :mod:`pyDive.distribution.decomposition`)
     """
     np_array = np.array(array_like)
-    result = empty(np_array.shape, np_array.dtype, distaxes)
+    result = empty(np_array.shape, np_array.dtype, distaxes, planner=planner)
     result[:] = np_array
     return result
 
-def hollow(shape, dtype=np.float, distaxes='all'):
+def hollow(shape, dtype=np.float, distaxes='all', planner=None):
     """Create a pyDive.ndarray instance distributed across all engines without allocating a local
     numpy-array.
 
     :param ints shape: shape of array
     :param dtype: datatype of a single element
     :param ints distaxes: distributed axes. Defaults to 'all' meaning each axis is distributed.
+    :param planner: planner of the engine grid (see :mod:`pyDive.distribution.decomposition`)
     """
-    return ndarray(shape, dtype, distaxes, None, None, True)
+    return ndarray(shape, dtype, distaxes, None, None, True, planner)
 
 def hollow_like(other):
     """Create a pyDive.ndarray instance with the same
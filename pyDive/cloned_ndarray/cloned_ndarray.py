@@ -21,6 +21,8 @@ If not, see <http://www.gnu.org/licenses/>.
 __doc__ = None
 
 from .. import IPParallelClient as com
+from ..distribution import shm
+from ..distribution import kernels
 import numpy as np
 
 cloned_ndarray_id = 0
@@ -65,10 +67,11 @@ class cloned_ndarray(object):
             self.view.push({self.name : None}, targets=self.target_ranks)
         else:
             self.view.push({'myshape' : self.shape, 'dtype' : self.dtype}, targets=self.target_ranks)
-            self.view.execute('%s = np.empty(myshape, dtype=dtype)' % self.name, targets=self.target_ranks)
+            self.view.execute(com.free_code(self.target_ranks) + '%s = np.empty(myshape, dtype=dtype)' % self.name,\
+                targets=self.target_ranks)
 
     def __del__(self):
-        self.view.execute('del %s' % self.name, targets=self.target_ranks)
+        com.free(self.name, self.target_ranks)
 
     def __repr__(self):
         return self.name
@@ -79,6 +82,17 @@ class cloned_ndarray(object):
             assert isinstance(value, np.ndarray), "assignment available for numpy-arrays only"
 
             view = com.getView()
+            if shm.available(self.target_ranks, value.nbytes):
+                # each engine copies the array from shared memory
+                filename, mapped = shm.create(value.shape, value.dtype)
+                mapped[...] = value
+                try:
+                    kernels.execute("{0} = shm.read(_v[0], _v[1], _v[2])", self.target_ranks,\
+                        (self.name,), (filename, value.dtype, value.shape))
+                finally:
+                    shm.release(filename)
+                return
+
             view.push({'np_array' : value}, targets=self.target_ranks)
             view.execute("%s = np_array.copy()" % self.name, targets=self.target_ranks)
 
@@ -117,9 +131,9 @@ class cloned_ndarray(object):
         :param op: Merging operation. Expects two numpy-arrays and returns one.
         :return: merged numpy-array.
         """
-        result = self.view.pull(self.name, targets=self.target_ranks[0])
+        result = self.view.pull(self.name, targets=self.target_ranks[0], block=True)
         for target in self.target_ranks[1:]:
-            result = op(result, self.view.pull(self.name, targets=target))
+            result = op(result, self.view.pull(self.name, targets=target, block=True))
         return result
 
     def sum(self):
@@ -0,0 +1,159 @@
+"""
+Copyright 2015 Heiko Burau
+
+This file is part of pyDive.
+
+pyDive is free software: you can redistribute it and/or modify
+it under the terms of of either the GNU General Public License or
+the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+pyDive is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License and the GNU Lesser General Public License
+for more details.
+
+You should have received a copy of the GNU General Public License
+and the GNU Lesser General Public License along with pyDive.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__doc__=\
+"""Planners for the default decomposition of a distributed array.
+
+A planner chooses the :term:`engine` grid, i.e. the number of engines along each distributed axis, for an array
+whose distribution is not given explicitly. It is called as ``planner(shape, distaxes, num_targets, itemsize)``
+and returns one integer per distributed axis whose product must not exceed *num_targets*.
+
+The planner can be chosen per array by the *planner* keyword of the array factories, e.g. ::
+
+    a = pyDive.zeros((1024, 1024, 16), planner="cubic")
+    print a.grid # number of engines along each distributed axis
+
+The default planner is :func:`cost_model`.
+"""
+
+import numpy as np
+
+#: cost of a halo element relative to the cost of an inner element in :func:`cost_model`.
+halo_weight = 1.0
+#: overhead of each contiguous run of memory in bytes in :func:`cost_model`.
+#: Local blocks cut into short runs make copies, halo exchanges and redistributions expensive.
+run_overhead_bytes = 256
+
+def __factorizations(n, k):
+    # all ordered tuples of *k* positive integers whose product is *n*
+    if k == 0:
+        if n == 1:
+            yield ()
+        return
+    for factor in range(1, n+1):
+        if n % factor == 0:
+            for rest in __factorizations(n // factor, k-1):
+                yield (factor,) + rest
+
+def local_shape(shape, distaxes, grid):
+    """Shape of the largest local block if the distributed axes *distaxes* of *shape*
+    are split among *grid* engines each.
+    """
+    localshape = list(shape)
+    for distaxis, num_targets in zip(distaxes, grid):
+        localshape[distaxis] = (shape[distaxis] - 1) / num_targets + 1
+    return localshape
+
+def cost(shape, distaxes, grid, itemsize):
+    """Estimated cost of the engine grid *grid* in units of processing a single element.
+
+    The cost is the sum of three terms:
+
+        - the number of elements of the largest local block. Since all engines wait for the slowest,
+          this accounts for load imbalance as well as for unused engines.
+        - the number of halo elements of the largest block, i.e. the elements at faces towards neighbouring engines,
+          weighted by :obj:`halo_weight`. This is the surface-to-volume term.
+        - the number of contiguous runs of memory the largest block consists of within the global array,
+          weighted by :obj:`run_overhead_bytes` / *itemsize*. This favors long last axes.
+    """
+    localshape = local_shape(shape, distaxes, grid)
+    volume = float(np.prod(localshape))
+    if volume == 0:
+        return 0.0
+
+    surface = 0.0
+    for distaxis, n in zip(distaxes, grid):
+        if n > 1:
+            surface += 2 * volume / localshape[distaxis]
+
+    # elements of a contiguous run: trailing axes up to and including the last split axis
+    run_length = 1
+    for axis in range(len(shape))[::-1]:
+        run_length *= localshape[axis]
+        if localshape[axis] != shape[axis]:
+            break
+    runs = volume / run_length
+
+    return volume + halo_weight * surface + run_overhead_bytes / float(itemsize) * runs
+
+def cost_model(shape, distaxes, num_targets, itemsize=8):
+    """Chooses the engine grid of minimal :func:`cost` among all factorizations of *num_targets*.
+    On equal cost earlier axes are split first.
+    """
+    if not distaxes:
+        return ()
+    candidates = __factorizations(num_targets, len(distaxes))
+    return min(candidates, key=lambda grid: (cost(shape, distaxes, grid, itemsize), grid[::-1]))
+
+def cubic(shape, distaxes, num_targets, itemsize=8):
+    """Assigns the prime factors of *num_targets* to the distributed axes so that the local blocks
+    come close to cubes. This was the default decomposition of pyDive up to version 1.2.2.
+    """
+    if not distaxes:
+        return ()
+    # create hypothetical patch with best surface-to-volume ratio
+    patch_volume = np.prod([shape[distaxis] for distaxis in distaxes]) / float(num_targets)
+    patch_edge_length = pow(patch_volume, 1.0/len(distaxes))
+
+    def factorize(n):
+        if n == 1: yield 1; return
+        for f in range(2,n//2+1) + [n]:
+            while n%f == 0:
+                n //= f
+                yield f
+    prime_factors = list(factorize(num_targets))[::-1] # get prime factors of number of engines in descending order
+    sorted_distaxes = sorted(distaxes, key=lambda axis: shape[axis]) # sort distributed axes in ascending order
+    # calculate number of available targets (engines) per distributed axis
+    # This value should be close to array_edge_length / patch_edge_length
+    num_targets_av = [1] * len(shape)
+
+    for distaxis in sorted_distaxes[:-1]:
+        num_patches = shape[distaxis] / patch_edge_length
+        while float(num_targets_av[distaxis]) < num_patches and prime_factors:
+            num_targets_av[distaxis] *= prime_factors.pop()
+    # the largest axis gets the remaining (largest) prime_factors
+    if prime_factors:
+        num_targets_av[sorted_distaxes[-1]] *= np.prod(prime_factors)
+
+    return tuple(num_targets_av[distaxis] for distaxis in distaxes)
+
+#: planners selectable by name
+planners = {"cost" : cost_model, "cubic" : cubic}
+
+#: name of the planner used if none is given explicitly, or a planner itself
+default_planner = "cost"
+
+def plan(shape, distaxes, num_targets, itemsize, planner=None):
+    """Returns the engine grid for an array of *shape* distributed along *distaxes* across at most *num_targets*
+    engines.
+
+    :param planner: name of a planner in :obj:`planners`, a planner itself or ``None`` for :obj:`default_planner`.
+    :return: number of engines along each distributed axis
+    """
+    if planner is None:
+        planner = default_planner
+    if not callable(planner):
+        assert planner in planners, "unknown planner '{0}'. Available: {1}".format(planner, ", ".join(planners))
+        planner = planners[planner]
+    grid = tuple(int(n) for n in planner(shape, distaxes, num_targets, itemsize))
+    assert len(grid) == len(distaxes) and np.prod(grid) <= num_targets,\
+        "invalid engine grid {0} for {1} engines".format(grid, num_targets)
+    return grid
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright 2015 Heiko Burau
+
+This file is part of pyDive.
+
+pyDive is free software: you can redistribute it and/or modify
+it under the terms of of either the GNU General Public License or
+the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+pyDive is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License and the GNU Lesser General Public License
+for more details.
+
+You should have received a copy of the GNU General Public License
+and the GNU Lesser General Public License along with pyDive.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__doc__=\
+"""Lazy evaluation of element-wise expressions.
+
+Within a :func:`lazy` block arithmetic operators and ufuncs on distributed arrays do not touch the
+:term:`engines <engine>`. Instead they build up an :class:`Expression` tree on the client. As soon as the result
+is needed the whole tree is compiled into a single statement which is then evaluated block-wise on each engine,
+so that temporaries never exceed :obj:`block_bytes`. Example: ::
+
+    with pyDive.lazy():
+        e = a * b + c**2 - d  # nothing is sent to the engines yet
+    e = e.evaluate()          # one remote call, no full-size temporaries
+
+    with pyDive.lazy():
+        a[:] = b * c + 1.0    # fused evaluation directly into the memory of *a*
+
+Any operation on an expression involving a distributed array is recorded as well, even outside of
+a :func:`lazy` block. Accessing anything else of an expression evaluates it implicitly.
+
+Note that an expression captures its operands by reference. Modifying an operand before the expression
+is evaluated affects the result.
+"""
+
+import os
+# check whether this code is executed on target or not
+onTarget = os.environ.get("onTarget", 'False')
+if onTarget == 'False':
+    import pyDive.IPParallelClient as com
+import helper
+import numpy as np
+from contextlib import contextmanager
+
+#: maximum number of bytes a single block of an expression's result occupies on an :term:`engine`.
+block_bytes = 2**20
+
+#: ``True`` if operators on distributed arrays are evaluated lazily
+lazy_mode = False
+
+@contextmanager
+def lazy(enable=True):
+    """Context manager turning on lazy evaluation of element-wise operations within its block.
+
+    :param bool enable: ``False`` turns lazy evaluation off within the block.
+    """
+    global lazy_mode
+    previous_mode = lazy_mode
+    lazy_mode = enable
+    try:
+        yield
+    finally:
+        lazy_mode = previous_mode
+
+def set_lazy(enable=True):
+    """Turn lazy evaluation of element-wise operations on or off globally.
+
+    :param bool enable: ``True`` for lazy, ``False`` for immediate evaluation.
+    """
+    global lazy_mode
+    lazy_mode = enable
+
+binary_ops = ["add", "sub", "mul", "floordiv", "div", "truediv", "mod", "pow", "lshift", "rshift", "and", "xor", "or"]
+
+#: special methods which are recorded into an expression instead of being executed
+lazy_ops = ["__" + op + "__" for op in binary_ops] + ["__r" + op + "__" for op in binary_ops]\
+    + ["__i" + op + "__" for op in binary_ops]\
+    + ["__neg__", "__pos__", "__abs__", "__invert__"]\
+    + ["__lt__", "__le__", "__eq__", "__ne__", "__ge__", "__gt__"]
+
+def is_lazy_op(op, args):
+    """Checks whether the operation *op* on *args* has to be recorded instead of being executed."""
+    return op in lazy_ops and (lazy_mode or any(isinstance(arg, Expression) for arg in args))
+
+def dtype_source(dtype):
+    """Source code creating *dtype* on engine or ``None`` for structured datatypes."""
+    dtype = np.dtype(dtype)
+    if dtype.fields is not None:
+        return None
+    return "np.dtype('{0}')".format(dtype.str)
+
+class Expression(object):
+    """Node of a lazily evaluated, element-wise expression on distributed arrays.
+
+    An expression behaves like the distributed array it evaluates to: ``shape`` and ``dtype`` are known
+    without contacting the :term:`engines <engine>`, every other attribute access evaluates the expression
+    and is forwarded to the result.
+    """
+    def __init__(self, op, args, func=None):
+        """Creates a node applying *op* on *args*.
+
+        :param str op: name of a special method of the first operand, e.g. "__add__", or if *func* is given,
+            name of a function on :term:`engine`, e.g. "np.sin".
+        :param args: operands: distributed arrays, expressions or scalars.
+        :param func: client-side counterpart of the function *op*, used for inferring the result's datatype.
+        """
+        self.op = op
+        self.args = tuple(args)
+        self.func = func
+
+        operands = [arg for arg in self.args if isinstance(arg, Expression) or hasattr(arg, "target_ranks")]
+        assert operands, "an expression needs at least one distributed array"
+        first = operands[0]
+        #: distributed array the result is distributed like
+        self.reference = first.reference if isinstance(first, Expression) else first
+        #: shape of the result
+        self.shape = self.reference.shape
+        assert all(operand.shape == self.shape for operand in operands),\
+            "Shapes do not match: " + ", ".join(str(operand.shape) for operand in operands)
+        #: datatype of the result. ``None`` if it cannot be inferred on the client.
+        self.dtype = helper.result_dtype(op if func is None else func, self.args)
+        self.result = None
+
+    def __code(self, leaves, consts):
+        # Return the source code of this node. Distributed operands are appended to *leaves*,
+        # scalars without a literal representation are appended to *consts*.
+        terms = []
+        for arg in self.args:
+            if isinstance(arg, Expression) and arg.result is None:
+                terms.append(arg.__code(leaves, consts))
+                continue
+            if isinstance(arg, Expression):
+                arg = arg.result
+            if hasattr(arg, "target_ranks"):
+                leaf_ids = [id(leaf) for leaf in leaves]
+                if id(arg) not in leaf_ids:
+                    leaves.append(arg)
+                    leaf_ids.append(id(arg))
+                terms.append("_%d" % leaf_ids.index(id(arg)))
+            elif type(arg) in (int, long, bool) or (type(arg) in (float, complex) and np.isfinite(arg)):
+                terms.append(repr(arg))
+            else:
+                consts.append(arg)
+                terms.append("_c[%d]" % (len(consts) - 1))
+
+        if self.func is None:
+            return "%s.%s(%s)" % (terms[0], self.op, ", ".join(terms[1:]))
+        return "%s(%s)" % (self.op, ", ".join(terms))
+
+    def evaluate(self, out=None):
+        """Compiles the expression into a single statement and evaluates it block-wise on the :term:`engines <engine>`.
+
+        :param out: distributed array of the same shape the result is written into. All operands are
+            distributed like *out* then. If ``None`` a new array is created, distributed like the first distributed operand.
+        :return: distributed array holding the result.
+        """
+        if out is None and self.result is not None:
+            return self.result
+
+        leaves = []
+        consts = []
+        body = self.__code(leaves, consts)
+
+        reference = self.reference if out is None else out
+        assert reference.shape == self.shape,\
+            "Shapes do not match: " + str(reference.shape) + " <-> " + str(self.shape)
+
+        # equalize distribution of all operands
+        leaves = [leaf.dist_like(reference) for leaf in leaves]
+
+        view = com.getView()
+        if consts:
+            view.push({'expr_consts' : consts}, targets=reference.target_ranks)
+
+        if out is None:
+            result = reference.__class__(self.shape, self.dtype, reference.distaxes, reference.target_offsets,\
+                reference.target_ranks, no_allocation=True, **reference.kwargs)
+        else:
+            result = out
+
+        dtype_literal = dtype_source(self.dtype) if self.dtype is not None else None
+        if self.dtype is not None and dtype_literal is None:
+            view.push({'expr_dtype' : self.dtype}, targets=reference.target_ranks)
+            dtype_literal = "expr_dtype"
+
+        # Blocks written into *out* must not overwrite elements of an operand which later blocks still read.
+        # If an operand shares memory with *out* the result is evaluated into a temporary first.
+        overlaps = out is not None and\
+            any(leaf is not out and getattr(leaf, "version", None) is out.version for leaf in leaves)
+
+        local_arraytype = reference.__class__.target_modulename + "." + reference.__class__.local_arraytype.__name__
+        params = ", ".join(["_c"] + ["_%d" % i for i in range(len(leaves))])
+        view.execute("{0}{1} = expression.evaluate(lambda {2}: {3}, [{4}], {5}, {6}, {7}, {8})".format(\
+            repr(result), "[...]" if overlaps else "", params, body, ", ".join(repr(leaf) for leaf in leaves),\
+            "expr_consts" if consts else "()", repr(out) if out is not None and not overlaps else None,\
+            local_arraytype, dtype_literal), targets=result.target_ranks)
+
+        if out is None:
+            if self.dtype is None:
+                view.execute("dtype = {0}.dtype".format(repr(result)), targets=result.target_ranks[0])
+                result.dtype = view.pull("dtype", targets=result.target_ranks[0], block=True)
+                result.nbytes = np.dtype(result.dtype).itemsize * np.prod(result.shape)
+            self.result = result
+        else:
+            out.version.increment()
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.evaluate(), name)
+
+    def __getitem__(self, args):
+        return self.evaluate()[args]
+
+    def __repr__(self):
+        return repr(self.evaluate())
+
+    def __str__(self):
+        return str(self.evaluate())
+
+make_lazy_op = lambda op: lambda self, *args: Expression(op, (self,) + args)
+
+for op in lazy_ops:
+    if not op.startswith("__i"):
+        setattr(Expression, op, make_lazy_op(op))
+
+def evaluate(f, arrays, consts=(), out=None, alloc=None, dtype=None):
+    """Engine-side evaluation of a compiled expression. The local arrays are processed block-wise along the
+    first axis, each block is written into *out*.
+
+    :param f: compiled expression. Expects *consts* followed by one block of each of *arrays*.
+    :param arrays: local arrays of equal shape
+    :param consts: constants used by *f*
+    :param out: local array the result is written into. If ``None`` a new array is created by calling
+        *alloc* with the keyword arguments *shape* and *dtype*.
+    :param dtype: datatype of the result. If ``None`` it is taken from the first evaluated block.
+    :return: *out*
+    """
+    shape = arrays[0].shape
+    itemsize = max(np.dtype(a.dtype).itemsize for a in arrays)
+    row_size = int(np.prod(shape[1:])) * itemsize
+    rows_per_block = max(1, block_bytes // max(1, row_size))
+
+    for begin in range(0, shape[0], rows_per_block):
+        window = slice(begin, begin + rows_per_block)
+        block = f(consts, *[a[window] for a in arrays])
+        if out is None:
+            out = alloc(shape=shape, dtype=block.dtype if dtype is None else dtype)
+        out[window] = block
+
+    if out is None:
+        # no elements at all
+        if dtype is None:
+            dtype = f(consts, *arrays).dtype
+        out = alloc(shape=shape, dtype=dtype)
+
+    return out
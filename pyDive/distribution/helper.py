@@ -23,6 +23,107 @@ __doc__ = None
 import numpy as np
 from collections import OrderedDict
 
+class LRUCache(object):
+    """Mapping of bounded size which evicts the least recently used item first."""
+    def __init__(self, maxsize, on_evict=None, sizeof=None, maxbytes=None):
+        """
+        :param int maxsize: maximum number of items
+        :param on_evict: callable which is called with *key* and *value* of each evicted item
+        :param sizeof: callable returning the number of bytes of a value. Required for *maxbytes*.
+        :param int maxbytes: maximum total number of bytes of all values or ``None`` for no limit.
+        """
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.sizeof = sizeof
+        self.maxbytes = maxbytes
+        #: total number of bytes of all values if *sizeof* is given
+        self.nbytes = 0
+        self.items = OrderedDict()
+
+    def get(self, key, default=None):
+        """Returns the value of *key* and marks it as most recently used."""
+        if key not in self.items:
+            return default
+        value = self.items.pop(key)
+        self.items[key] = value
+        return value
+
+    def setdefault(self, key, default=None):
+        """Returns the value of *key*. A missing *key* is set to *default* first."""
+        if key not in self:
+            self[key] = default
+        return self.get(key)
+
+    def pop(self, key, default=None):
+        """Removes *key* without calling *on_evict* and returns its value."""
+        if key not in self.items:
+            return default
+        value = self.items.pop(key)
+        if self.sizeof is not None:
+            self.nbytes -= self.sizeof(value)
+        return value
+
+    def __setitem__(self, key, value):
+        self.pop(key)
+        self.items[key] = value
+        if self.sizeof is not None:
+            self.nbytes += self.sizeof(value)
+        while len(self.items) > self.maxsize or (self.maxbytes is not None and self.nbytes > self.maxbytes):
+            evicted_key, evicted_value = self.items.popitem(last=False)
+            if self.sizeof is not None:
+                self.nbytes -= self.sizeof(evicted_value)
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted_value)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def clear(self):
+        """Removes all items without calling *on_evict*."""
+        self.items.clear()
+        self.nbytes = 0
+
+class ViewCache(LRUCache):
+    """:class:`LRUCache` of items referring to objects kept on the :term:`engines <engine>`, e.g. plans and schedules.
+    The items belong to the view they were created with: when the cache is accessed with another view, i.e. after
+    (re-)initializing pyDive, it is cleared without calling *on_evict*. For use on the client only.
+    """
+    def __init__(self, maxsize, on_evict=None, sizeof=None, maxbytes=None):
+        LRUCache.__init__(self, maxsize, on_evict, sizeof, maxbytes)
+        self.view = None
+
+    def __check_view(self):
+        import pyDive.IPParallelClient as com
+        view = com.getView()
+        if self.view is not view:
+            # engines have been reset
+            self.clear()
+            self.view = view
+
+    def get(self, key, default=None):
+        self.__check_view()
+        return LRUCache.get(self, key, default)
+
+    def __setitem__(self, key, value):
+        self.__check_view()
+        LRUCache.__setitem__(self, key, value)
+
+    def __contains__(self, key):
+        self.__check_view()
+        return LRUCache.__contains__(self, key)
+
+class VersionCounter(object):
+    """Counts the modifications of the memory of a distributed array. The counter is shared by the array
+    and all arrays viewing the same memory, e.g. its slices."""
+    def __init__(self):
+        self.value = 0
+
+    def increment(self):
+        self.value += 1
+
 def getFirstSliceIdx(slice_obj, begin, end):
     if slice_obj.start > begin:
         if slice_obj.start >= end: return None
@@ -114,4 +215,71 @@ def common_decomposition(axesA, offsetsA, axesB, offsetsB, shape):
 
         offsets.append(np.array(offsets_sa))
         ids.append(np.array(ids_sa))
-    return axes, offsets, ids
\ No newline at end of file
+    return axes, offsets, ids
+
+def result_dtype(op, args):
+    """Infer the datatype of an element-wise operation on the client by numpy's type promotion rules.
+
+    Array-like operands are replaced by one-element dummies of the same datatype while scalars are passed
+    unchanged so that numpy's value-based casting applies.
+
+    :param op: name of a special method of the first operand, e.g. "__add__", or a callable (numpy-ufunc)
+    :param args: operands. Anything providing a ``dtype`` attribute is treated as an array.
+    :return: numpy-dtype of the result or ``None`` if it cannot be determined on the client.
+    """
+    dummies = []
+    for arg in args:
+        if np.isscalar(arg) or not hasattr(arg, "dtype"):
+            dummies.append(arg)
+            continue
+        if arg.dtype is None:
+            return None
+        dummies.append(np.zeros(1, dtype=arg.dtype))
+
+    try:
+        with np.errstate(all='ignore'):
+            if isinstance(op, str):
+                result = getattr(dummies[0], op)(*dummies[1:])
+            else:
+                result = op(*dummies)
+    except Exception:
+        return None
+
+    if result is NotImplemented or not hasattr(result, "dtype"):
+        return None
+    return result.dtype
+
+def broadcast_to(array, shape):
+    """Returns a view of *array* broadcast to *shape* like *numpy.broadcast_to*, which needs numpy 1.10."""
+    return np.broadcast_arrays(np.asarray(array), np.empty(shape, dtype=bool))[0]
+
+def point_owners(points, distaxes, target_offsets):
+    """Locates the local arrays holding *points*.
+
+    :param points: (N, ndim) integer array of non-negative global coordinates
+    :param ints distaxes: distributed axes of the array
+    :param target_offsets: offsets of the local arrays along each distributed axis
+    :return: tuple of the linear index of the owning local array (an index into *target_ranks*) for each point
+        and the (N, ndim) local coordinates.
+    """
+    points = np.asarray(points, dtype=np.int64)
+    local_points = points.copy()
+    owners = np.zeros(len(points), dtype=np.int64)
+    for distaxis, offsets in zip(distaxes, target_offsets):
+        offsets = np.asarray(offsets)
+        idx = np.searchsorted(offsets, points[:, distaxis], side="right") - 1
+        local_points[:, distaxis] -= offsets[idx]
+        owners = owners * len(offsets) + idx
+    return owners, local_points
+
+def wrap_points(points, shape):
+    """Wraps negative coordinates of the (N, ndim) *points* into *shape*.
+
+    :raises IndexError: if a coordinate is out of bounds.
+    """
+    points = np.array(points, dtype=np.int64, ndmin=2)
+    shape = np.array(shape, dtype=np.int64)
+    points = np.where(points < 0, points + shape, points)
+    if np.any((points < 0) | (points >= shape)):
+        raise IndexError("index out of bounds for shape " + str(tuple(shape)))
+    return points
@@ -21,6 +21,7 @@ If not, see <http://www.gnu.org/licenses/>.
 __doc__ = None
 import numpy as np
 from mpi4py import MPI
+import helper
 try:
     import pycuda.gpuarray
 except ImportError:
@@ -48,6 +49,331 @@ def finish_MPIcommunication(out_array, commData, recv_bufs):
     for (src_target, window, tag), recv_buf in zip(commData, recv_bufs):
         out_array[window] = recv_buf
 
+#: committed MPI datatypes describing windows of local arrays, keyed by the local array's shape and itemsize and the window
+window_datatypes = helper.LRUCache(256, on_evict=lambda key, datatype: datatype.Free())
+
+def __window_extent(shape, window):
+    starts, sizes = [], []
+    for s, w in zip(shape, window):
+        begin, end, step = w.indices(s)
+        starts.append(begin)
+        sizes.append(max(0, end - begin))
+    return starts, sizes
+
+def window_datatype(array, window):
+    """Returns a committed MPI subarray datatype of *window* within the C-contiguous *array*.
+    The element's bytes form the last axis so that any dtype can be described.
+    """
+    starts, sizes = __window_extent(array.shape, window)
+    key = (array.shape, array.dtype.itemsize, tuple(starts), tuple(sizes))
+    datatype = window_datatypes.get(key)
+    if datatype is None:
+        itemsize = array.dtype.itemsize
+        datatype = MPI.BYTE.Create_subarray(list(array.shape) + [itemsize], sizes + [itemsize], starts + [0]).Commit()
+        window_datatypes[key] = datatype
+    return datatype
+
+#: committed MPI datatypes of contiguous bytes, keyed by their number
+contiguous_datatypes = helper.LRUCache(64, on_evict=lambda key, datatype: datatype.Free())
+
+def contiguous_datatype(nbytes):
+    """Returns a committed MPI datatype of *nbytes* contiguous bytes, e.g. an element or a row of an array.
+    Counts in units of elements or rows stay within MPI's ``int`` counts for messages beyond 2 GiB.
+    """
+    datatype = contiguous_datatypes.get(nbytes)
+    if datatype is None:
+        datatype = MPI.BYTE.Create_contiguous(nbytes).Commit()
+        contiguous_datatypes[nbytes] = datatype
+    return datatype
+
+def redistributeArrayMPI(source, dest, schedule, target2rank):
+    """Sends the windows of *source* and receives the windows of *dest* as listed in *schedule*.
+    All messages are posted before waiting for any, so a redistribution takes a single call on each engine.
+
+    Windows are described by MPI subarray datatypes, so data is sent from and received into the local arrays
+    directly. Windows exchanged with the engine itself are copied locally.
+
+    :param source: local array of the source on this engine or ``None``
+    :param dest: local array of the destination on this engine or ``None``
+    :param schedule: pair of the lists of (partner target, window, tag) to send to and to receive from
+    """
+    src_commData, dest_commData = schedule
+    my_rank = MPI.COMM_WORLD.Get_rank()
+    tasks = []
+
+    local_windows = {}
+    for (dest_target, window, tag) in src_commData:
+        if target2rank[dest_target] == my_rank:
+            local_windows[tag] = window
+            continue
+        if 0 in __window_extent(source.shape, window)[1]:
+            continue
+        if source.flags.c_contiguous:
+            tasks.append(MPI.COMM_WORLD.Isend([source, 1, window_datatype(source, window)],\
+                dest=target2rank[dest_target], tag=tag))
+        else:
+            tasks.append(MPI.COMM_WORLD.Isend(source[window].copy(), dest=target2rank[dest_target], tag=tag))
+
+    recv_bufs = []
+    for (src_target, window, tag) in dest_commData:
+        if target2rank[src_target] == my_rank:
+            dest[window] = source[local_windows.pop(tag)]
+            continue
+        if 0 in __window_extent(dest.shape, window)[1]:
+            continue
+        if dest.flags.c_contiguous:
+            tasks.append(MPI.COMM_WORLD.Irecv([dest, 1, window_datatype(dest, window)],\
+                source=target2rank[src_target], tag=tag))
+        else:
+            recv_bufs.append((window, np.empty_like(dest[window])))
+            tasks.append(MPI.COMM_WORLD.Irecv(recv_bufs[-1][1], source=target2rank[src_target], tag=tag))
+
+    MPI.Request.Waitall(tasks)
+    for window, recv_buf in recv_bufs:
+        dest[window] = recv_buf
+
+#----------- ghost layers ----------------
+
+#: MPI tag of the messages exchanging ghost layers. Twice the index of the axis plus the direction is added.
+halo_tag = 30000
+
+def exchangeHalosMPI(local_array, ghosts, axes, widths, neighbours):
+    """Copies *local_array* into the inner part of *ghosts* and fills the ghost layers of width *widths* along *axes*
+    with the adjacent data of the neighbouring engines. Axis by axis, so that corners are filled as well.
+    Ghost layers without a neighbour repeat the outermost inner values.
+
+    :param ghosts: array of the shape of *local_array* extended by twice the width along *axes*. Is reused if given
+        and matching, otherwise a new one is created.
+    :param neighbours: MPI ranks of the lower and the upper neighbour along each of *axes*, ``None`` for no neighbour
+    :return: *ghosts*
+    """
+    local_array = np.asarray(local_array)
+    shape = list(local_array.shape)
+    for axis, width in zip(axes, widths):
+        shape[axis] += 2 * width
+    if ghosts is None or list(ghosts.shape) != shape or ghosts.dtype != local_array.dtype:
+        ghosts = np.empty(shape, dtype=local_array.dtype)
+
+    inner = [slice(None)] * len(shape)
+    for axis, width in zip(axes, widths):
+        inner[axis] = slice(width, width + local_array.shape[axis])
+    ghosts[tuple(inner)] = local_array
+
+    comm = MPI.COMM_WORLD
+    for i, (axis, width, (lower, upper)) in enumerate(zip(axes, widths, neighbours)):
+        if width == 0:
+            continue
+        n = local_array.shape[axis]
+        def window(begin, end):
+            w = [slice(None)] * len(shape)
+            w[axis] = slice(begin, end)
+            return tuple(w)
+
+        if lower == upper == comm.Get_rank():
+            # the engine is its own neighbour
+            ghosts[window(0, width)] = ghosts[window(n, n+width)]
+            ghosts[window(n+width, n+2*width)] = ghosts[window(width, 2*width)]
+            continue
+
+        tasks = []
+        if lower is not None:
+            tasks.append(comm.Isend([ghosts, 1, window_datatype(ghosts, window(width, 2*width))],\
+                dest=lower, tag=halo_tag + 2*i))
+            tasks.append(comm.Irecv([ghosts, 1, window_datatype(ghosts, window(0, width))],\
+                source=lower, tag=halo_tag + 2*i + 1))
+        else:
+            ghosts[window(0, width)] = ghosts[window(width, width+1)]
+        if upper is not None:
+            tasks.append(comm.Isend([ghosts, 1, window_datatype(ghosts, window(n, n+width))],\
+                dest=upper, tag=halo_tag + 2*i + 1))
+            tasks.append(comm.Irecv([ghosts, 1, window_datatype(ghosts, window(n+width, n+2*width))],\
+                source=upper, tag=halo_tag + 2*i))
+        else:
+            ghosts[window(n+width, n+2*width)] = ghosts[window(n+width-1, n+width)]
+        MPI.Request.Waitall(tasks)
+
+    return ghosts
+
+#----------- cpu -> root engine ----------------
+
+#: MPI tag of the messages gathering an array on a single engine
+gather_tag = 32767
+
+def gatherArrayMPI(local_array, shape, offset_vectors, local_shapes, ranks, root_rank):
+    """Assembles an array on the engine with MPI rank *root_rank*. Each piece is received directly into its
+    place in the result by a subarray datatype. Pieces are counted in elements, not in bytes.
+
+    :return: the whole array on *root_rank*, ``None`` on all other engines.
+    """
+    comm = MPI.COMM_WORLD
+    element = contiguous_datatype(local_array.dtype.itemsize)
+    if comm.Get_rank() != root_rank:
+        if local_array.size > 0:
+            comm.Send([np.ascontiguousarray(local_array), local_array.size, element],\
+                dest=root_rank, tag=gather_tag)
+        return None
+
+    result = np.empty(shape, dtype=local_array.dtype)
+    tasks = []
+    datatypes = []
+    for rank, offset_vector, local_shape in zip(ranks, offset_vectors, local_shapes):
+        if rank == root_rank:
+            window = [slice(start, start+length) for start, length in zip(offset_vector, local_shape)]
+            result[tuple(window)] = local_array
+            continue
+        if np.prod(local_shape) == 0:
+            continue
+        datatype = element.Create_subarray(list(shape), list(local_shape), list(offset_vector)).Commit()
+        datatypes.append(datatype)
+        tasks.append(comm.Irecv([result, 1, datatype], source=rank, tag=gather_tag))
+
+    MPI.Request.Waitall(tasks)
+    for datatype in datatypes:
+        datatype.Free()
+    return result
+
+#----------- rebalancing ----------------
+
+# communicators of engine groups, keyed by the engine's and the group's MPI ranks
+group_comms = {}
+
+def group_comm(ranks):
+    """Returns the communicator of the engines *ranks* (MPI ranks), ordered like *ranks*. Communicators are cached."""
+    comm = MPI.COMM_WORLD
+    key = (comm.Get_rank(), tuple(ranks))
+    if key not in group_comms:
+        group_comms[key] = comm.Create_group(comm.Get_group().Incl(list(ranks)))
+    return group_comms[key]
+
+def even_offsets(length, num_targets):
+    """Offsets of *length* elements split evenly among at most *num_targets* engines. Engines are left out
+    rather than getting no elements.
+    """
+    num_targets = max(1, min(num_targets, length))
+    return [i * length // num_targets for i in range(num_targets)]
+
+def rebalanceArrayMPI(local_array, axis, shape, dtype, src_ranks, dest_ranks):
+    """Redistributes an array, which is distributed along *axis* across the engines *src_ranks*,
+    evenly across the engines *dest_ranks* by a single *MPI.Alltoallv*. The global offset of each local array
+    is determined by a prefix sum (*MPI.Exscan*) over the local sizes, so the sizes do not need to be known in advance.
+
+    :param local_array: local array on engines of *src_ranks*, ``None`` otherwise.
+    :param ints shape: global shape of the array. The length of *axis* is ignored.
+    :param ints src_ranks: MPI ranks of the engines holding the array, ordered along *axis*.
+    :param ints dest_ranks: MPI ranks of the engines the array is distributed to, ordered along *axis*.
+    :return: tuple of the new local array (``None`` on engines not taking part in the result) and the global
+        length of *axis*.
+    """
+    union = list(src_ranks) + [rank for rank in dest_ranks if rank not in src_ranks]
+    comm = group_comm(union)
+
+    rest_shape = list(shape[:axis]) + list(shape[axis+1:])
+    if local_array is None:
+        local_array = np.empty([0] + rest_shape, dtype=dtype)
+    else:
+        local_array = np.rollaxis(np.asarray(local_array), axis)
+    rows = np.ascontiguousarray(local_array)
+
+    size = np.array([rows.shape[0]], dtype=np.int64)
+    begin = np.zeros(1, dtype=np.int64)
+    comm.Exscan(size, begin, op=MPI.SUM)
+    if comm.Get_rank() == 0:
+        begin[0] = 0 # receive buffer of rank 0 is undefined
+    length = np.empty(1, dtype=np.int64)
+    comm.Allreduce(size, length, op=MPI.SUM)
+    begin, end, length = int(begin[0]), int(begin[0] + size[0]), int(length[0])
+
+    offsets = even_offsets(length, len(dest_ranks))
+    dest_ranks = dest_ranks[:len(offsets)]
+    offsets.append(length)
+
+    send_counts = np.zeros(comm.Get_size(), dtype=np.int64)
+    send_displs = np.zeros(comm.Get_size(), dtype=np.int64)
+    for i, rank in enumerate(dest_ranks):
+        dest = union.index(rank)
+        overlap_begin, overlap_end = max(begin, offsets[i]), min(end, offsets[i+1])
+        if overlap_end > overlap_begin:
+            send_counts[dest] = overlap_end - overlap_begin
+            send_displs[dest] = overlap_begin - begin
+
+    recv_counts = np.empty_like(send_counts)
+    comm.Alltoall(send_counts, recv_counts)
+    recv_displs = np.concatenate(([0], np.cumsum(recv_counts)[:-1]))
+
+    my_rank = MPI.COMM_WORLD.Get_rank()
+    result = np.empty([int(recv_counts.sum())] + rest_shape, dtype=rows.dtype)
+    __alltoallv_rows(comm, rows, send_counts, send_displs, result, recv_counts, recv_displs)
+
+    if my_rank not in dest_ranks:
+        return None, length
+    return np.ascontiguousarray(np.rollaxis(result, 0, axis+1)), length
+
+def __alltoallv_rows(comm, rows, send_counts, send_displs, result, recv_counts, recv_displs):
+    # *MPI.Alltoallv* of rows of the C-contiguous arrays *rows* and *result*. Counts and displacements are given
+    # in rows and passed to MPI in units of a row datatype, so they do not overflow for exchanges beyond 2 GiB.
+    row_bytes = rows.dtype.itemsize * int(np.prod(rows.shape[1:]))
+    if row_bytes == 0:
+        return
+    row = contiguous_datatype(row_bytes)
+    ints = lambda values: [int(value) for value in values]
+    comm.Alltoallv([rows.reshape(-1).view(np.uint8), (ints(send_counts), ints(send_displs)), row],\
+        [result.reshape(-1).view(np.uint8), (ints(recv_counts), ints(recv_displs)), row])
+
+def alltoallv(comm, array, send_counts):
+    """Sends consecutive rows (parts along the first axis) of *array* to all engines of *comm* by a single
+    *MPI.Alltoallv*. Rows of any datatype are transferred as a contiguous datatype of a row's bytes.
+
+    :param array: local array. The first *send_counts[0]* rows are sent to rank 0 of *comm* and so on.
+    :param ints send_counts: number of rows sent to each rank of *comm*
+    :return: tuple of the received rows, ordered by the sending rank, and the number of rows received from each rank.
+    """
+    array = np.ascontiguousarray(array)
+    send_counts = np.asarray(send_counts, dtype=np.int64)
+    recv_counts = np.empty_like(send_counts)
+    comm.Alltoall(send_counts, recv_counts)
+
+    send_displs = np.concatenate(([0], np.cumsum(send_counts)[:-1]))
+    recv_displs = np.concatenate(([0], np.cumsum(recv_counts)[:-1]))
+    result = np.empty((int(recv_counts.sum()),) + array.shape[1:], dtype=array.dtype)
+    __alltoallv_rows(comm, array, send_counts, send_displs, result, recv_counts, recv_displs)
+    return result, recv_counts
+
+def exchangePointsMPI(local_array, points, dtype, distaxes, target_offsets, owner_ranks, ranks, values=None):
+    """Reads or writes single elements of a distributed array at *points* requested by this engine.
+    The points are routed to their owners and, when reading, the values are sent back, each by a single
+    *MPI.Alltoallv* among the engines *ranks*.
+
+    :param local_array: local array of the distributed array or ``None`` if this engine does not hold one.
+    :param points: (N, ndim) integer array of non-negative global coordinates requested by this engine (N may be 0)
+    :param dtype: datatype of the distributed array
+    :param ints distaxes: distributed axes of the distributed array
+    :param target_offsets: offsets of the local arrays along each distributed axis
+    :param ints owner_ranks: MPI ranks of the engines holding the local arrays, ordered like *target_ranks*
+    :param ints ranks: MPI ranks of all engines taking part, i.e. the owners and the requesting engines
+    :param values: values of length N to be written to *points* or ``None`` for reading
+    :return: the values at *points* in request order when reading, ``None`` when writing.
+    """
+    comm = group_comm(ranks)
+    owners, local_points = helper.point_owners(points, distaxes, target_offsets)
+    dest = np.array([list(ranks).index(rank) for rank in owner_ranks], dtype=np.int64)[owners]
+    order = np.argsort(dest, kind='mergesort')
+    send_counts = np.bincount(dest, minlength=comm.Get_size())
+
+    requests, recv_counts = alltoallv(comm, local_points[order], send_counts)
+    window = tuple(requests.T)
+
+    if values is not None:
+        received, recv_counts = alltoallv(comm, np.asarray(values, dtype=dtype)[order], send_counts)
+        if len(requests):
+            local_array[window] = received
+        return None
+
+    found = local_array[window] if len(requests) else np.empty(0, dtype=dtype)
+    replies, counts = alltoallv(comm, found, recv_counts)
+    result = np.empty(len(points), dtype=dtype)
+    result[order] = replies
+    return result
+
 #----------- gpu -> cpu -> cpu -> gpu ----------------
 
 def scatterArrayGPU_async(in_array, commData, target2rank):
@@ -71,59 +397,35 @@ def finish_GPUcommunication(out_array, commData, recv_bufs):
     for (src_target, window, tag), recv_buf in zip(commData, recv_bufs):
         out_array[window] = pycuda.gpuarray.to_gpu(recv_buf)
 
+def redistributeArrayGPU(source, dest, schedule, target2rank):
+    """GPU counterpart of :func:`redistributeArrayMPI`."""
+    src_commData, dest_commData = schedule
+    send_tasks = scatterArrayGPU_async(source, src_commData, target2rank) if src_commData else []
+    recv_tasks, recv_bufs = gatherArraysGPU_async(dest, dest_commData, target2rank) if dest_commData else ([], [])
+    MPI.Request.Waitall(send_tasks + recv_tasks)
+    if dest_commData:
+        finish_GPUcommunication(dest, dest_commData, recv_bufs)
+
 import os
 onTarget = os.environ.get("onTarget", 'False')
 
 # execute this code only if it is not executed on engine
 if onTarget == 'False':
     import pyDive.IPParallelClient as com
+    from pyDive.distribution import kernels
+
+    def MPI_copier(source, dest, schedule_name):
+        def copy_wrapper(source_name, dest_name, schedule_name):
+            interengine.redistributeArrayMPI(globals().get(source_name), globals().get(dest_name),\
+                globals().get(schedule_name, [([], [])])[0], target2rank)
+
+        targets = sorted(set(source.target_ranks + dest.target_ranks))
+        kernels.apply(copy_wrapper, targets, source.name, dest.name, schedule_name)
+
+    def GPU_copier(source, dest, schedule_name):
+        def copy_wrapper(source_name, dest_name, schedule_name):
+            interengine.redistributeArrayGPU(globals().get(source_name), globals().get(dest_name),\
+                globals().get(schedule_name, [([], [])])[0], target2rank)
 
-    def MPI_copier(source, dest):
-        view = com.getView()
-
-        # send
-        view.execute('{0}_send_tasks = interengine.scatterArrayMPI_async({0}, src_commData[0], target2rank)'\
-            .format(source.name), targets=source.target_ranks)
-
-        # receive
-        view.execute("""\
-            {0}_recv_tasks, {0}_recv_bufs = interengine.gatherArraysMPI_async({1}, dest_commData[0], target2rank)
-            """.format(source.name, dest.name),\
-            targets=dest.target_ranks)
-
-        # finish communication
-        view.execute('''\
-            if "{0}_send_tasks" in locals():
-                MPI.Request.Waitall({0}_send_tasks)
-                del {0}_send_tasks
-            if "{0}_recv_tasks" in locals():
-                MPI.Request.Waitall({0}_recv_tasks)
-                interengine.finish_MPIcommunication({1}, dest_commData[0], {0}_recv_bufs)
-                del {0}_recv_tasks, {0}_recv_bufs
-            '''.format(source.name, dest.name),
-            targets=tuple(set(source.target_ranks + dest.target_ranks)))
-
-    def GPU_copier(source, dest):
-        view = com.getView()
-
-        # send
-        view.execute('{0}_send_tasks = interengine.scatterArrayGPU_async({0}, src_commData[0], target2rank)'\
-            .format(source.name), targets=source.target_ranks)
-
-        # receive
-        view.execute("""\
-            {0}_recv_tasks, {0}_recv_bufs = interengine.gatherArraysGPU_async({1}, dest_commData[0], target2rank)
-            """.format(source.name, dest.name),\
-            targets=dest.target_ranks)
-
-        # finish communication
-        view.execute('''\
-            if "{0}_send_tasks" in locals():
-                MPI.Request.Waitall({0}_send_tasks)
-                del {0}_send_tasks
-            if "{0}_recv_tasks" in locals():
-                MPI.Request.Waitall({0}_recv_tasks)
-                interengine.finish_GPUcommunication({1}, dest_commData[0], {0}_recv_bufs)
-                del {0}_recv_tasks, {0}_recv_bufs
-            '''.format(source.name, dest.name),
-            targets=tuple(set(source.target_ranks + dest.target_ranks)))
+        targets = sorted(set(source.target_ranks + dest.target_ranks))
+        kernels.apply(copy_wrapper, targets, source.name, dest.name, schedule_name)
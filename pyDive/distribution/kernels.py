@@ -0,0 +1,174 @@
+"""
+Copyright 2015 Heiko Burau
+
+This file is part of pyDive.
+
+pyDive is free software: you can redistribute it and/or modify
+it under the terms of of either the GNU General Public License or
+the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+pyDive is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License and the GNU Lesser General Public License
+for more details.
+
+You should have received a copy of the GNU General Public License
+and the GNU Lesser General Public License along with pyDive.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__doc__=\
+"""Registry of remote kernels.
+
+Functions and statement templates are shipped to each :term:`engine` only once and are cached there
+under a name derived from their content. Later calls merely transfer the kernel's name and its (small) arguments,
+so that engines neither unpickle the function nor parse and compile source code again.
+
+A statement template is a line of python code whose placeholders ``{0}, {1}, ...`` refer to remote variables
+by name, e.g. ``"{0} = {1} + {2}"``. Plain values are passed separately and accessed as ``_v[0], _v[1], ...``: ::
+
+    kernels.execute("{0} = {1}.__mul__(_v[0])", targets, names=(result.name, a.name), values=(2.0,))
+"""
+
+import pyDive.IPParallelClient as com
+import helper
+from IPython.parallel import interactive, Reference
+import hashlib
+import marshal
+import re
+import weakref
+
+#: maps the name of a kernel to the set of :term:`engines <engine>` it is registered on
+registered = helper.ViewCache(float("inf"))
+#: maps a statement template to its remote name and compiled source
+templates = {}
+# content keys of functions without closure
+content_keys = weakref.WeakKeyDictionary()
+
+# value types a function's closure or defaults may consist of in order to be identified by content
+simple_types = (int, long, float, complex, bool, str, unicode, type(None))
+
+def __is_simple(value):
+    if type(value) is tuple:
+        return all(__is_simple(v) for v in value)
+    return type(value) in simple_types
+
+def content_key(f):
+    """Returns a hash of *f*'s code, defaults and closure or ``None`` if *f* cannot be identified by content,
+    e.g. because its closure refers to arrays.
+    """
+    if f in content_keys:
+        return content_keys[f]
+    cells = tuple(cell.cell_contents for cell in (f.func_closure or ()))
+    defaults = f.func_defaults or ()
+    if not __is_simple(cells + defaults):
+        return None
+    key = hashlib.sha1(marshal.dumps(f.func_code) + repr((defaults, cells))).hexdigest()[:16]
+    if not cells:
+        content_keys[f] = key
+    return key
+
+def __target_list(targets):
+    if type(targets) in (list, tuple):
+        return targets
+    return [targets]
+
+def register(f, targets):
+    """Ships *f* to the :term:`engines <engine>` *targets* unless it is already registered there.
+    Within *f* global names refer to the engine's namespace.
+
+    :param callable f: function to be registered
+    :param ints targets: :term:`engine` ranks
+    :return: remote name of *f* or ``None`` if *f* cannot be identified by content.
+    """
+    key = content_key(f)
+    if key is None:
+        return None
+    view = com.getView()
+
+    name = "kernel_" + key
+    targets_set = registered.setdefault(name, set())
+    missing = [target for target in __target_list(targets) if target not in targets_set]
+    if missing:
+        view.push({name : interactive(f)}, targets=missing, block=True)
+        targets_set.update(missing)
+    return name
+
+def reference(f, targets):
+    """Returns a reference to *f* on the :term:`engines <engine>` *targets* which can be passed as an argument
+    to *IPython.parallel.DirectView.apply*. *f* is registered first (see :func:`register`), if it cannot be
+    registered *f* itself is returned.
+    """
+    name = register(f, targets)
+    return Reference(name) if name is not None else interactive(f)
+
+def arguments(args, names, values):
+    """Converts *args* into the arguments of a statement template. Distributed arrays are appended to *names*,
+    everything else is appended to *values*.
+
+    :return: list of placeholders and value accessors, e.g. ``["{2}", "_v[0]"]``
+    """
+    terms = []
+    for arg in args:
+        if hasattr(arg, "target_ranks"):
+            names.append(repr(arg))
+            terms.append("{%d}" % (len(names) - 1))
+        else:
+            values.append(arg)
+            terms.append("_v[%d]" % (len(values) - 1))
+    return terms
+
+def apply(f, targets, *args, **kwargs):
+    """Calls ``f(*args, **kwargs)`` on the :term:`engines <engine>` *targets*. *f* is registered first
+    (see :func:`register`), if it cannot be registered it is shipped as usual.
+
+    :return: same as *IPython.parallel.DirectView.apply*
+    """
+    view = com.getView()
+    f = reference(f, targets)
+    tmp_targets = view.targets
+    view.targets = targets
+    try:
+        return view.apply(f, *args, **kwargs)
+    finally:
+        view.targets = tmp_targets
+
+def __run(template_name, names, values):
+    # engine-side execution of a statement template
+    ns = globals()
+    ns["_n"] = names
+    ns["_v"] = values
+    ns["_ns"] = ns
+    try:
+        exec kernel_templates[template_name] in ns
+    finally:
+        del ns["_n"], ns["_v"], ns["_ns"]
+
+def execute(template, targets, names=(), values=()):
+    """Executes the statement *template* on the :term:`engines <engine>` *targets*. The template is compiled
+    only once on each engine.
+
+    :param str template: python statement. Placeholders ``{0}, {1}, ...`` are replaced by the remote variables
+        *names*, plain values are accessed by ``_v[0], _v[1], ...``.
+    :param ints targets: :term:`engine` ranks
+    :param strs names: names of remote variables
+    :param values: plain values which are shipped with each call
+    :return: same as *IPython.parallel.DirectView.apply*
+    """
+    if template not in templates:
+        source = re.sub(r"\{(\d+)\}", r"_ns[_n[\1]]", template)
+        templates[template] = ("kernel_template_" + hashlib.sha1(source).hexdigest()[:16], source)
+    template_name, source = templates[template]
+
+    view = com.getView()
+    targets_set = registered.setdefault(template_name, set())
+    missing = [target for target in __target_list(targets) if target not in targets_set]
+    if missing:
+        view.execute("kernel_templates = globals().get('kernel_templates', {{}}); "
+            "kernel_templates[{0!r}] = compile({1!r}, '<kernel>', 'exec')".format(template_name, source),\
+            targets=missing, block=True)
+        targets_set.update(missing)
+
+    return apply(__run, targets, template_name, tuple(names), tuple(values))
@@ -21,13 +21,59 @@ If not, see <http://www.gnu.org/licenses/>.
 """
 __doc__ = None
 
+import os
 import numpy as np
 import pyDive.IPParallelClient as com
+import pyDive.futures as futures
 import helper
+import expression
+import kernels
+import shm
+import decomposition
+import interengine
 from collections import defaultdict
+import itertools
 
 array_id = 0
 
+#: If ``True`` the datatype of an operation's result, which is inferred on the client, is verified
+#: against the datatype on :term:`engine`. This costs an extra round trip per operation and is meant for debugging.
+verify_dtypes = False
+
+#: If ``True`` the result of bitmask indexing is rebalanced evenly across the engines of the indexed array
+#: (see :meth:`DistributedGenericArray.rebalance`). Otherwise engines keep their selected elements and those
+#: without any are left out.
+auto_rebalance = False
+
+slicing_plan_id = 0
+
+#: Slicing plans of recently used views, i.e. properties of the sliced array and the local slices,
+#: keyed by the distribution of the array and the normalized view. The local slices are kept on the
+#: :term:`engines <engine>` as well, so that repeated slicing costs only a single remote call.
+slicing_plans = helper.ViewCache(256, on_evict=lambda key, plan: com.free(plan[0], plan[3]))
+
+redistribution_id = 0
+
+#: Communication schedules of recently used redistributions (see :meth:`DistributedGenericArray.dist_like`),
+#: keyed by the pair of source and destination distribution. The schedules are kept on the
+#: :term:`engines <engine>` as well, so that repeated redistributions cost only the data movement.
+redistributions = helper.ViewCache(256, on_evict=lambda key, schedule: com.free(schedule[0], schedule[1]))
+
+#: maximum total number of bytes of the local copies held on the client (see :meth:`DistributedGenericArray.local_copy`).
+#: The least recently used copies are dropped first, arrays exceeding the limit are gathered on each access.
+local_copy_bytes = 2**28
+
+#: local copies of distributed arrays, keyed by the array's name. Each entry holds the version of the array's
+#: memory it was gathered at, the copy and its size in bytes.
+local_copies = helper.LRUCache(4096, sizeof=lambda entry: entry[2], maxbytes=local_copy_bytes)
+
+halo_plan_id = 0
+
+#: Neighbours of the :term:`engines <engine>` for recently used ghost layer exchanges
+#: (see :meth:`DistributedGenericArray.exchange_halos`), keyed by the distribution and the periodicity.
+#: The neighbours are kept on the engines as well.
+halo_plans = helper.ViewCache(256, on_evict=lambda key, plan: com.free(plan[0], plan[1]))
+
 class DistributedGenericArray(object):
     """
     Represents a cluster-wide, multidimensional, homogeneous array of fixed-size elements.
@@ -50,15 +96,15 @@ class DistributedGenericArray(object):
 
     If you try to access an attribute that is only available for the local array, the request
     is forwarded to an internal local copy of the whole distributed array (see: :meth:`gather()`).
-    This internal copy is only created when you want to access it and is held until ``__setitem__`` is called,
-    i.e. the array's content is manipulated.
+    This internal copy is only created when you want to access it and is kept in a client-side cache of bounded size
+    (see :obj:`local_copy_bytes`) until the array or any array sharing its memory, e.g. a slice, is modified.
     """
     local_arraytype = None
     target_modulename = None
     interengine_copier = None
     may_allocate = True
 
-    def __init__(self, shape, dtype=np.float, distaxes='all', target_offsets=None, target_ranks=None, no_allocation=False, **kwargs):
+    def __init__(self, shape, dtype=np.float, distaxes='all', target_offsets=None, target_ranks=None, no_allocation=False, planner=None, **kwargs):
         """Creates an instance of {arraytype_name}. This is a low-level method of instantiating an array, it should rather be
         constructed using factory functions ("empty", "zeros", "open", ...)
 
@@ -72,6 +118,9 @@ class DistributedGenericArray(object):
             The last distributed axis is iterated over first.
         :param bool no_allocation: if ``True`` no instance of {local_arraytype_name} will be created on engine. Useful for
             manual instantiation of the local array.
+        :param planner: chooses the engine grid if neither *target_offsets* nor *target_ranks* are given.
+            Name of a planner in :obj:`pyDive.distribution.decomposition.planners`, a planner itself or ``None``
+            for the default planner (see :mod:`pyDive.distribution.decomposition`).
         :param kwargs: additional keyword arguments are forwarded to the constructor of the local array.
         """
         #: size of the array on each axis
@@ -94,7 +143,11 @@ class DistributedGenericArray(object):
         self.nbytes = np.dtype(dtype).itemsize * np.prod(self.shape)
         self.view = com.getView()
         self.kwargs = kwargs
-        self.local_copy_is_dirty = False
+        #: modification counter of the local arrays, shared with all arrays viewing the same memory.
+        #: Code modifying local arrays on the engines directly has to call ``version.increment()``.
+        self.version = helper.VersionCounter()
+        #: width of the ghost layers along each distributed axis after :meth:`exchange_halos`, ``None`` before.
+        self.ghost_width = None
 
         assert len(distaxes) <= len(shape),\
             "more distributed axes ({}) than dimensions ({})".format(len(distaxes), len(shape))
@@ -103,29 +156,10 @@ class DistributedGenericArray(object):
                 "distributed axis ({}) has to be within [0,{}]".format(distaxis, len(self.shape)-1)
 
         if target_offsets is None and target_ranks is None:
-            # create hypothetical patch with best surface-to-volume ratio
-            patch_volume = np.prod([self.shape[distaxis] for distaxis in distaxes]) / float(len(self.view.targets))
-            patch_edge_length = pow(patch_volume, 1.0/len(distaxes))
-
-            def factorize(n):
-                if n == 1: yield 1; return
-                for f in range(2,n//2+1) + [n]:
-                    while n%f == 0:
-                        n //= f
-                        yield f
-            prime_factors = list(factorize(len(self.view.targets)))[::-1] # get prime factors of number of engines in descending order
-            sorted_distaxes = sorted(distaxes, key=lambda axis: self.shape[axis]) # sort distributed axes in ascending order
-            # calculate number of available targets (engines) per distributed axis
-            # This value should be close to array_edge_length / patch_edge_length
+            grid = decomposition.plan(self.shape, distaxes, len(self.view.targets), np.dtype(dtype).itemsize, planner)
             num_targets_av = [1] * len(self.shape)
-
-            for distaxis in sorted_distaxes[:-1]:
-                num_patches = self.shape[distaxis] / patch_edge_length
-                while float(num_targets_av[distaxis]) < num_patches and prime_factors:
-                    num_targets_av[distaxis] *= prime_factors.pop()
-            # the largest axis gets the remaining (largest) prime_factors
-            if prime_factors:
-                num_targets_av[sorted_distaxes[-1]] *= np.prod(prime_factors)
+            for distaxis, num_targets_axis in zip(distaxes, grid):
+                num_targets_av[distaxis] = num_targets_axis
 
             # calculate target_offsets
             localshape = np.array(self.shape)
@@ -139,7 +173,7 @@ class DistributedGenericArray(object):
             target_offsets = [np.arange(num_targets[i]) * localshape[distaxes[i]] for i in range(len(distaxes))]
 
             # generate target_ranks list
-            target_ranks = tuple(range(np.prod(num_targets)))
+            target_ranks = tuple(range(int(np.prod(num_targets))))
 
         if target_offsets is None:
             localshape = np.array(self.shape)
@@ -149,7 +183,7 @@ class DistributedGenericArray(object):
 
         if target_ranks is None:
             num_targets = [len(target_offsets_axis) for target_offsets_axis in target_offsets]
-            target_ranks = tuple(range(np.prod(num_targets)))
+            target_ranks = tuple(range(int(np.prod(num_targets))))
         elif type(target_ranks) is not tuple:
             target_ranks = tuple(target_ranks)
 
@@ -163,18 +197,24 @@ class DistributedGenericArray(object):
         self.name = 'dist_array' + str(array_id)
         array_id += 1
 
-        if no_allocation:
-            self.view.push({self.name : None}, targets=self.target_ranks)
-        else:
+        if not no_allocation:
             target_shapes = self.target_shapes()
 
             self.view.scatter('target_shape', target_shapes, targets=self.target_ranks)
             self.view.push({'kwargs' : kwargs, 'dtype' : dtype}, targets=self.target_ranks)
-            self.view.execute('%s = %s(shape=target_shape[0], dtype=dtype, **kwargs)' % \
+            self.view.execute(com.free_code(self.target_ranks) + '%s = %s(shape=target_shape[0], dtype=dtype, **kwargs)' % \
                 (self.name, self.__class__.target_modulename + "." + self.__class__.local_arraytype.__name__), targets=self.target_ranks)
 
     def __del__(self):
-        self.view.execute('del %s' % self.name, targets=self.target_ranks)
+        local_copies.pop(getattr(self, "name", None))
+        com.free(self.name, self.target_ranks)
+        if getattr(self, "ghost_width", None) is not None:
+            com.free(self.name + "_ghosts", self.target_ranks)
+
+    @property
+    def grid(self):
+        """number of :term:`engines <engine>` along each distributed axis"""
+        return tuple(len(target_offsets_axis) for target_offsets_axis in self.target_offsets)
 
     def target_shapes(self):
         """generate a list of the local shape on each target in use"""
@@ -212,68 +252,15 @@ class DistributedGenericArray(object):
         pitch = [int(np.prod(num_targets[i+1:])) for i in range(len(self.distaxes))]
         return sum(rank_idx_component * pitch_component for rank_idx_component, pitch_component in zip(rank_idx_vector, pitch))
 
-    def __getitem__(self, args):
-        # bitmask indexing
-        if isinstance(args, self.__class__) and args.dtype == bool:
-            bitmask = args
-            assert bitmask.shape == self.shape,\
-                "shape of bitmask (%s) does not correspond to shape of array (%s)"\
-                    % (str(bitmask.shape), str(self.shape))
-
-            bitmask = bitmask.dist_like(self) # equalize distribution if necessary
-            self.view.execute("tmp = {0}[{1}]; tmp_size = tmp.shape[0]".format(repr(self), repr(bitmask)), targets=self.target_ranks)
-            sizes = self.view.pull("tmp_size", targets=self.target_ranks)
-            new_target_ranks = [rank for rank, size in zip(self.target_ranks, sizes) if size > 0]
-            new_sizes = [size for size in sizes if size > 0]
-            partial_sum = lambda a, b: a + [a[-1] + b]
-            new_target_offsets = [ [0] + reduce(partial_sum, new_sizes[1:-1], new_sizes[0:1]) ]
-            new_shape = [sum(new_sizes)]
-            # create resulting ndarray
-            result = self.__class__(new_shape, self.dtype, 0, new_target_offsets, new_target_ranks, no_allocation=True, **self.kwargs)
-            self.view.execute("{0} = tmp; del tmp".format(result.name), targets=result.target_ranks)
-            return result
-
-        if args == slice(None):
-            args = (slice(None),) * len(self.shape)
-
-        if not isinstance(args, list) and not isinstance(args, tuple):
-            args = (args,)
-
-        assert len(args) == len(self.shape),\
-            "number of arguments (%d) does not correspond to the dimension (%d)"\
-                 % (len(args), len(self.shape))
-
-        # wrap all integer indices
-        args = [(arg + s) % s if type(arg) is int else arg for arg, s in zip(args, self.shape)]
-
-        # shape of the new sliced ndarray
-        new_shape, clean_view = helper.view_of_shape(self.shape, args)
-
-        # if args is a list of indices then return a single data value
-        if not new_shape:
-            local_idx = list(args)
-            rank_idx_vector = []
-            for distaxis, target_offsets in zip(self.distaxes, self.target_offsets):
-                dist_idx = args[distaxis]
-                rank_idx_component = np.searchsorted(target_offsets, dist_idx, side="right") - 1
-                local_idx[distaxis] = dist_idx - target_offsets[rank_idx_component]
-                rank_idx_vector.append(rank_idx_component)
-
-            rank_idx = self.__get_linear_rank_idx(rank_idx_vector)
-            return self.view.pull("%s%s" % (self.name, repr(local_idx)), targets=self.target_ranks[rank_idx])
-
-        if all(type(clean_view[distaxis]) is int for distaxis in self.distaxes):
-            # return local array because all distributed axes have vanished
-            rank_idx_vector = []
-            for distaxis, target_offsets in zip(self.distaxes, self.target_offsets):
-                dist_idx = clean_view[distaxis]
-                rank_idx_component = np.searchsorted(target_offsets, dist_idx, side="right") - 1
-                clean_view[distaxis] = dist_idx - target_offsets[rank_idx_component]
-                rank_idx_vector.append(rank_idx_component)
-
-            rank_idx = self.__get_linear_rank_idx(rank_idx_vector)
-            self.view.execute("sliced = %s%s" % (self.name, repr(clean_view)), targets=self.target_ranks[rank_idx])
-            return self.view.pull("sliced", targets=self.target_ranks[rank_idx])
+    def __slicing_plan(self, args, clean_view):
+        # Return the name of the remote local slices, the distribution of the sliced array and
+        # a list of local slices for each engine. The latter is None if the plan already exists on engines.
+        normalized_view = tuple((v.start, v.stop, v.step) if type(v) is slice else v for v in clean_view)
+        key = (self.shape, self.distaxes, tuple(tuple(int(o) for o in offsets) for offsets in self.target_offsets),\
+            self.target_ranks, normalized_view)
+        plan = slicing_plans.get(key)
+        if plan is not None:
+            return plan + (None,)
 
         # determine properties of the new, sliced ndarray
         # keep these in mind when reading the following for loop
@@ -350,47 +337,208 @@ class DistributedGenericArray(object):
             rank_idx = self.__get_linear_rank_idx(rank_idx_vector)
             new_target_ranks.append(self.target_ranks[rank_idx])
 
-        # create resulting ndarray
-        result = self.__class__(new_shape, self.dtype, new_distaxes, new_target_offsets, new_target_ranks, no_allocation=True, **self.kwargs)
-
-        # remote slicing
+        # local slices on each participating engine
         local_args_list = []
         for idx in np.ndindex(*num_ranks_aa):
             local_slices = [local_slices_aa[i][idx[i]] for i in range(len(idx))]
-            local_args = list(args)
+            local_args = list(clean_view)
             for distaxis, distaxis_idx in zip(self.distaxes, range(len(self.distaxes))):
                 local_args[distaxis] = local_slices[distaxis_idx]
             local_args_list.append(local_args)
 
-        self.view.scatter('local_args', local_args_list, targets=result.target_ranks)
-        self.view.execute('%s = %s[local_args[0]]' % (result.name, self.name), targets=result.target_ranks)
+        global slicing_plan_id
+        plan = ('slicing_plan' + str(slicing_plan_id), new_distaxes, new_target_offsets, tuple(new_target_ranks))
+        slicing_plan_id += 1
+        slicing_plans[key] = plan
+
+        return plan + (local_args_list,)
+
+    def __getitem__(self, args):
+        if isinstance(args, expression.Expression):
+            args = args.evaluate()
+
+        # bitmask indexing
+        if isinstance(args, self.__class__) and args.dtype == bool:
+            bitmask = args
+            assert bitmask.shape == self.shape,\
+                "shape of bitmask (%s) does not correspond to shape of array (%s)"\
+                    % (str(bitmask.shape), str(self.shape))
+
+            bitmask = bitmask.dist_like(self) # equalize distribution if necessary
+
+            def mask_wrapper(array_name, bitmask_name, result_name, keep_empty=False):
+                result = globals()[array_name][globals()[bitmask_name]]
+                # engines without selected elements are left out of the result
+                if result.shape[0] > 0 or keep_empty:
+                    globals()[result_name] = result
+                return result.shape[0]
+
+            def mask_rebalance_wrapper(array_name, bitmask_name, result_name, dtype, ranks):
+                result, length = interengine.rebalanceArrayMPI(globals()[array_name][globals()[bitmask_name]],\
+                    0, [0], dtype, ranks, ranks)
+                if result is not None:
+                    globals()[result_name] = result
+                return length
+
+            # the distribution of the result is known after masking only
+            result = self.__class__([0], self.dtype, 0, [[0]], self.target_ranks, no_allocation=True, **self.kwargs)
+
+            if auto_rebalance:
+                ranks = [com.target2rank[target] for target in self.target_ranks]
+                lengths = kernels.apply(mask_rebalance_wrapper, self.target_ranks, self.name, bitmask.name,\
+                    result.name, self.dtype, ranks)
+                new_length = (lengths if self.view.block else lengths.get())[0]
+                new_target_offsets = interengine.even_offsets(new_length, len(self.target_ranks))
+                new_target_ranks = self.target_ranks[:len(new_target_offsets)]
+            else:
+                sizes = kernels.apply(mask_wrapper, self.target_ranks, self.name, bitmask.name, result.name)
+                sizes = sizes if self.view.block else sizes.get()
+                new_target_ranks = [rank for rank, size in zip(self.target_ranks, sizes) if size > 0]\
+                    or list(self.target_ranks[:1])
+                new_sizes = [size for size in sizes if size > 0] or [0]
+                new_length = sum(new_sizes)
+                new_target_offsets = list(np.cumsum([0] + new_sizes[:-1]))
+                if not any(size > 0 for size in sizes):
+                    kernels.apply(mask_wrapper, new_target_ranks, self.name, bitmask.name, result.name, True)
+
+            result.shape = (int(new_length),)
+            result.nbytes = np.dtype(result.dtype).itemsize * result.shape[0]
+            result.target_offsets = [new_target_offsets]
+            result.target_ranks = tuple(new_target_ranks)
+            return result
+
+        # integer-array indexing
+        components = self.__index_arrays(args)
+        if components is not None:
+            if any(hasattr(component, "target_ranks") for component in components):
+                return self.__exchange_points(components, False)
+            components = np.broadcast_arrays(*[np.asarray(component) for component in components])
+            points = np.column_stack([component.reshape(-1) for component in components])
+            return self.get_points(points).reshape(components[0].shape)
+
+        if args == slice(None):
+            args = (slice(None),) * len(self.shape)
+
+        if not isinstance(args, list) and not isinstance(args, tuple):
+            args = (args,)
+
+        assert len(args) == len(self.shape),\
+            "number of arguments (%d) does not correspond to the dimension (%d)"\
+                 % (len(args), len(self.shape))
+
+        # wrap all integer indices
+        args = [(arg + s) % s if type(arg) is int else arg for arg, s in zip(args, self.shape)]
+
+        # shape of the new sliced ndarray
+        new_shape, clean_view = helper.view_of_shape(self.shape, args)
+
+        # if args is a list of indices then return a single data value
+        if not new_shape:
+            local_idx = list(args)
+            rank_idx_vector = []
+            for distaxis, target_offsets in zip(self.distaxes, self.target_offsets):
+                dist_idx = args[distaxis]
+                rank_idx_component = np.searchsorted(target_offsets, dist_idx, side="right") - 1
+                local_idx[distaxis] = dist_idx - target_offsets[rank_idx_component]
+                rank_idx_vector.append(rank_idx_component)
+
+            rank_idx = self.__get_linear_rank_idx(rank_idx_vector)
+            value = self.view.pull("%s%s" % (self.name, repr(local_idx)), targets=self.target_ranks[rank_idx])
+            if not self.view.block:
+                return futures.Future([value], value.get)
+            return value
+
+        if all(type(clean_view[distaxis]) is int for distaxis in self.distaxes):
+            # return local array because all distributed axes have vanished
+            rank_idx_vector = []
+            for distaxis, target_offsets in zip(self.distaxes, self.target_offsets):
+                dist_idx = clean_view[distaxis]
+                rank_idx_component = np.searchsorted(target_offsets, dist_idx, side="right") - 1
+                clean_view[distaxis] = dist_idx - target_offsets[rank_idx_component]
+                rank_idx_vector.append(rank_idx_component)
+
+            rank_idx = self.__get_linear_rank_idx(rank_idx_vector)
+            self.view.execute("sliced = %s%s" % (self.name, repr(clean_view)), targets=self.target_ranks[rank_idx])
+            sliced = self.view.pull("sliced", targets=self.target_ranks[rank_idx])
+            if not self.view.block:
+                return futures.Future([sliced], sliced.get)
+            return sliced
+
+        # remote slicing
+        plan_name, new_distaxes, new_target_offsets, new_target_ranks, local_args_list = self.__slicing_plan(args, clean_view)
+        result = self.__class__(new_shape, self.dtype, new_distaxes, new_target_offsets, new_target_ranks, no_allocation=True, **self.kwargs)
+        result.version = self.version
+
+        if local_args_list is None:
+            kernels.execute("{0} = {1}[{2}]", result.target_ranks, (result.name, self.name, plan_name))
+        else:
+            # new plan: store local slices on engines
+            self.view.scatter('local_args', local_args_list, targets=result.target_ranks)
+            kernels.execute("{2} = local_args[0]; {0} = {1}[{2}]", result.target_ranks, (result.name, self.name, plan_name))
 
         return result
 
     def __setitem__(self, key, value):
-        self.local_copy_is_dirty = True
+        self.version.increment()
+        if isinstance(key, expression.Expression):
+            key = key.evaluate()
+
         # bitmask indexing
         if isinstance(key, self.__class__) and key.dtype == bool:
             bitmask = key.dist_like(self)
-            self.view.execute("%s[%s] = %s" % (repr(self), repr(bitmask), repr(value)), targets=self.target_ranks)
+            names = [repr(self), repr(bitmask)]
+            values = []
+            value_term = kernels.arguments([value], names, values)[0]
+            kernels.execute("{0}[{1}] = " + value_term, self.target_ranks, names, values)
+            return
+
+        # integer-array indexing
+        components = self.__index_arrays(key)
+        if components is not None:
+            if any(hasattr(component, "target_ranks") for component in components):
+                self.__exchange_points(components, False, value)
+                return
+            components = np.broadcast_arrays(*[np.asarray(component) for component in components])
+            points = np.column_stack([component.reshape(-1) for component in components])
+            value = helper.broadcast_to(np.asarray(value, dtype=self.dtype), components[0].shape)
+            self.set_points(points, value.reshape(-1))
             return
 
         # if args is [:] then assign value to the entire ndarray
         if key == slice(None):
+            # evaluate expression directly into self
+            if isinstance(value, expression.Expression):
+                value.evaluate(out=self)
+                return
+
             # assign local array to self
             if isinstance(value, self.__class__.local_arraytype):
+                if issubclass(self.__class__.local_arraytype, np.ndarray) and shm.available(self.target_ranks, value.nbytes):
+                    # each engine copies its part from shared memory
+                    filename, mapped = shm.create(value.shape, value.dtype)
+                    mapped[...] = value
+                    try:
+                        kernels.execute("shm.read(_v[0], _v[1], _v[2], _v[3][MPI.COMM_WORLD.Get_rank()], {0})",\
+                            self.target_ranks, (self.name,), (filename, value.dtype, value.shape, self.__rank_windows()))
+                    finally:
+                        shm.release(filename)
+                    return
+
                 subarrays = []
                 for target_offset_vector, target_shape in zip(self.target_offset_vectors(), self.target_shapes()):
                     window = [slice(start, start+length) for start, length in zip(target_offset_vector, target_shape)]
                     subarrays.append(value[window])
 
                 self.view.scatter("subarray", subarrays, targets=self.target_ranks)
-                self.view.execute("%s[:] = subarray[0]" % self.name, targets=self.target_ranks)
+                kernels.execute("{0}[:] = subarray[0]", self.target_ranks, (self.name,))
                 return
 
             # assign other array or value to self
             other = value.dist_like(self) if hasattr(value, "dist_like") else value
-            self.view.execute("%s[:] = %s" % (repr(self), repr(other)), targets=self.target_ranks)
+            names = [repr(self)]
+            values = []
+            other_term = kernels.arguments([other], names, values)[0]
+            kernels.execute("{0}[:] = " + other_term, self.target_ranks, names, values)
             return
 
         if not isinstance(key, list) and not isinstance(key, tuple):
@@ -406,20 +554,287 @@ class DistributedGenericArray(object):
             local_idx = [(i + s) % s for i, s in zip(local_idx, self.shape)]
             rank_idx_vector = []
             for distaxis, target_offsets in zip(self.distaxes, self.target_offsets):
-                dist_idx = key[distaxis]
+                dist_idx = local_idx[distaxis]
                 rank_idx_component = np.searchsorted(target_offsets, dist_idx, side="right") - 1
                 local_idx[distaxis] = dist_idx - target_offsets[rank_idx_component]
                 rank_idx_vector.append(rank_idx_component)
 
             rank_idx = self.__get_linear_rank_idx(rank_idx_vector)
-            self.view.push({'value' : value}, targets=self.target_ranks[rank_idx])
-            self.view.execute("%s%s = value" % (self.name, repr(local_idx)), targets=self.target_ranks[rank_idx])
+            kernels.execute("{0}[_v[0]] = _v[1]", self.target_ranks[rank_idx], (self.name,), (tuple(local_idx), value))
             return
 
         # assign value to sub-array of self
         sub_array = self[key]
         sub_array[:] = value
 
+    def __index_arrays(self, key):
+        # Returns the components of an integer-array index *key* or None if *key* is no such index.
+        # Lists are indices of a single element, not index arrays.
+        components = key if type(key) is tuple else (key,)
+        is_index_array = lambda component: (isinstance(component, np.ndarray) or hasattr(component, "target_ranks"))\
+            and component.dtype is not None and np.dtype(component.dtype).kind in "iu"
+        if not any(is_index_array(component) for component in components):
+            return None
+        assert len(components) == len(self.shape),\
+            "integer-array indexing needs an index array or integer for each of the %d axes. "\
+            "Use take() for flat indices." % len(self.shape)
+        assert all(is_index_array(component) or type(component) in (int, long) for component in components),\
+            "integer-array indexing cannot be combined with slices"
+        return components
+
+    def __point_parts(self, points, *columns):
+        # Bucket *points*, a (N, ndim) array of global coordinates, by their owning engine.
+        # Returns the sort order of the points and a list of (target, local points, column parts...).
+        owners, local_points = helper.point_owners(points, self.distaxes, self.target_offsets)
+        order = np.argsort(owners, kind='mergesort')
+        bounds = np.searchsorted(owners[order], np.arange(len(self.target_ranks) + 1))
+        parts = [(target, local_points[order[begin:end]]) + tuple(column[order[begin:end]] for column in columns)\
+            for target, begin, end in zip(self.target_ranks, bounds[:-1], bounds[1:]) if end > begin]
+        return order, parts
+
+    def get_points(self, points):
+        """Reads the elements at *points* at once. The points are bucketed by their owning :term:`engine` on the
+        client, so that each engine holding any of them receives its points in one message and returns its values
+        in one reply, regardless of the number of points. Use this instead of a loop over ``a[i, j, k]``.
+
+        :param points: (N, ndim) integer array of coordinates. Negative coordinates count from the end.
+        :return: *numpy-array* of the N values in the order of *points*
+        :raises IndexError: if a coordinate is out of bounds.
+        """
+        def get_points_wrapper(array_name):
+            local_points = globals().pop("points")[0]
+            return globals()[array_name][tuple(local_points.T)]
+
+        points = helper.wrap_points(points, self.shape)
+        assert points.shape[1] == len(self.shape),\
+            "points need %d coordinates, got %d" % (len(self.shape), points.shape[1])
+        order, parts = self.__point_parts(points)
+
+        result = np.empty(len(points), dtype=self.dtype)
+        if not parts:
+            return result
+        targets = [part[0] for part in parts]
+        self.view.scatter("points", [part[1] for part in parts], targets=targets)
+        values = kernels.apply(get_points_wrapper, targets, self.name)
+        result[order] = np.concatenate(values if self.view.block else values.get())
+        return result
+
+    def set_points(self, points, values):
+        """Writes *values* to the elements at *points* at once. Like :meth:`get_points` each :term:`engine` holding
+        any of the points receives its points and values in one message.
+
+        :param points: (N, ndim) integer array of coordinates. Negative coordinates count from the end.
+        :param values: scalar or N values in the order of *points*
+        :raises IndexError: if a coordinate is out of bounds.
+        """
+        self.version.increment()
+        points = helper.wrap_points(points, self.shape)
+        assert points.shape[1] == len(self.shape),\
+            "points need %d coordinates, got %d" % (len(self.shape), points.shape[1])
+        values = helper.broadcast_to(np.asarray(values, dtype=self.dtype), (len(points),))
+        order, parts = self.__point_parts(points, values)
+        if not parts:
+            return
+        targets = [part[0] for part in parts]
+        self.view.scatter("points", [part[1:] for part in parts], targets=targets)
+        kernels.execute("{0}[tuple(points[0][0].T)] = points[0][1]; del points", targets, (self.name,))
+
+    def __exchange_points(self, components, flat, value=None):
+        # Read (*value* is None) or write the elements at the points given by distributed index arrays among
+        # *components*. The points are routed to their owners by MPI (see interengine.exchangePointsMPI),
+        # the client sends the metadata only. The result is distributed like the first index array.
+        def points_wrapper(array_name, index_names, flat, shape, dtype, distaxes, target_offsets, owner_ranks,\
+            ranks, result_name, value):
+            local_indices = [globals().get(name) if isinstance(name, str) else name for name in index_names]
+            local_arrays = [index for index in local_indices if isinstance(index, np.ndarray)]
+            index_shape = local_arrays[0].shape if local_arrays else (0,)
+            coords = [interengine.helper.broadcast_to(index, index_shape).reshape(-1) for index in local_indices]
+            if flat:
+                size = int(np.prod(shape))
+                coords = np.unravel_index(np.where(coords[0] < 0, coords[0] + size, coords[0]), shape)
+            points = interengine.helper.wrap_points(np.column_stack(coords).reshape(-1, len(shape)), shape)
+
+            if value is not None:
+                local_value = globals().get(value) if isinstance(value, str) else value
+                local_value = interengine.helper.broadcast_to(np.asarray(local_value, dtype=dtype), index_shape).reshape(-1)
+                interengine.exchangePointsMPI(globals().get(array_name), points, dtype, distaxes, target_offsets,\
+                    owner_ranks, ranks, local_value)
+                return
+            result = interengine.exchangePointsMPI(globals().get(array_name), points, dtype, distaxes,\
+                target_offsets, owner_ranks, ranks)
+            if local_arrays:
+                globals()[result_name] = result.reshape(index_shape)
+
+        def distribute_like(array, dtype):
+            # local *array*, broadcast to the shape of *first*, as an array distributed like *first*
+            result = first.__class__(first.shape, dtype, first.distaxes, first.target_offsets, first.target_ranks,\
+                **first.kwargs)
+            result[:] = helper.broadcast_to(np.asarray(array, dtype=dtype), first.shape)
+            return result
+
+        first = [component for component in components if hasattr(component, "target_ranks")][0]
+        components = [component.dist_like(first) if hasattr(component, "target_ranks") else\
+            (component if type(component) in (int, long) else distribute_like(component, np.int64))\
+            for component in components]
+        index_names = [repr(component) if hasattr(component, "target_ranks") else component for component in components]
+
+        result = None
+        if value is None:
+            result = self.__class__(first.shape, self.dtype, first.distaxes, first.target_offsets, first.target_ranks,\
+                no_allocation=True, **self.kwargs)
+        elif hasattr(value, "target_ranks"):
+            assert value.shape == first.shape,\
+                "shape of values %s does not match the shape of the index arrays %s" % (str(value.shape), str(first.shape))
+            value = repr(value.dist_like(first))
+        elif np.ndim(value) > 0:
+            value = repr(distribute_like(value, self.dtype))
+
+        targets = list(first.target_ranks) + [target for target in self.target_ranks if target not in first.target_ranks]
+        ranks = [com.target2rank[target] for target in targets]
+        owner_ranks = [com.target2rank[target] for target in self.target_ranks]
+        kernels.apply(points_wrapper, targets, self.name, index_names, flat, self.shape, self.dtype, self.distaxes,\
+            self.target_offsets, owner_ranks, ranks, result.name if result is not None else None, value)
+        return result
+
+    def take(self, indices):
+        """Takes the elements at the flat *indices* like *numpy.take* without *axis*.
+
+        The indices are routed to the :term:`engines <engine>` owning the elements in a single batched step
+        and the values are returned in the order of *indices*:
+
+            - local indices (*numpy-array* or list): the client sends each engine its indices at once and receives
+              the values. The result is a *numpy-array* of the shape of *indices*.
+            - distributed indices: the engines exchange the indices and values among each other by MPI.
+              The result is a distributed array, distributed like *indices*.
+
+        Integer-array indexing with one index array per axis, e.g. ``a[i, j]``, works the same way.
+
+        :param indices: flat indices into this array. Negative indices count from the end.
+        :raises IndexError: if an index is out of bounds.
+        """
+        if hasattr(indices, "target_ranks"):
+            return self.__exchange_points([indices], True)
+        indices = np.asarray(indices, dtype=np.int64)
+        size = int(np.prod(self.shape))
+        flat = np.where(indices < 0, indices + size, indices).reshape(-1)
+        if np.any((flat < 0) | (flat >= size)):
+            raise IndexError("index out of bounds for size %d" % size)
+        points = np.column_stack(np.unravel_index(flat, self.shape)).reshape(-1, len(self.shape))
+        return self.get_points(points).reshape(indices.shape)
+
+    def __rank_windows(self):
+        # map the MPI rank of each engine to the window of its local array
+        windows = {}
+        for target, target_offset_vector, target_shape \
+            in zip(self.target_ranks, self.target_offset_vectors(), self.target_shapes()):
+            windows[com.target2rank[target]] = [slice(start, start+length) for start, length in zip(target_offset_vector, target_shape)]
+        return windows
+
+    def rebalance(self, targets=None):
+        """Redistributes the elements evenly across *targets* along the distributed axis, e.g. after bitmask indexing.
+        The local arrays are exchanged by a single *MPI.Alltoallv* among the :term:`engines <engine>`.
+
+        :param ints targets: :term:`engines <engine>` the result is distributed across. Defaults to the engines of
+            this array. Engines are left out if there are less elements than engines.
+        :return: new array of the same class
+        :raises AssertionError: if the array is distributed along more than one axis.
+        """
+        assert len(self.distaxes) == 1, "rebalance requires exactly one distributed axis"
+        if targets is None:
+            targets = self.target_ranks
+        axis = self.distaxes[0]
+
+        def rebalance_wrapper(array_name, result_name, axis, shape, dtype, src_ranks, dest_ranks):
+            result, length = interengine.rebalanceArrayMPI(globals().get(array_name), axis, shape, dtype, src_ranks, dest_ranks)
+            if result is not None:
+                globals()[result_name] = result
+
+        new_target_offsets = interengine.even_offsets(self.shape[axis], len(targets))
+        new_target_ranks = tuple(targets[:len(new_target_offsets)])
+        result = self.__class__(self.shape, self.dtype, axis, [new_target_offsets], new_target_ranks,\
+            no_allocation=True, **self.kwargs)
+
+        src_ranks = [com.target2rank[target] for target in self.target_ranks]
+        dest_ranks = [com.target2rank[target] for target in targets]
+        all_targets = list(self.target_ranks) + [target for target in targets if target not in self.target_ranks]
+        kernels.apply(rebalance_wrapper, all_targets, self.name, result.name, axis, self.shape, self.dtype,\
+            src_ranks, dest_ranks)
+        return result
+
+    def exchange_halos(self, width=1, periodic=False):
+        """Creates a copy of each local array extended by ghost layers of *width* elements on both sides of each
+        axis. Along distributed axes the ghost layers hold the adjacent elements of the neighbouring
+        :term:`engines <engine>`. Thus code working on the extended local arrays does not depend on the distribution.
+        On :term:`engine` the extended local array is named ``<name>_ghosts``, e.g. ``dist_array3_ghosts``.
+        Example: ::
+
+            field.exchange_halos(width=1)
+            # on engine: dist_array3_ghosts[1:-1, 1:-1] is the local array of the 2-d *field*
+
+        Ghost layers are not updated automatically, call this method again after modifying the array.
+        See also :func:`pyDive.algorithm.stencil_map`.
+
+        :param ints width: width of the ghost layers. Either a single integer or one integer per axis.
+        :param bools periodic: if ``True`` the upper end of an axis is adjacent to its lower end. Otherwise
+            the ghost layers at the ends repeat the outermost elements. Either a single bool or one bool per axis.
+        :raises AssertionError: if a ghost layer is wider than a neighbouring local array.
+        """
+        widths = list(width) if type(width) in (list, tuple) else [width] * len(self.shape)
+        periodic = list(periodic) if type(periodic) in (list, tuple) else [periodic] * len(self.shape)
+        assert len(widths) == len(self.shape) and len(periodic) == len(self.shape),\
+            "width and periodic need one value per axis"
+        target_shapes = self.target_shapes()
+        for axis, w in enumerate(widths):
+            assert 0 <= w <= min(shape[axis] for shape in target_shapes),\
+                "ghost layers ({0}) are wider than a local array along axis {1}".format(w, axis)
+
+        def halo_wrapper(array_name, plan_name, widths):
+            ghosts_name = array_name + "_ghosts"
+            globals()[ghosts_name] = interengine.exchangeHalosMPI(globals()[array_name], globals().get(ghosts_name),\
+                range(len(widths)), widths, globals()[plan_name][0])
+
+        kernels.apply(halo_wrapper, self.target_ranks, self.name, self.__halo_plan(periodic), widths)
+        self.ghost_width = tuple(widths)
+
+    def __halo_plan(self, periodic):
+        # Return the remote name of the MPI ranks of the lower and upper neighbour of each engine along each axis.
+        global halo_plan_id
+        key = (self.shape, self.__distribution_key(), tuple(periodic))
+        plan = halo_plans.get(key)
+        if plan is not None:
+            return plan[0]
+
+        num_targets = [len(target_offsets_axis) for target_offsets_axis in self.target_offsets]
+        neighbours = []
+        for target, rank_idx_vector in zip(self.target_ranks, np.ndindex(*num_targets)):
+            neighbours_axes = []
+            for axis in range(len(self.shape)):
+                if axis not in self.distaxes:
+                    # the engine is its own neighbour
+                    rank = com.target2rank[target] if periodic[axis] else None
+                    neighbours_axes.append((rank, rank))
+                    continue
+                i = self.distaxes.index(axis)
+                neighbours_axis = []
+                for step in (-1, 1):
+                    neighbour_idx_vector = list(rank_idx_vector)
+                    neighbour_idx_vector[i] += step
+                    if not 0 <= neighbour_idx_vector[i] < num_targets[i]:
+                        if not periodic[axis]:
+                            neighbours_axis.append(None)
+                            continue
+                        neighbour_idx_vector[i] %= num_targets[i]
+                    neighbour = self.target_ranks[self.__get_linear_rank_idx(neighbour_idx_vector)]
+                    neighbours_axis.append(com.target2rank[neighbour])
+                neighbours_axes.append(tuple(neighbours_axis))
+            neighbours.append(neighbours_axes)
+
+        plan = ('halo_plan' + str(halo_plan_id), self.target_ranks)
+        halo_plan_id += 1
+        self.view.scatter(plan[0], neighbours, targets=self.target_ranks)
+        halo_plans[key] = plan
+        return plan[0]
+
     def __str__(self):
         return self.gather().__str__()
 
@@ -428,10 +843,19 @@ class DistributedGenericArray(object):
 
     @property
     def local_copy(self):
-        if not hasattr(self, "_local_copy") or self.local_copy_is_dirty:
-            self._local_copy = self.gather()
-            self.local_copy_is_dirty = False
-        return self._local_copy
+        """Copy of the whole array on the client. The copy is cached until the array or any array sharing its
+        memory is modified. The cache is limited to :obj:`local_copy_bytes`."""
+        entry = local_copies.get(self.name)
+        if entry is not None and entry[0] == self.version.value:
+            return entry[1]
+        version = self.version.value
+        copy = self.gather()
+        local_copies.maxbytes = local_copy_bytes
+        if self.nbytes <= local_copy_bytes:
+            local_copies[self.name] = (version, copy, self.nbytes)
+        else:
+            local_copies.pop(self.name)
+        return copy
 
     def __getattr__(self, name):
         """If the requested attribute is an attribute of the local array and not of this array then
@@ -442,32 +866,209 @@ class DistributedGenericArray(object):
 
         return getattr(self.local_copy, name)
 
-    def gather(self):
+    def gather(self, out=None, mode=None):
         """Gathers local instances of {local_arraytype_name} from *engines*, concatenates them and returns
         the result.
 
         .. note:: You may not call this method explicitly because if you try to access an attribute
             of the local array ({local_arraytype_name}), ``gather()`` is called implicitly before the request is forwarded
             to that internal gathered array. Just access attributes like you do for the local array.
-            The internal copy is held until ``__setitem__`` is called, e.g. ``a[1] = 3.0``, setting
-            a dirty flag to the local copy.
-
-        .. warning:: If another array overlapping this array is manipulating its data there is no chance to set
-            the dirty flag so you have to keep in mind to call ``gather()`` explicitly in this case!
-
-        :return: instance of {local_arraytype_name}
+            The internal copy is cached on the client until this array or any array sharing its memory,
+            e.g. a slice, is modified (see :obj:`local_copy_bytes`).
+
+        .. warning:: Modifications on the engines which bypass pyDive, e.g. by ``view.execute``, are not tracked.
+            Call ``version.increment()`` of the array afterwards.
+
+        :param out: array of the same shape the result is written into. If ``None`` a new array is allocated.
+        :param str mode: 'pull': the local arrays are pulled one by one and concatenated on the client.
+            'mpi': the array is assembled on the first engine by MPI and transferred to the client in a single message.
+            'shm': the engines write their local arrays into shared memory (see :mod:`pyDive.distribution.shm`).
+            'mpi' and 'shm' are only available for numpy local arrays. Defaults to 'shm' if available, otherwise 'pull'.
+        :return: instance of {local_arraytype_name} or *out*. Within :func:`pyDive.futures.nonblocking` a
+            :class:`pyDive.futures.Future` of it.
         """
-        local_arrays = self.view.pull(self.name, targets=self.target_ranks)
+        numpy_local = issubclass(self.__class__.local_arraytype, np.ndarray)
+        if mode is None:
+            mode = 'shm' if numpy_local and shm.available(self.target_ranks, self.nbytes) else 'pull'
+        assert mode in ('pull', 'mpi', 'shm'), "unknown gather mode: " + str(mode)
+        assert out is None or tuple(out.shape) == self.shape,\
+            "Shapes do not match: " + str(tuple(out.shape)) + " <-> " + str(self.shape)
+        assert mode == 'pull' or numpy_local,\
+            "gather mode '{0}' requires numpy local arrays, not {1}".format(mode, self.__class__.local_arraytype.__name__)
+
+        if mode == 'shm':
+            assert self.view.block, "gather mode 'shm' requires a blocking view"
+            filename, mapped = shm.create(self.shape, self.dtype)
+            try:
+                kernels.execute("shm.write(_v[0], _v[1], _v[2], _v[3][MPI.COMM_WORLD.Get_rank()], {0})",\
+                    self.target_ranks, (self.name,), (filename, self.dtype, self.shape, self.__rank_windows()))
+            finally:
+                shm.release(filename)
+            return self.__store(np.asarray(mapped), out)
+
+        if mode == 'mpi':
+            def gather_wrapper(array_name, shape, offset_vectors, local_shapes, targets):
+                return interengine.gatherArrayMPI(globals()[array_name], shape, offset_vectors, local_shapes,\
+                    [target2rank[target] for target in targets], target2rank[targets[0]])
+
+            results = kernels.apply(gather_wrapper, self.target_ranks, self.name, self.shape,\
+                self.target_offset_vectors(), self.target_shapes(), self.target_ranks)
+            finish = lambda results: self.__store(results[0], out)
+        else:
+            results = self.view.pull(self.name, targets=self.target_ranks)
+            finish = lambda results: self.__assemble(results, out)
+
+        if not self.view.block:
+            return futures.Future([results], lambda: finish(results.get()))
+        return finish(results)
 
-        result = self.__class__.local_arraytype(shape=self.shape, dtype=self.dtype, **self.kwargs)
+    def __assemble(self, local_arrays, out=None):
+        # concatenate the local arrays of all engines
+        if out is None:
+            out = self.__class__.local_arraytype(shape=self.shape, dtype=self.dtype, **self.kwargs)
 
         for target_offset_vector, target_shape, local_array \
             in zip(self.target_offset_vectors(), self.target_shapes(), local_arrays):
 
             window = [slice(start, start+length) for start, length in zip(target_offset_vector, target_shape)]
-            result[window] = local_array
-
-        return result
+            out[window] = local_array
+
+        return out
+
+    def __store(self, array, out=None):
+        if out is None:
+            return array
+        out[...] = array
+        return out
+
+    def __gather_windows(self, max_bytes, order):
+        # windows of at most *max_bytes* each covering the array, the first axis of *order* varying slowest
+        ndim = len(self.shape)
+        order = range(ndim) if order is None else [(axis + ndim) % ndim for axis in order]
+        assert sorted(order) == range(ndim), "order must be a permutation of the axes: " + str(order)
+
+        block_shape = [1] * ndim
+        elements = max(1, max_bytes // np.dtype(self.dtype).itemsize)
+        for axis in order[::-1]:
+            block_shape[axis] = max(1, min(self.shape[axis], elements))
+            elements = max(1, elements // block_shape[axis])
+
+        begins = [range(0, self.shape[axis], block_shape[axis]) for axis in order]
+        for begin in itertools.product(*begins):
+            window = [None] * ndim
+            for axis, start in zip(order, begin):
+                window[axis] = slice(start, min(start + block_shape[axis], self.shape[axis]))
+            yield tuple(window)
+
+    def __window_pieces(self, window):
+        # engines holding parts of the global *window* (tuple of slices of step one), the local windows keyed by
+        # MPI rank and the windows of the parts within *window*
+        targets, local_windows, block_windows = [], {}, []
+        for target, offset_vector, target_shape in zip(self.target_ranks, self.target_offset_vectors(),\
+            self.target_shapes()):
+
+            begins = [max(w.start, offset) for w, offset in zip(window, offset_vector)]
+            ends = [min(w.stop, offset + length) for w, offset, length in zip(window, offset_vector, target_shape)]
+            if any(begin >= end for begin, end in zip(begins, ends)):
+                continue
+            targets.append(target)
+            local_windows[com.target2rank[target]] =\
+                tuple(slice(begin - offset, end - offset) for begin, end, offset in zip(begins, ends, offset_vector))
+            block_windows.append(\
+                tuple(slice(begin - w.start, end - w.start) for begin, end, w in zip(begins, ends, window)))
+        return targets, local_windows, block_windows
+
+    def iter_gather(self, max_bytes=2**26, order=None, prefetch=True):
+        """Gathers the array block by block so that the client never holds the whole array.
+        While a block is processed the next one is already on its way.
+
+        :param int max_bytes: maximum number of bytes of the blocks held on the client at a time. While a block
+            is assembled from the pulled parts the caller may still hold the previous block, so blocks take at most
+            a third of *max_bytes*. A single element is the smallest block.
+        :param ints order: axes from the slowest to the fastest varying one while iterating. Blocks are cut
+            from the slowest axes. Defaults to ``range(ndim)``, i.e. blocks are contiguous in C order.
+        :param bool prefetch: if ``True`` the next block is requested before the current block is returned.
+        :return: generator of tuples of the global window (tuple of slices) and the block as
+            instance of {local_arraytype_name}.
+
+        Example: ::
+
+            for window, block in fieldE.iter_gather(max_bytes=2**30, order=(2, 0, 1)):
+                print window, block.max()
+        """
+        def window_wrapper(array_name, local_windows):
+            return globals()[array_name][local_windows[MPI.COMM_WORLD.Get_rank()]]
+
+        def request(window):
+            # the local windows are computed on the client, so no slicing plans are created for the blocks
+            targets, local_windows, block_windows = self.__window_pieces(window)
+            return window, block_windows, kernels.apply(window_wrapper, targets, self.name, local_windows)
+
+        def assemble(window, block_windows, pieces):
+            if not isinstance(pieces, list):
+                pieces = pieces.get()
+            shape = tuple(w.stop - w.start for w in window)
+            if len(pieces) == 1 and pieces[0].shape == shape:
+                return pieces[0]
+            block = self.__class__.local_arraytype(shape=shape, dtype=self.dtype, **self.kwargs)
+            for block_window, piece in zip(block_windows, pieces):
+                block[block_window] = piece
+            return block
+
+        windows = self.__gather_windows(max_bytes // 3, order)
+        window = next(windows, None)
+        pending = None
+        while window is not None:
+            if pending is None:
+                pending = request(window)
+            block = assemble(*pending)
+            # drop the pulled parts before the next ones arrive
+            pending = None
+            next_window = next(windows, None)
+            if prefetch and next_window is not None:
+                with futures.nonblocking():
+                    pending = request(next_window)
+            yield window, block
+            window = next_window
+
+    def gather_to(self, out, max_bytes=2**26, dataset="data"):
+        """Gathers the array block by block (see :meth:`iter_gather`) directly into client-side storage,
+        e.g. a file larger than the client's memory.
+
+        :param out: array-like object of the same shape supporting slice assignment, e.g. a *numpy.memmap* or
+            a *h5py* dataset, or a file name. For a file name ending with '.h5' or '.hdf5' the HDF5 dataset
+            *dataset* is created (requires *h5py*), for '.npy' a *numpy* file and otherwise a raw binary file
+            (see *numpy.memmap*).
+        :param int max_bytes: maximum number of bytes of the blocks held on the client at a time.
+        :param str dataset: name of the dataset created in a new HDF5 file.
+        :return: *out*, the *numpy.memmap* of the created file or, for HDF5 files, which are closed, ``None``.
+        """
+        h5file = None
+        if isinstance(out, basestring):
+            extension = os.path.splitext(out)[1].lower()
+            if extension in (".h5", ".hdf5"):
+                import h5py
+                h5file = h5py.File(out, 'a')
+                out = h5file.create_dataset(dataset, shape=self.shape, dtype=self.dtype)
+            elif extension == ".npy":
+                out = np.lib.format.open_memmap(out, mode='w+', dtype=self.dtype, shape=self.shape)
+            else:
+                out = np.memmap(out, dtype=self.dtype, mode='w+', shape=self.shape)
+        assert tuple(out.shape) == self.shape,\
+            "Shapes do not match: " + str(tuple(out.shape)) + " <-> " + str(self.shape)
+
+        try:
+            for window, block in self.iter_gather(max_bytes):
+                out[window] = block
+        finally:
+            if h5file is not None:
+                h5file.close()
+
+        if h5file is not None:
+            return None
+        if hasattr(out, "flush"):
+            out.flush()
+        return out
 
     def copy(self):
         """Returns a hard copy of this array.
@@ -475,7 +1076,7 @@ class DistributedGenericArray(object):
         assert self.__class__.may_allocate == True, "{0} is not allowed to allocate new memory.".format(self.__class__.__name__)
 
         result = self.__class__(self.shape, self.dtype, self.distaxes, self.target_offsets, self.target_ranks, no_allocation=True, **self.kwargs)
-        self.view.execute("%s = %s.copy()" % (result.name, self.name), targets=self.target_ranks)
+        kernels.execute("{0} = {1}.copy()", self.target_ranks, (result.name, self.name))
         return result
 
     def is_distributed_like(self, other):
@@ -507,6 +1108,26 @@ class DistributedGenericArray(object):
 
         assert self.__class__.may_allocate, "{0} is not allowed to allocate new memory.".format(self.__class__.__name__)
 
+        schedule_name = self.__redistribution(other)
+
+        # result ndarray
+        result = self.__class__(self.shape, self.dtype, other.distaxes, other.target_offsets, other.target_ranks, False, **self.kwargs)
+
+        self.__class__.interengine_copier(self, result, schedule_name)
+
+        return result
+
+    def __distribution_key(self):
+        return (self.distaxes, tuple(tuple(int(o) for o in offsets) for offsets in self.target_offsets), self.target_ranks)
+
+    def __redistribution(self, other):
+        # Return the remote name of the communication schedule redistributing *self* like *other*.
+        # On each engine the schedule is a pair of lists of (partner, window, tag) for sending and receiving.
+        key = (self.shape, self.__distribution_key(), other.__distribution_key())
+        schedule = redistributions.get(key)
+        if schedule is not None:
+            return schedule[0]
+
         # todo: optimization -> helper.common_decomposition should be a generator
         common_axes, common_offsets, common_idx_pairs = \
             helper.common_decomposition(self.distaxes, self.target_offsets, other.distaxes, other.target_offsets, self.shape)
@@ -556,17 +1177,276 @@ class DistributedGenericArray(object):
 
             tag += 1
 
-        # push communication meta-data to engines
-        self.view.scatter('src_commData', my_commData.values(), targets=my_commData.keys())
-        self.view.scatter('dest_commData', other_commData.values(), targets=other_commData.keys())
+        return self.__push_schedule(key, my_commData, other_commData)
 
-        # result ndarray
-        result = self.__class__(self.shape, self.dtype, other.distaxes, other.target_offsets, other.target_ranks, False, **self.kwargs)
+    def __push_schedule(self, key, my_commData, other_commData):
+        # push communication meta-data to engines and cache it under *key*
+        global redistribution_id
+        targets = sorted(set(my_commData.keys()) | set(other_commData.keys()))
+        schedule = ('redistribution' + str(redistribution_id), tuple(targets))
+        redistribution_id += 1
+        self.view.scatter(schedule[0], [(my_commData[target], other_commData[target]) for target in targets], targets=targets)
+        redistributions[key] = schedule
+        return schedule[0]
+
+    def __ranges(self):
+        # [begin, end) of the local arrays along each axis for each engine, ordered like *target_ranks*
+        num_targets = [len(target_offsets_axis) for target_offsets_axis in self.target_offsets]
+        ranges = []
+        for rank_idx_vector in np.ndindex(*num_targets): # last dimension is iterated over first
+            target_ranges = [(0, s) for s in self.shape]
+            for i, distaxis in enumerate(self.distaxes):
+                offsets = list(self.target_offsets[i]) + [self.shape[distaxis]]
+                target_ranges[distaxis] = (int(offsets[rank_idx_vector[i]]), int(offsets[rank_idx_vector[i]+1]))
+            ranges.append(target_ranges)
+        return ranges
+
+    def __shift_schedule(self, result, displacements, wrap):
+        # Return the remote name of the schedule copying the element *p - displacements* of *self* into the
+        # element *p* of *result*. Along axes with *wrap* the source index is taken modulo the axis length,
+        # along the others elements without source are left out.
+        key = (self.shape, self.__distribution_key(), result.shape, result.__distribution_key(),\
+            tuple(displacements), tuple(wrap))
+        schedule = redistributions.get(key)
+        if schedule is not None:
+            return schedule[0]
+
+        def segments(begin, end, d, n, wrap):
+            # pieces of [begin, end) whose source index p - d lies within [0, n) as (begin, end, source begin)
+            result = []
+            p = begin
+            while p < end and n > 0:
+                x = p - d
+                if wrap:
+                    x %= n
+                elif x < 0:
+                    p = d
+                    continue
+                elif x >= n:
+                    break
+                length = min(end - p, n - x)
+                result.append((p, p + length, x))
+                p += length
+            return result
+
+        src_ranges = self.__ranges()
+        src_offsets = [list(self.target_offsets[i]) for i in range(len(self.distaxes))]
+        num_src_targets = [len(offsets) for offsets in src_offsets]
+
+        my_commData = defaultdict(list)
+        other_commData = defaultdict(list)
+        tag = 0
+        for dest_target, dest_ranges in zip(result.target_ranks, result.__ranges()):
+            axes_segments = [segments(begin, end, d, n, w) for (begin, end), d, n, w\
+                in zip(dest_ranges, displacements, self.shape, wrap)]
+            for box in itertools.product(*axes_segments):
+                # engines of *self* holding a part of the box
+                candidates = []
+                for i, distaxis in enumerate(self.distaxes):
+                    begin, end, x = box[distaxis]
+                    first = np.searchsorted(src_offsets[i], x, side="right") - 1
+                    last = np.searchsorted(src_offsets[i], x + end - begin, side="left") - 1
+                    candidates.append(range(first, last + 1))
+                for src_rank_idx_vector in itertools.product(*candidates):
+                    src_idx = self.__get_linear_rank_idx(src_rank_idx_vector)
+                    my_window = []
+                    other_window = []
+                    for axis, (begin, end, x) in enumerate(box):
+                        src_begin, src_end = src_ranges[src_idx][axis]
+                        lo, hi = max(x, src_begin), min(x + end - begin, src_end)
+                        my_window.append(slice(lo - src_begin, hi - src_begin))
+                        other_window.append(slice(lo + begin - x - dest_ranges[axis][0], hi + begin - x - dest_ranges[axis][0]))
+                    if any(w.stop <= w.start for w in my_window):
+                        continue
+                    src_target = self.target_ranks[src_idx]
+                    my_commData[src_target].append((dest_target, my_window, tag))
+                    other_commData[dest_target].append((src_target, other_window, tag))
+                    tag += 1
+
+        return self.__push_schedule(key, my_commData, other_commData)
+
+    def __shifted(self, shape, distaxes, target_offsets, displacements, wrap):
+        # new array of *shape*, distributed along *distaxes* across the engines of *self*,
+        # whose element *p* is the element *p - displacements* of *self*
+        assert self.__class__.may_allocate, "{0} is not allowed to allocate new memory.".format(self.__class__.__name__)
+        result = self.__class__(shape, self.dtype, distaxes, target_offsets, self.target_ranks, **self.kwargs)
+        self.__class__.interengine_copier(self, result, self.__shift_schedule(result, displacements, wrap))
+        return result
+
+    def __axes_values(self, axis, values):
+        # one value per axis from *values* given for *axis*
+        if type(axis) not in (list, tuple):
+            axis, values = (axis,), (values,)
+        elif type(values) not in (list, tuple):
+            values = (values,) * len(axis)
+        assert len(axis) == len(values), "one value per axis is required"
+        result = [0] * len(self.shape)
+        for a, v in zip(axis, values):
+            result[(a + len(self.shape)) % len(self.shape)] += v
+        return result
+
+    def roll(self, shift, axis):
+        """Rolls the elements along *axis* like *numpy.roll*. Elements that roll beyond the last position
+        are re-introduced at the first. Only the elements crossing the boundaries of the local arrays are sent
+        to the neighbouring :term:`engines <engine>`, the rest is copied locally.
+
+        :param ints shift: number of places by which elements are shifted. Either a single integer or one per axis.
+        :param ints axis: axis or axes along which elements are shifted.
+        :return: new array, distributed like this array.
+        """
+        displacements = self.__axes_values(axis, shift)
+        return self.__shifted(self.shape, self.distaxes, self.target_offsets, displacements, [True] * len(self.shape))
+
+    def shift(self, shift, axis, fill_value=0):
+        """Shifts the elements along *axis* like :meth:`roll` but fills the places of elements without source
+        with *fill_value* instead of re-introducing the elements that are shifted beyond the last position.
+
+        :param ints shift: number of places by which elements are shifted. Either a single integer or one per axis.
+        :param ints axis: axis or axes along which elements are shifted.
+        :param fill_value: value of the places without source element
+        :return: new array, distributed like this array.
+        """
+        displacements = self.__axes_values(axis, shift)
+        result = self.__shifted(self.shape, self.distaxes, self.target_offsets, displacements, [False] * len(self.shape))
+        for axis, d in enumerate(displacements):
+            if d == 0:
+                continue
+            window = [slice(None)] * len(self.shape)
+            window[axis] = slice(0, min(d, self.shape[axis])) if d > 0 else slice(max(0, self.shape[axis] + d), None)
+            result[tuple(window)] = fill_value
+        return result
+
+    def pad(self, pad_width, mode="constant", constant_values=0):
+        """Pads the array like *numpy.pad*. The padding is added to the local arrays of the first and the last
+        :term:`engines <engine>` along each axis, so that all other elements stay on their engine.
+
+        :param ints pad_width: number of elements added before and after each axis. Either a single integer,
+            a pair of integers for all axes or one pair per axis.
+        :param str mode: one of
+
+            - 'constant': pads with *constant_values*
+            - 'edge': pads with the outermost elements
+            - 'wrap': pads with the elements at the other end of the axis
+        :param constant_values: value of the padding in 'constant' mode
+        :return: new array, distributed across the engines of this array.
+        """
+        assert mode in ("constant", "edge", "wrap"), "unsupported mode '{0}'".format(mode)
+        pad_width = helper.broadcast_to(np.asarray(pad_width, dtype=int), (len(self.shape), 2))
+        befores = [int(before) for before in pad_width[:,0]]
+        new_shape = [s + int(before) + int(after) for s, (before, after) in zip(self.shape, pad_width)]
+        new_target_offsets = [[0] + [int(offset) + befores[distaxis] for offset in self.target_offsets[i][1:]]\
+            for i, distaxis in enumerate(self.distaxes)]
+
+        if mode == "wrap":
+            return self.__shifted(new_shape, self.distaxes, new_target_offsets, befores, [True] * len(self.shape))
 
-        self.__class__.interengine_copier(self, result)
+        assert self.__class__.may_allocate, "{0} is not allowed to allocate new memory.".format(self.__class__.__name__)
+        result = self.__class__(new_shape, self.dtype, self.distaxes, new_target_offsets, self.target_ranks, **self.kwargs)
+        if mode == "constant":
+            kernels.execute("{0}.fill(_v[0])", result.target_ranks, (result.name,), (constant_values,))
+        self.__class__.interengine_copier(self, result,\
+            self.__shift_schedule(result, befores, [False] * len(self.shape)))
+
+        if mode == "edge":
+            def edge_wrapper(array_name, edges):
+                array = globals()[array_name]
+                for axis, before, after in edges.get(MPI.COMM_WORLD.Get_rank(), ()):
+                    n = array.shape[axis]
+                    window = [slice(None)] * array.ndim
+                    src_window = list(window)
+                    window[axis], src_window[axis] = slice(0, before), slice(before, before+1)
+                    array[tuple(window)] = array[tuple(src_window)]
+                    window[axis], src_window[axis] = slice(n-after, n), slice(n-after-1, n-after)
+                    array[tuple(window)] = array[tuple(src_window)]
+
+            # padding is done by the engines at the ends of each axis
+            edges = {}
+            num_targets = [len(target_offsets_axis) for target_offsets_axis in result.target_offsets]
+            for target, rank_idx_vector in zip(result.target_ranks, np.ndindex(*num_targets)):
+                target_edges = []
+                for axis, (before, after) in enumerate(pad_width):
+                    if axis in self.distaxes:
+                        i = self.distaxes.index(axis)
+                        before = before if rank_idx_vector[i] == 0 else 0
+                        after = after if rank_idx_vector[i] == num_targets[i] - 1 else 0
+                    if before or after:
+                        target_edges.append((axis, int(before), int(after)))
+                edges[com.target2rank[target]] = target_edges
+            kernels.apply(edge_wrapper, result.target_ranks, result.name, edges)
 
         return result
 
+    def transpose(self, *axes, **kwargs):
+        """Permutes the axes like *numpy.ndarray.transpose*. Only the metadata on the client and the strides of
+        the local arrays are changed, the result shares its memory with this array. The local arrays are no longer
+        C-contiguous then.
+
+        :param ints axes: permutation of the axes. Defaults to reversing the order of the axes.
+        :param ints distaxes: keyword-only. If given, the result is redistributed along *distaxes* by a single
+            exchange among the :term:`engines <engine>`. The local arrays are transposed while packing the data,
+            the result is a new, C-contiguous array.
+        :return: transposed array
+        """
+        distaxes = kwargs.pop("distaxes", None)
+        assert not kwargs, "unexpected keyword arguments: " + ", ".join(kwargs)
+        if len(axes) == 1 and type(axes[0]) in (list, tuple):
+            axes = axes[0]
+        if not axes or axes == (None,):
+            axes = range(len(self.shape))[::-1]
+        axes = [(axis + len(self.shape)) % len(self.shape) for axis in axes]
+        assert sorted(axes) == range(len(self.shape)), "axes do not form a permutation: " + str(axes)
+
+        # position of each distributed axis after transposing. The distributed axes are kept in ascending
+        # order, so the engine grid is transposed as well.
+        positions = [axes.index(distaxis) for distaxis in self.distaxes]
+        order = sorted(range(len(positions)), key=lambda i: positions[i])
+        num_targets = [len(target_offsets_axis) for target_offsets_axis in self.target_offsets]
+        new_target_ranks = tuple(np.reshape(self.target_ranks, num_targets).transpose(order).flatten().tolist())
+        new_target_offsets = [self.target_offsets[i] for i in order]
+        new_shape = [self.shape[axis] for axis in axes]
+
+        result = self.__class__(new_shape, self.dtype, sorted(positions), new_target_offsets, new_target_ranks,\
+            no_allocation=True, **self.kwargs)
+        kernels.execute("{0} = {1}.transpose(_v[0])", result.target_ranks, (result.name, self.name), (tuple(axes),))
+        result.version = self.version
+
+        if distaxes is None:
+            return result
+        template = self.__class__(new_shape, self.dtype, distaxes, no_allocation=True, **self.kwargs)
+        return result.dist_like(template)
+
+    @property
+    def T(self):
+        """Same as :meth:`transpose` without arguments."""
+        return self.transpose()
+
+    def swapaxes(self, axis1, axis2, distaxes=None):
+        """Interchanges two axes like *numpy.ndarray.swapaxes* (see :meth:`transpose`).
+
+        :param ints distaxes: if given, the result is redistributed along *distaxes*.
+        """
+        axes = range(len(self.shape))
+        axes[axis1], axes[axis2] = axes[axis2], axes[axis1]
+        return self.transpose(axes, distaxes=distaxes)
+
+    def moveaxis(self, source, destination, distaxes=None):
+        """Moves axes to new positions like *numpy.moveaxis*, the other axes remain in their order
+        (see :meth:`transpose`).
+
+        :param ints source: original positions of the axes to move
+        :param ints destination: destination positions of the axes to move
+        :param ints distaxes: if given, the result is redistributed along *distaxes*.
+        """
+        if type(source) not in (list, tuple):
+            source, destination = (source,), (destination,)
+        ndim = len(self.shape)
+        source = [(axis + ndim) % ndim for axis in source]
+        destination = [(axis + ndim) % ndim for axis in destination]
+        axes = [axis for axis in range(ndim) if axis not in source]
+        for dest, src in sorted(zip(destination, source)):
+            axes.insert(dest, src)
+        return self.transpose(axes, distaxes=distaxes)
+
     def info(self, name):
         print name + " info:"
         print "{}.name".format(name), self.name
@@ -574,28 +1454,46 @@ class DistributedGenericArray(object):
         print "{}.target_offsets".format(name), self.target_offsets
         print "{}.distaxes".format(name), self.distaxes
         self.view.execute("dt = str({}.dtype)".format(repr(self)), targets=self.target_ranks)
-        print "{}.dtypes".format(name), self.view.pull("dt", targets=self.target_ranks)
+        print "{}.dtypes".format(name), self.view.pull("dt", targets=self.target_ranks, block=True)
         self.view.execute("t = str(type({}))".format(repr(self)), targets=self.target_ranks)
-        print "{}.types".format(name), self.view.pull("t", targets=self.target_ranks)
+        print "{}.types".format(name), self.view.pull("t", targets=self.target_ranks, block=True)
 
     def __elementwise_op__(self, op, *args):
+        if expression.is_lazy_op(op, args):
+            return expression.Expression(op, (self,) + args)
+
         args = [arg.dist_like(self) if hasattr(arg, "target_ranks") else arg for arg in args]
-        arg_names = [repr(arg) for arg in args]
-        arg_string = ",".join(arg_names)
 
-        result = self.__class__(self.shape, self.dtype, self.distaxes, self.target_offsets, self.target_ranks, no_allocation=True, **self.kwargs)
+        dtype = helper.result_dtype(op, [self] + args)
+        result = self.__class__(self.shape, dtype if dtype is not None else self.dtype, self.distaxes, self.target_offsets, self.target_ranks, no_allocation=True, **self.kwargs)
 
-        self.view.execute("{0} = {1}.{2}({3}); dtype={0}.dtype".format(repr(result), repr(self), op, arg_string), targets=self.target_ranks)
-        result.dtype = self.view.pull("dtype", targets=result.target_ranks[0])
+        names = [repr(result), repr(self)]
+        values = []
+        arg_string = ",".join(kernels.arguments(args, names, values))
+
+        if dtype is not None and not verify_dtypes:
+            kernels.execute("{0} = {1}.%s(%s)" % (op, arg_string), self.target_ranks, names, values)
+            return result
+
+        kernels.execute("{0} = {1}.%s(%s); dtype={0}.dtype" % (op, arg_string), self.target_ranks, names, values)
+        result.dtype = self.view.pull("dtype", targets=result.target_ranks[0], block=True)
         result.nbytes = np.dtype(result.dtype).itemsize * np.prod(result.shape)
+        assert dtype is None or np.dtype(dtype) == np.dtype(result.dtype),\
+            "inferred dtype ({0}) does not match dtype on engine ({1}) for {2}".format(dtype, result.dtype, op)
 
         return result
 
     def __elementwise_iop__(self, op, *args):
+        if expression.is_lazy_op(op, args):
+            expression.Expression(op, (self,) + args).evaluate(out=self)
+            return self
+
         args = [arg.dist_like(self) if hasattr(arg, "target_ranks") else arg for arg in args]
-        arg_names = [repr(arg) for arg in args]
-        arg_string = ",".join(arg_names)
-        self.view.execute("%s = %s.%s(%s)" % (repr(self), repr(self), op, arg_string), targets=self.target_ranks)
+        names = [repr(self)]
+        values = []
+        arg_string = ",".join(kernels.arguments(args, names, values))
+        kernels.execute("{0} = {0}.%s(%s)" % (op, arg_string), self.target_ranks, names, values)
+        self.version.increment()
         return self
 
 #----------------------------------------------------------------
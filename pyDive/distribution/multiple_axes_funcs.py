@@ -2,6 +2,10 @@
 
 import types
 from multiple_axes import DistributedGenericArray
+import multiple_axes
+import expression
+import helper
+import kernels
 import numpy as np
 import pyDive.IPParallelClient as com
 
@@ -23,9 +27,12 @@ def distribute(local_arraytype, newclassname, target_modulename, interengine_cop
         set(binary_ops + binary_rops + unary_ops + comp_ops) & special_ops_avail}
     special_iops_dict = {op : make_special_iop(op) for op in set(binary_iops) & special_ops_avail}
 
-    formated_doc_funs = ("__init__", "gather")
+    formated_doc_funs = ("__init__", "gather", "iter_gather")
 
     result_dict = dict(DistributedGenericArray.__dict__)
+    # the descriptors of instance attributes belong to DistributedGenericArray. type() creates them for the new class.
+    result_dict.pop("__dict__", None)
+    result_dict.pop("__weakref__", None)
 
     # docs
     result_dict["__doc__"] = result_dict["__doc__"].format(\
@@ -56,7 +63,8 @@ def distribute(local_arraytype, newclassname, target_modulename, interengine_cop
 def generate_factories(arraytype, factory_names, dtype_default):
 
     def factory_wrapper(factory_name, shape, dtype, distaxes, kwargs):
-        result = arraytype(shape, dtype, distaxes, None, None, True, **kwargs)
+        planner = kwargs.pop("planner", None)
+        result = arraytype(shape, dtype, distaxes, None, None, True, planner, **kwargs)
 
         target_shapes = result.target_shapes()
 
@@ -64,7 +72,8 @@ def generate_factories(arraytype, factory_names, dtype_default):
         view.scatter('target_shape', target_shapes, targets=result.target_ranks)
         view.push({'kwargs' : kwargs, 'dtype' : dtype}, targets=result.target_ranks)
 
-        view.execute("{0} = {1}(shape=target_shape[0], dtype=dtype, **kwargs)".format(result.name, factory_name),\
+        view.execute(com.free_code(result.target_ranks) +\
+            "{0} = {1}(shape=target_shape[0], dtype=dtype, **kwargs)".format(result.name, factory_name),\
             targets=result.target_ranks)
         return result
 
@@ -82,6 +91,7 @@ def generate_factories(arraytype, factory_names, dtype_default):
         :param ints shape: shape of array
         :param dtype: datatype of a single element
         :param ints distaxes: distributed axes
+        :param planner: planner of the engine grid (see :mod:`pyDive.distribution.decomposition`)
         :param kwargs: keyword arguments are passed to the local function *{1}*
         """.format(arraytype.__name__, str(arraytype.local_arraytype.__module__) + "." + name)
 
@@ -117,17 +127,32 @@ def generate_factories_like(arraytype, factory_names):
 def generate_ufuncs(ufunc_names, target_modulename):
 
     def ufunc_wrapper(ufunc_name, args, kwargs):
+        # client-side counterpart of the ufunc, used for inferring the result's datatype
+        func = getattr(np, ufunc_name.split(".")[-1], None) if target_modulename == "np" else None
+
+        if expression.lazy_mode or any(isinstance(arg, expression.Expression) for arg in args):
+            return expression.Expression(ufunc_name, args, func)
+
         arg0 = args[0]
         args = [arg.dist_like(arg0) if hasattr(arg, "target_ranks") else arg for arg in args]
-        arg_names = [repr(arg) for arg in args]
-        arg_string = ",".join(arg_names)
 
         view = com.getView()
-        result = arg0.__class__(arg0.shape, arg0.dtype, arg0.distaxes, arg0.target_offsets, arg0.target_ranks, no_allocation=True, **arg0.kwargs)
+        dtype = helper.result_dtype(func, args) if func is not None else None
+        result = arg0.__class__(arg0.shape, dtype if dtype is not None else arg0.dtype, arg0.distaxes, arg0.target_offsets, arg0.target_ranks, no_allocation=True, **arg0.kwargs)
+
+        names = [repr(result)]
+        values = []
+        arg_string = ",".join(kernels.arguments(args, names, values))
+
+        if dtype is not None and not multiple_axes.verify_dtypes:
+            kernels.execute("{0} = %s(%s)" % (ufunc_name, arg_string), arg0.target_ranks, names, values)
+            return result
 
-        view.execute("{0} = {1}({2}); dtype={0}.dtype".format(repr(result), ufunc_name, arg_string), targets=arg0.target_ranks)
-        result.dtype = view.pull("dtype", targets=result.target_ranks[0])
+        kernels.execute("{0} = %s(%s); dtype={0}.dtype" % (ufunc_name, arg_string), arg0.target_ranks, names, values)
+        result.dtype = view.pull("dtype", targets=result.target_ranks[0], block=True)
         result.nbytes = np.dtype(result.dtype).itemsize * np.prod(result.shape)
+        assert dtype is None or np.dtype(dtype) == np.dtype(result.dtype),\
+            "inferred dtype ({0}) does not match dtype on engine ({1}) for {2}".format(dtype, result.dtype, ufunc_name)
         return result
 
     make_ufunc = lambda ufunc_name: lambda *args, **kwargs: ufunc_wrapper(target_modulename + "." + ufunc_name, args, kwargs)
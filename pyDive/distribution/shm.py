@@ -0,0 +1,102 @@
+"""
+Copyright 2015 Heiko Burau
+
+This file is part of pyDive.
+
+pyDive is free software: you can redistribute it and/or modify
+it under the terms of of either the GNU General Public License or
+the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+pyDive is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License and the GNU Lesser General Public License
+for more details.
+
+You should have received a copy of the GNU General Public License
+and the GNU Lesser General Public License along with pyDive.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__doc__=\
+"""Shared-memory transport of array data between the client and :term:`engines <engine>` running on the same host.
+
+Instead of pickling array data and sending it through the controller, the data is put into a memory-mapped
+file in :obj:`directory` and only the file name is sent. Each engine then copies its part directly from or into
+the mapped file. The transport is used automatically for payloads of at least :obj:`threshold` bytes if all
+engines involved run on the client's host, the view is blocking and :obj:`directory` has enough free space.
+Writing a mapped file beyond the free space of its file system kills the process by SIGBUS instead of raising an
+exception, e.g. in containers with a small /dev/shm.
+"""
+
+import os
+import errno
+import numpy as np
+# check whether this code is executed on target or not
+onTarget = os.environ.get("onTarget", 'False')
+if onTarget == 'False':
+    import pyDive.IPParallelClient as com
+    import socket
+
+#: directory of the shared memory files. Should be a memory-backed file system.
+directory = "/dev/shm"
+#: minimum number of bytes transferred via shared memory. Set to ``None`` to disable the shared memory transport.
+threshold = 2**20
+#: maximum fraction of the free space of :obj:`directory` a single transfer may occupy
+max_fill = 0.5
+
+file_id = 0
+
+def available(targets, nbytes):
+    """Returns ``True`` if *nbytes* can be transferred between the client and *targets* via shared memory."""
+    if threshold is None or nbytes < max(threshold, 1) or not com.getView().block:
+        return False
+    if not os.path.isdir(directory) or nbytes > max_fill * free_bytes():
+        return False
+    if type(targets) not in (list, tuple):
+        targets = [targets]
+    hostname = socket.gethostname()
+    return all(com.hostnames[target] == hostname for target in targets)
+
+def free_bytes():
+    """Returns the number of bytes available in :obj:`directory`."""
+    stat = os.statvfs(directory)
+    return stat.f_bavail * stat.f_frsize
+
+def create(shape, dtype):
+    """Creates a shared memory file of an array of *shape* and *dtype*.
+
+    :raises IOError: if *directory* has not enough free space for the array.
+    :return: tuple of the file name and the mapped, writable array
+    """
+    global file_id
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if nbytes > free_bytes():
+        raise IOError(errno.ENOSPC, "not enough free space in %s for %d bytes" % (directory, nbytes))
+    filename = os.path.join(directory, "pyDive-%d-%d" % (os.getpid(), file_id))
+    file_id += 1
+    return filename, np.memmap(filename, dtype=dtype, mode='w+', shape=tuple(shape))
+
+def release(filename):
+    """Removes the shared memory file. Arrays mapping the file stay valid."""
+    os.remove(filename)
+
+#----------- engine side ----------------
+
+def read(filename, dtype, shape, window=None, out=None):
+    """Copies *window* of the array stored in the shared memory file *filename* into *out*.
+
+    :return: *out* or a new numpy-array if *out* is ``None``
+    """
+    mapped = np.memmap(filename, dtype=dtype, mode='r', shape=tuple(shape))
+    data = mapped[tuple(window)] if window is not None else mapped
+    if out is None:
+        return np.array(data)
+    out[...] = data
+    return out
+
+def write(filename, dtype, shape, window, array):
+    """Copies *array* into *window* of the array stored in the shared memory file *filename*."""
+    mapped = np.memmap(filename, dtype=dtype, mode='r+', shape=tuple(shape))
+    mapped[tuple(window)] = array
@@ -0,0 +1,198 @@
+"""
+Copyright 2015 Heiko Burau
+
+This file is part of pyDive.
+
+pyDive is free software: you can redistribute it and/or modify
+it under the terms of of either the GNU General Public License or
+the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+pyDive is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License and the GNU Lesser General Public License
+for more details.
+
+You should have received a copy of the GNU General Public License
+and the GNU Lesser General Public License along with pyDive.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__doc__=\
+"""Distributed discrete Fourier transforms of :obj:`pyDive.ndarray` instances.
+
+The transforms follow *numpy.fft*. Each :term:`engine` transforms its local array along all axes which are not
+split among several engines by calling *numpy.fft*. Distributed axes with a single engine count as local. The remaining axes are made local by redistributing the array (see
+:meth:`dist_like <pyDive.ndarray.dist_like>`) and are transformed in the next step (pencil decomposition).
+The data is never gathered on the client. Example: ::
+
+    fieldE = pyDive.h5.open(filename, "fields/E/x").load()
+    spectrum = abs(pyDive.fft.rfftn(fieldE))**2
+
+**Layout of the result**: By default the result is distributed along the same axes as the input. If its shape equals
+the input's shape the result is even distributed exactly like the input. With ``keep_layout=False`` the final
+redistribution is skipped and the result stays distributed the way the last transform step needs it:
+Each redistribution keeps the number of split axes and chooses them in this order: the split axes
+which are not transformed anymore, the remaining axes not to be transformed, largest first, and finally the last axes
+still to be transformed. A one-dimensional array is thus gathered on a single engine. The actual layout can be
+read from the result's *distaxes* and *target_offsets*.
+
+Transforming back with ``keep_layout=False`` as well saves two redistributions if only the round trip matters, e.g.
+for filtering in Fourier space.
+"""
+
+import numpy as np
+from distribution import kernels
+
+def __axes(array, axes):
+    ndim = len(array.shape)
+    if axes is None:
+        return range(ndim)
+    axes = [(axis + ndim) % ndim for axis in axes]
+    assert len(set(axes)) == len(axes), "repeated axes: " + str(axes)
+    return axes
+
+def __split_axes(array):
+    # distributed axes which are split among more than one engine
+    return [axis for axis, num_targets in zip(array.distaxes, array.grid) if num_targets > 1]
+
+def __localize(array, pending):
+    # Redistribute *array* so that at least the first axis of *pending* is not split anymore.
+    # The number of split axes is kept if possible.
+    split_axes = __split_axes(array)
+    num_distaxes = len(split_axes)
+    distaxes = [axis for axis in split_axes if axis not in pending]
+    free = sorted((axis for axis in range(len(array.shape)) if axis not in pending and axis not in distaxes),\
+        key=lambda axis: -array.shape[axis])
+    distaxes += free[:num_distaxes - len(distaxes)]
+    missing = min(num_distaxes - len(distaxes), len(pending) - 1)
+    if missing > 0:
+        distaxes += pending[-missing:]
+
+    template = array.__class__(array.shape, array.dtype, sorted(distaxes), no_allocation=True, **array.kwargs)
+    return array.dist_like(template)
+
+def __apply(array, template, shape, dtype, values):
+    # run the statement *template* on each engine. The distribution of the result equals that of *array*.
+    result = array.__class__(shape, dtype, array.distaxes, array.target_offsets, array.target_ranks,\
+        no_allocation=True, **array.kwargs)
+    kernels.execute(template, result.target_ranks, (result.name, array.name), values)
+    return result
+
+def __transform(array, pending, inverse, norm):
+    # transform all axes of *pending* by complex-to-complex transforms
+    func = "np.fft.ifftn" if inverse else "np.fft.fftn"
+    pending = list(pending)
+    while pending:
+        local_axes = [axis for axis in pending if axis not in __split_axes(array)]
+        if not local_axes:
+            array = __localize(array, pending)
+            continue
+        array = __apply(array, "{0} = %s({1}, axes=_v[0], **_v[1])" % func, array.shape, np.complex128,\
+            (tuple(local_axes), __norm(norm)))
+        pending = [axis for axis in pending if axis not in local_axes]
+    return array
+
+def __restore(result, array):
+    # redistribute *result* like *array* or at least along the same axes if the shapes differ
+    if result.shape == array.shape:
+        return result.dist_like(array)
+    if result.distaxes == array.distaxes:
+        return result
+    template = result.__class__(result.shape, result.dtype, array.distaxes, no_allocation=True, **result.kwargs)
+    return result.dist_like(template)
+
+def __norm(norm):
+    # keyword arguments of the numpy transforms. *norm* is passed only if set since numpy < 1.10 lacks it.
+    return {"norm" : norm} if norm is not None else {}
+
+def __check(array):
+    assert getattr(array.__class__, "local_arraytype", None) is np.ndarray,\
+        "pyDive.fft supports pyDive.ndarray only, not " + type(array).__name__
+
+def fftn(a, axes=None, norm=None, keep_layout=True):
+    """Computes the N-dimensional discrete Fourier transform like *numpy.fft.fftn*.
+
+    :param a: distributed array
+    :type a: :obj:`pyDive.ndarray`
+    :param ints axes: axes to transform. Defaults to all axes.
+    :param norm: normalization mode, ``None`` or "ortho". "ortho" requires numpy 1.10.
+    :param bool keep_layout: if ``False`` the final redistribution back to the input's layout is skipped.
+    :return: complex-valued :obj:`pyDive.ndarray`
+    """
+    __check(a)
+    result = __transform(a, __axes(a, axes), False, norm)
+    return __restore(result, a) if keep_layout else result
+
+def ifftn(a, axes=None, norm=None, keep_layout=True):
+    """Computes the N-dimensional inverse discrete Fourier transform like *numpy.fft.ifftn*.
+
+    :param a: distributed array
+    :type a: :obj:`pyDive.ndarray`
+    :param ints axes: axes to transform. Defaults to all axes.
+    :param norm: normalization mode, ``None`` or "ortho". "ortho" requires numpy 1.10.
+    :param bool keep_layout: if ``False`` the final redistribution back to the input's layout is skipped.
+    :return: complex-valued :obj:`pyDive.ndarray`
+    """
+    __check(a)
+    result = __transform(a, __axes(a, axes), True, norm)
+    return __restore(result, a) if keep_layout else result
+
+def rfftn(a, axes=None, norm=None, keep_layout=True):
+    """Computes the N-dimensional discrete Fourier transform of real input like *numpy.fft.rfftn*.
+    The last axis of *axes* is transformed first by a real-to-complex transform, which halves its length.
+
+    :param a: distributed, real-valued array
+    :type a: :obj:`pyDive.ndarray`
+    :param ints axes: axes to transform. Defaults to all axes.
+    :param norm: normalization mode, ``None`` or "ortho". "ortho" requires numpy 1.10.
+    :param bool keep_layout: if ``False`` the final redistribution back to the input's layout is skipped.
+    :return: complex-valued :obj:`pyDive.ndarray`
+    """
+    __check(a)
+    axes = __axes(a, axes)
+    last = axes[-1]
+    array = a
+    if last in __split_axes(array):
+        array = __localize(array, [last])
+
+    shape = list(array.shape)
+    shape[last] = shape[last] / 2 + 1
+    array = __apply(array, "{0} = np.fft.rfft({1}, axis=_v[0], **_v[1])", shape, np.complex128, (last, __norm(norm)))
+
+    result = __transform(array, axes[:-1], False, norm)
+    return __restore(result, a) if keep_layout else result
+
+def irfftn(a, s=None, axes=None, norm=None, keep_layout=True):
+    """Computes the inverse of :func:`rfftn` like *numpy.fft.irfftn*.
+    The last axis of *axes* is transformed last by a complex-to-real transform.
+
+    :param a: distributed array
+    :type a: :obj:`pyDive.ndarray`
+    :param ints s: shape of the output along *axes*. Only the length of the last axis may differ from the input,
+        it defaults to ``2*(m-1)`` where ``m`` is the input's length. Pass it explicitly to recover odd lengths.
+    :param ints axes: axes to transform. Defaults to all axes.
+    :param norm: normalization mode, ``None`` or "ortho". "ortho" requires numpy 1.10.
+    :param bool keep_layout: if ``False`` the final redistribution back to the input's layout is skipped.
+    :return: real-valued :obj:`pyDive.ndarray`
+    """
+    __check(a)
+    axes = __axes(a, axes)
+    last = axes[-1]
+    n = 2 * (a.shape[last] - 1)
+    if s is not None:
+        assert len(s) == len(axes), "s and axes differ in length"
+        assert all(length == a.shape[axis] for length, axis in zip(s[:-1], axes[:-1])),\
+            "only the length of the last axis can be changed"
+        n = s[-1]
+
+    array = __transform(a, axes[:-1], True, norm)
+    if last in __split_axes(array):
+        array = __localize(array, [last])
+
+    shape = list(array.shape)
+    shape[last] = n
+    result = __apply(array, "{0} = np.fft.irfft({1}, n=_v[0], axis=_v[1], **_v[2])", shape, np.float64,\
+        (n, last, __norm(norm)))
+    return __restore(result, a) if keep_layout else result
@@ -38,11 +38,14 @@ hdd_arraytypes = (h5_ndarray, ad_ndarray)
 def __bestStepSize(arrays, axis, memory_limit):
     view = com.getView()
 
+    # release memory of garbage collected arrays before asking for the available memory
+    com.flush_free_list()
+
     # minimum amount of memory available and memory needed, both per engine
     get_mem_av_node = interactive(lambda: psutil.virtual_memory().available)
     tmp_targets = view.targets
     view.targets = 'all'
-    mem_av = min(view.apply(get_mem_av_node)) / com.getPPN()
+    mem_av = min(view.apply_sync(get_mem_av_node)) / com.getPPN()
     mem_needed = sum(a.nbytes for a in arrays) / len(view)
     view.targets = tmp_targets
 
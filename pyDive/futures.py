@@ -0,0 +1,184 @@
+"""
+Copyright 2015 Heiko Burau
+
+This file is part of pyDive.
+
+pyDive is free software: you can redistribute it and/or modify
+it under the terms of of either the GNU General Public License or
+the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+pyDive is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License and the GNU Lesser General Public License
+for more details.
+
+You should have received a copy of the GNU General Public License
+and the GNU Lesser General Public License along with pyDive.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__doc__=\
+"""Non-blocking execution of pyDive operations.
+
+Every function of this module issues its work to the :term:`engines <engine>` and returns a :class:`Future`
+immediately, so that the client is free to start independent work in the meantime. Example: ::
+
+    fieldE = pyDive.futures.load(h5fields["fieldE/x"])  # starts loading...
+    totalB = pyDive.futures.reduce(fieldB, np.add)       # ...while fieldB is reduced
+
+    fieldE = fieldE.result()
+    print totalB.result()
+
+Whole pipelines can be submitted at once. Since each engine processes its requests in the order they were sent
+by the client, the individual steps of a pipeline are issued right away without waiting for each other: ::
+
+    spectrum = pyDive.futures.submit(lambda: abs(pyDive.h5.open(filename, "fields/Ex").load()**2).gather())
+
+The remote variable names of arrays produced by pending operations are tracked in :obj:`pending`, so that
+:func:`wait` accepts distributed arrays as well.
+"""
+
+import IPParallelClient as com
+from contextlib import contextmanager
+
+#: maps the remote variable name of an array to the *AsyncResult* of the pending operation that produced it
+pending = {}
+
+class Future(object):
+    """Result of an operation which is (maybe) still running on the :term:`engines <engine>`."""
+
+    def __init__(self, async_results, finish=None):
+        """
+        :param async_results: list of *IPython.parallel.AsyncResult* objects of the remote work.
+        :param callable finish: is called without arguments after all remote work has finished.
+            Its return value is the result of this future.
+        """
+        self.async_results = list(async_results)
+        self.finish = finish
+        self.__has_result = False
+        self.__result = None
+
+    @property
+    def msg_ids(self):
+        """msg_ids of all remote requests this future depends on"""
+        return [msg_id for ar in self.async_results for msg_id in ar.msg_ids]
+
+    def done(self):
+        """Returns ``True`` if all remote work has finished."""
+        return all(ar.ready() for ar in self.async_results)
+
+    def wait(self, timeout=-1):
+        """Waits until all remote work has finished or *timeout* seconds have passed.
+
+        :return: ``True`` if all remote work has finished.
+        """
+        for ar in self.async_results:
+            ar.wait(timeout)
+        return self.done()
+
+    def result(self, timeout=-1):
+        """Waits for the remote work and returns the result of the operation.
+        Exceptions raised on :term:`engine` are re-raised here.
+
+        :raises TimeoutError: if the result is not available within *timeout* seconds.
+        """
+        if not self.__has_result:
+            for ar in self.async_results:
+                ar.get(timeout)
+            self.__result = self.finish() if self.finish is not None else None
+            self.__has_result = True
+        return self.__result
+
+@contextmanager
+def nonblocking():
+    """Context manager in which pyDive does not wait for the :term:`engines <engine>`.
+    Operations returning distributed arrays return immediately, value-returning operations return a :class:`Future`.
+    """
+    view = com.getView()
+    block = view.block
+    view.block = False
+    try:
+        yield
+    finally:
+        view.block = block
+
+def __names(objects):
+    names = []
+    for obj in objects:
+        if "target_ranks" in getattr(obj, "__dict__", {}):
+            names.append(obj.name)
+    return names
+
+def submit(f, *args, **kwargs):
+    """Calls ``f(*args, **kwargs)`` without waiting for the :term:`engines <engine>`. Use this for element-wise
+    operations, e.g. ``submit(operator.add, a, b)`` or ``submit(pyDive.sin, a)``.
+
+    :return: :class:`Future` whose result is the return value of *f*.
+    """
+    view = com.getView()
+
+    # forget finished operations
+    for name, async_result in pending.items():
+        if async_result.ready():
+            del pending[name]
+
+    # dependencies on pending operations of the arguments
+    dependencies = [pending[name] for name in __names(args + tuple(kwargs.values())) if name in pending]
+
+    first_msg = len(view.history)
+    with nonblocking():
+        value = f(*args, **kwargs)
+    msg_ids = view.history[first_msg:]
+
+    async_results = dependencies
+    if msg_ids:
+        async_result = view.client.get_result(msg_ids, block=False)
+        async_results = async_results + [async_result]
+        for name in __names((value,)):
+            pending[name] = async_result
+
+    if isinstance(value, Future):
+        return Future(async_results + value.async_results, value.result)
+    return Future(async_results, lambda: value)
+
+def wait(*objects, **kwargs):
+    """Waits for futures and for pending operations on distributed arrays.
+
+    :param objects: futures and/or distributed arrays
+    :param timeout: maximum number of seconds to wait. Defaults to -1 meaning no limit.
+    :return: ``True`` if all remote work has finished.
+    """
+    timeout = kwargs.get("timeout", -1)
+    futures = [obj for obj in objects if isinstance(obj, Future)]
+    async_results = [ar for future in futures for ar in future.async_results]
+    async_results += [pending[name] for name in __names(objects) if name in pending]
+    return Future(async_results).wait(timeout)
+
+def load(array):
+    """Non-blocking version of ``array.load()``."""
+    return submit(array.load)
+
+def gather(array):
+    """Non-blocking version of ``array.gather()``."""
+    return submit(array.gather)
+
+def dist_like(array, other):
+    """Non-blocking version of ``array.dist_like(other)``."""
+    return submit(array.dist_like, other)
+
+def map(f, *arrays, **kwargs):
+    """Non-blocking version of :func:`pyDive.algorithm.map`."""
+    import algorithm
+    return submit(algorithm.map, f, *arrays, **kwargs)
+
+def reduce(array, op, **kwargs):
+    """Non-blocking version of :func:`pyDive.algorithm.reduce`."""
+    import algorithm
+    return submit(algorithm.reduce, array, op, **kwargs)
+
+def mapReduce(map_func, reduce_op, *arrays, **kwargs):
+    """Non-blocking version of :func:`pyDive.algorithm.mapReduce`."""
+    import algorithm
+    return submit(algorithm.mapReduce, map_func, reduce_op, *arrays, **kwargs)
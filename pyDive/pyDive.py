@@ -46,6 +46,11 @@ try:
 except ImportError:
     pass
 
+# lazy evaluation
+import distribution.expression
+lazy = distribution.expression.lazy
+set_lazy = distribution.expression.set_lazy
+
 # cloned_ndarray
 import cloned_ndarray.factories
 cloned = cloned_ndarray.factories
@@ -58,6 +63,18 @@ import algorithm
 map = algorithm.map
 reduce = algorithm.reduce
 mapReduce = algorithm.mapReduce
+stencil_map = algorithm.stencil_map
+histogram = algorithm.histogram
+histogramdd = algorithm.histogramdd
+
+## non-blocking execution
+import futures
+
+## Fourier transforms
+import fft
+
+## sorting
+import sorting
 
 # particle-mesh mappings
 import mappings
@@ -0,0 +1,217 @@
+"""
+Copyright 2015 Heiko Burau
+
+This file is part of pyDive.
+
+pyDive is free software: you can redistribute it and/or modify
+it under the terms of of either the GNU General Public License or
+the GNU Lesser General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+pyDive is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License and the GNU Lesser General Public License
+for more details.
+
+You should have received a copy of the GNU General Public License
+and the GNU Lesser General Public License along with pyDive.
+If not, see <http://www.gnu.org/licenses/>.
+"""
+
+__doc__=\
+"""Distributed sorting of :obj:`pyDive.ndarray` instances by sample sort.
+
+Each :term:`engine` sorts its local elements, takes regular samples of them and all engines agree on splitters
+from the combined samples. The elements are then sent to the engine owning their splitter interval by a single
+*MPI.Alltoallv* and the received runs are merged locally. Finally the result is balanced across the engines
+(see :func:`pyDive.distribution.interengine.rebalanceArrayMPI`). Example: ::
+
+    energy = pyDive.h5.open(filename, "particles/e/energy").load()
+    sorted_energy = pyDive.sorting.sort(energy)
+    threshold = sorted_energy[int(0.99 * sorted_energy.shape[0])] # 99th percentile
+
+All functions treat the input as flattened (like ``axis=None`` in *numpy*) and return one-dimensional arrays,
+distributed evenly along axis 0 across the engines of the input.
+"""
+
+import os
+import numpy as np
+from distribution import interengine
+# check whether this code is executed on target or not
+onTarget = os.environ.get("onTarget", 'False')
+if onTarget == 'False':
+    import IPParallelClient as com
+    from distribution import kernels
+
+#: number of samples per engine splitters are chosen from. More samples give better balanced exchanges.
+oversampling = 16
+
+def __check(array):
+    assert getattr(array.__class__, "local_arraytype", None) is np.ndarray,\
+        "pyDive.sorting supports pyDive.ndarray only, not " + type(array).__name__
+
+def __ranks(array):
+    return [com.target2rank[target] for target in array.target_ranks]
+
+def __result(array, length, dtype):
+    # one-dimensional array of *length* elements distributed evenly across the engines of *array*
+    target_offsets = interengine.even_offsets(length, len(array.target_ranks))
+    return array.__class__((length,), dtype, 0, [np.array(target_offsets)], array.target_ranks[:len(target_offsets)],\
+        no_allocation=True, **array.kwargs)
+
+def sort(a):
+    """Returns a sorted copy of the flattened array *a*.
+
+    :param a: distributed array
+    :type a: :obj:`pyDive.ndarray`
+    :return: one-dimensional :obj:`pyDive.ndarray`
+    """
+    def sort_wrapper(array_name, result_name, ranks):
+        keys, indices = sorting.sampleSortMPI(np.ravel(globals()[array_name]), None, ranks)
+        keys, length = interengine.rebalanceArrayMPI(keys, 0, (0,), keys.dtype, ranks, ranks)
+        if keys is not None:
+            globals()[result_name] = keys
+
+    __check(a)
+    result = __result(a, int(np.prod(a.shape)), a.dtype)
+    kernels.apply(sort_wrapper, a.target_ranks, a.name, result.name, __ranks(a))
+    return result
+
+def argsort(a):
+    """Returns the indices that sort the flattened array *a*, i.e. ``a.gather().flat[argsort(a).gather()]``
+    is sorted. Like *numpy.argsort* the order of equal elements is not defined.
+
+    :param a: distributed array
+    :type a: :obj:`pyDive.ndarray`
+    :return: one-dimensional :obj:`pyDive.ndarray` of flat indices into *a*
+    """
+    def argsort_wrapper(array_name, result_name, ranks, shape):
+        local_array = globals()[array_name]
+        flat_indices = sorting.flat_indices(local_array.shape, globals().pop("sort_offset")[0], shape)
+        keys, indices = sorting.sampleSortMPI(np.ravel(local_array), flat_indices, ranks)
+        indices, length = interengine.rebalanceArrayMPI(indices, 0, (0,), indices.dtype, ranks, ranks)
+        if indices is not None:
+            globals()[result_name] = indices
+
+    __check(a)
+    result = __result(a, int(np.prod(a.shape)), np.int64)
+    view = com.getView()
+    view.scatter("sort_offset", a.target_offset_vectors(), targets=a.target_ranks)
+    kernels.apply(argsort_wrapper, a.target_ranks, a.name, result.name, __ranks(a), a.shape)
+    return result
+
+def unique(a, return_counts=False):
+    """Returns the sorted unique elements of the flattened array *a*.
+
+    Equal elements are sent to the same engine, so each engine removes duplicates locally.
+
+    :param a: distributed array
+    :type a: :obj:`pyDive.ndarray`
+    :param bool return_counts: if ``True`` the number of occurrences of each unique element is returned as well.
+    :return: one-dimensional :obj:`pyDive.ndarray` of the unique elements and, if *return_counts* is set,
+        one-dimensional :obj:`pyDive.ndarray` of their counts.
+    """
+    def unique_wrapper(array_name, result_name, counts_name, ranks):
+        keys, inverse = np.unique(globals()[array_name], return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(keys))
+        keys, counts = sorting.sampleSortMPI(keys, counts.astype(np.int64), ranks, ties=False)
+        # equal keys have been sent to the same engine
+        keys, first = np.unique(keys, return_index=True)
+        counts = np.add.reduceat(counts, first) if len(first) else counts[:0]
+        keys, length = interengine.rebalanceArrayMPI(keys, 0, (0,), keys.dtype, ranks, ranks)
+        counts, length = interengine.rebalanceArrayMPI(counts, 0, (0,), counts.dtype, ranks, ranks)
+        if keys is not None:
+            globals()[result_name] = keys
+            globals()[counts_name] = counts
+        return length
+
+    __check(a)
+    result_names = [a.name + "_unique", a.name + "_counts"]
+    view = com.getView()
+    lengths = kernels.apply(unique_wrapper, a.target_ranks, a.name, result_names[0], result_names[1], __ranks(a))
+    length = (lengths if view.block else lengths.get())[0]
+
+    result = __result(a, length, a.dtype)
+    counts = __result(a, length, np.int64)
+    # move the local results to the remote names of the new arrays
+    view.execute("{0} = globals().pop('{1}'); {2} = globals().pop('{3}')".format(\
+        result.name, result_names[0], counts.name, result_names[1]), targets=result.target_ranks)
+    if return_counts:
+        return result, counts
+    return result
+
+#----------- engine side ----------------
+
+def flat_indices(local_shape, offset, shape):
+    """Flat indices into an array of *shape* of the elements of the local array of *local_shape* beginning at
+    *offset*, in the order of ``np.ravel``.
+    """
+    result = np.zeros((), dtype=np.int64)
+    for begin, length, size in zip(offset, local_shape, shape):
+        result = np.add.outer(result * size, np.arange(begin, begin + length, dtype=np.int64))
+    return result.reshape(-1)
+
+def sampleSortMPI(keys, payload, ranks, ties=True):
+    """Sorts the 1-d arrays *keys* of the engines *ranks* (MPI ranks) globally by sample sort. The result is
+    distributed across *ranks* in their order but not balanced.
+
+    :param keys: local keys
+    :param payload: 1-d array of the same length as *keys* which is permuted along with the keys, or ``None``.
+    :param ints ranks: MPI ranks of the engines taking part, including this engine.
+    :param bool ties: if ``True`` equal keys may be split among engines for better balance. If ``False`` equal
+        keys end up on the same engine.
+    :return: tuple of the sorted local keys and payload
+    """
+    from mpi4py import MPI
+    comm = interengine.group_comm(ranks)
+    num_engines = comm.Get_size()
+    me = comm.Get_rank()
+
+    order = np.argsort(keys, kind='mergesort')
+    keys = keys[order]
+    if payload is not None:
+        payload = payload[order]
+
+    # regular samples. Each sample stands for the same number of elements on all engines.
+    size = np.array([len(keys)], dtype=np.int64)
+    total = np.empty_like(size)
+    comm.Allreduce(size, total, op=MPI.SUM)
+    step = max(1, int(total[0]) // (num_engines * oversampling))
+    positions = np.arange(step // 2, len(keys), step)
+    samples = comm.allgather((keys[positions], positions))
+
+    sample_keys = np.concatenate([s[0] for s in samples])
+    sample_sources = np.concatenate([np.repeat(i, len(s[1])) for i, s in enumerate(samples)])
+    sample_positions = np.concatenate([s[1] for s in samples])
+    # total order of elements: by key, then by engine, then by position on the engine
+    sample_order = np.lexsort((sample_positions, sample_sources, sample_keys))
+    picks = [sample_order[len(sample_order) * i // num_engines] for i in range(1, num_engines)]\
+        if len(sample_order) else []
+
+    # local element bounds of each engine's interval
+    bounds = [0] * (num_engines - len(picks))
+    for pick in picks:
+        key = sample_keys[pick]
+        lower = np.searchsorted(keys, key, side='left')
+        upper = np.searchsorted(keys, key, side='right')
+        if not ties or me < sample_sources[pick]:
+            bound = upper
+        elif me > sample_sources[pick]:
+            bound = lower
+        else:
+            bound = min(max(sample_positions[pick] + 1, lower), upper)
+        bounds.append(max(bound, bounds[-1]))
+    bounds.append(len(keys))
+    send_counts = np.diff(bounds)
+
+    keys, recv_counts = interengine.alltoallv(comm, keys, send_counts)
+    if payload is not None:
+        payload, recv_counts = interengine.alltoallv(comm, payload, send_counts)
+
+    # merge the sorted runs. A stable sort keeps the engines' order among equal keys.
+    order = np.argsort(keys, kind='mergesort')
+    keys = keys[order]
+    if payload is not None:
+        payload = payload[order]
+    return keys, payload
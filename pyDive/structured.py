@@ -158,8 +158,8 @@ class VirtualArrayOfStructs(object):
 
     def __del__(self):
         if onTarget == 'False' and self.has_local_instance:
-            # delete remote structured object
-            self.view.execute('del %s' % self.name, targets=self.target_ranks)
+            # schedule deletion of remote structured object
+            com.free(self.name, self.target_ranks)
 
     def __getattr__(self, name):
         if hasattr(self.firstArray, name):
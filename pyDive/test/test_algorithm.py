@@ -50,4 +50,213 @@ def test_mapReduce(init_pyDive):
         np.add, input_array)
 
     diff = abs(ref_total - test_total)
-    assert diff / ref_total < 1.0e-5
\ No newline at end of file
+    assert diff / ref_total < 1.0e-5
+
+def test_futures(init_pyDive):
+    input_array = pyDive.h5.open(input_file, "fields")
+
+    ref_array = input_array["fieldE/x"].load().gather()**2
+
+    fieldE_x = pyDive.futures.load(input_array["fieldE/x"])
+    fieldE_x = fieldE_x.result()
+    energy = pyDive.futures.submit(lambda: fieldE_x**2)
+    total = pyDive.futures.reduce(energy.result(), np.add)
+    gathered = pyDive.futures.gather(energy.result())
+
+    assert pyDive.futures.wait(total, gathered)
+    assert np.array_equal(ref_array, gathered.result())
+    assert abs(np.add.reduce(ref_array, axis=None) - total.result()) / abs(total.result()) < 1.0e-5
+
+    total = pyDive.futures.reduce(energy.result(), np.add, keepdims=True)
+    assert total.result().shape == (1,) * ref_array.ndim
+    assert abs(np.add.reduce(ref_array, axis=None) - total.result().item()) / abs(total.result().item()) < 1.0e-5
+
+def test_kernels(init_pyDive):
+    from pyDive.distribution import kernels
+
+    np_a = np.arange(100.0)
+    a = pyDive.array(np_a)
+
+    for factor in (2.0, 2.0, 3.0):
+        def scale(x):
+            x *= factor
+        pyDive.map(scale, a)
+        np_a *= factor
+    assert np.array_equal(a.gather(), np_a)
+
+    # 'scale' is registered once per distinct closure
+    names = [kernels.register(f, a.target_ranks) for f in (lambda: 2.0, lambda: 2.0)]
+    assert names[0] == names[1]
+
+    b = a * 2 + 1
+    b[3] = -1.0
+    np_b = np_a * 2 + 1
+    np_b[3] = -1.0
+    assert np.array_equal(b.gather(), np_b)
+
+def test_reduce_axis(init_pyDive):
+    shapes = ((29,), (13, 7), (5, 6, 7), (16, 16, 16))
+
+    for shape in shapes:
+        ref_array = np.random.rand(*shape)
+        for distaxes in ('all', 0):
+            test_array = pyDive.array(ref_array, distaxes=distaxes)
+            for axis in range(len(shape)) + ([(0, -1)] if len(shape) > 1 else []):
+                for keepdims in (False, True):
+                    test_result = pyDive.reduce(test_array, np.add, axis=axis, keepdims=keepdims)
+                    if hasattr(test_result, "distaxes"):
+                        test_result = test_result.gather()
+                    ref_result = np.add.reduce(ref_array, axis=axis, keepdims=keepdims)
+
+                    assert np.shape(test_result) == np.shape(ref_result)
+                    assert np.allclose(test_result, ref_result)
+
+def test_reduce_mpi(init_pyDive):
+    shape = (13, 7)
+    ref_array = np.random.rand(*shape)
+    test_array = pyDive.array(ref_array)
+
+    for op in (np.add, np.maximum, np.fmin):
+        assert np.allclose(pyDive.reduce(test_array, op), op.reduce(ref_array, axis=None))
+
+    assert pyDive.reduce(test_array > 0.5, np.logical_or) == np.logical_or.reduce(ref_array > 0.5, axis=None)
+
+    total = pyDive.reduce(test_array, np.add, allreduce=True)
+    assert np.allclose(total.merge(np.maximum), np.add.reduce(ref_array, axis=None))
+
+    total = pyDive.mapReduce(lambda a, factor: a * factor, np.add, test_array, factor=2.0, allreduce=True)
+    assert np.allclose(total.merge(np.maximum), 2.0 * np.add.reduce(ref_array, axis=None))
+
+def test_blocked_tree_reduce(init_pyDive):
+    view = pyDive.IPParallelClient.getView()
+    view.execute("algorithm.reduce_block_length = 3", block=True)
+
+    try:
+        for shape in ((100,), (29, 17), (8, 9, 10)):
+            ref_array = np.random.rand(*shape)
+            test_array = pyDive.array(ref_array)
+
+            assert np.allclose(pyDive.reduce(test_array, np.add), np.add.reduce(ref_array, axis=None))
+            assert np.allclose(pyDive.reduce(test_array, np.maximum), np.maximum.reduce(ref_array, axis=None))
+            for axis in range(len(shape)):
+                test_result = pyDive.reduce(test_array, np.add, axis=axis)
+                if hasattr(test_result, "distaxes"):
+                    test_result = test_result.gather()
+                assert np.allclose(test_result, np.add.reduce(ref_array, axis=axis))
+    finally:
+        view.execute("algorithm.reduce_block_length = {0}".format(pyDive.algorithm.reduce_block_length), block=True)
+
+def test_stencil_map(init_pyDive):
+    def five_point(f, out):
+        out[:] = f[:-2, 1:-1] + f[2:, 1:-1] + f[1:-1, :-2] + f[1:-1, 2:] - 4.0 * f[1:-1, 1:-1]
+
+    ref = np.random.rand(24, 20)
+    ref_laplace = np.roll(ref, 1, 0) + np.roll(ref, -1, 0) + np.roll(ref, 1, 1) + np.roll(ref, -1, 1) - 4.0 * ref
+
+    for distaxes in ('all', 0, 1):
+        field = pyDive.array(ref, distaxes=distaxes)
+        laplace = pyDive.zeros_like(field)
+        pyDive.stencil_map(five_point, field, laplace, periodic=True)
+        assert np.allclose(laplace.gather(), ref_laplace)
+
+    # without periodicity ghost layers repeat the boundary elements
+    ref = np.random.rand(30)
+    field = pyDive.array(ref)
+    smoothed = pyDive.zeros_like(field)
+    pyDive.stencil_map(lambda f, out: out.__setitem__(Ellipsis, f[:-4] + f[4:]), field, smoothed, width=2)
+    padded = np.pad(ref, 2, mode="edge")
+    assert np.allclose(smoothed.gather(), padded[:-4] + padded[4:])
+
+def test_fft(init_pyDive):
+    ref = np.random.rand(12, 10, 8)
+
+    for distaxes in ('all', 0, (1, 2)):
+        test_array = pyDive.array(ref, distaxes=distaxes)
+
+        test_result = pyDive.fft.fftn(test_array)
+        assert test_result.is_distributed_like(test_array)
+        assert np.allclose(test_result.gather(), np.fft.fftn(ref))
+        assert np.allclose(pyDive.fft.fftn(test_array, axes=(0, 2), keep_layout=False).gather(),\
+            np.fft.fftn(ref, axes=(0, 2)))
+        assert np.allclose(pyDive.fft.ifftn(test_result, keep_layout=False).gather(), ref)
+
+        assert np.allclose(pyDive.fft.rfftn(test_array, keep_layout=False).gather(), np.fft.rfftn(ref))
+        test_result = pyDive.fft.rfftn(test_array)
+        assert np.allclose(test_result.gather(), np.fft.rfftn(ref))
+        test_result = pyDive.fft.irfftn(test_result)
+        assert test_result.distaxes == test_array.distaxes
+        assert np.allclose(test_result.gather(), ref)
+
+    ref = np.random.rand(33)
+    test_array = pyDive.array(ref)
+    assert np.allclose(pyDive.fft.irfftn(pyDive.fft.rfftn(test_array), s=(33,)).gather(), ref)
+
+    # distributed axes with a single engine are transformed locally
+    ref = np.random.rand(64, 8, 6)
+    test_array = pyDive.array(ref)
+    num_split = sum(num_targets > 1 for num_targets in test_array.grid)
+    assert num_split <= 1
+
+    redistributions = []
+    dist_like = pyDive.ndarray.dist_like
+    def counting_dist_like(self, other):
+        result = dist_like(self, other)
+        if result is not self:
+            redistributions.append(result)
+        return result
+    pyDive.ndarray.dist_like = counting_dist_like
+    try:
+        test_result = pyDive.fft.fftn(test_array)
+    finally:
+        pyDive.ndarray.dist_like = dist_like
+    assert len(redistributions) == 2 * num_split # pencil and restore
+    assert np.allclose(test_result.gather(), np.fft.fftn(ref))
+
+def test_histogram(init_pyDive):
+    ref_x = np.random.normal(size=(32, 24))
+    ref_y = np.random.rand(32, 24)
+    ref_w = np.random.rand(32, 24)
+    x = pyDive.array(ref_x)
+    y = pyDive.array(ref_y, distaxes=0)
+    w = pyDive.array(ref_w)
+
+    counts, edges = pyDive.histogram(x, bins=20)
+    ref_counts, ref_edges = np.histogram(ref_x, bins=20)
+    assert np.array_equal(counts, ref_counts) and np.allclose(edges, ref_edges)
+
+    counts, edges = pyDive.histogram(x, bins=10, range=(-1, 1), weights=w, density=True)
+    assert np.allclose(counts, np.histogram(ref_x, bins=10, range=(-1, 1), weights=ref_w, density=True)[0])
+
+    particles = pyDive.structured({"position" : {"x" : x, "y" : y.dist_like(x)}, "weighting" : w})
+    counts, edges = pyDive.histogramdd(particles, bins=(8, 5), fields=("position/y", "position/x"), weights="weighting")
+    ref_counts, ref_edges = np.histogramdd((ref_y.ravel(), ref_x.ravel()), bins=(8, 5), weights=ref_w.ravel())
+    assert np.allclose(counts, ref_counts)
+    assert all(np.allclose(e, ref_e) for e, ref_e in zip(edges, ref_edges))
+
+    counts, edges = pyDive.histogramdd([x, y], bins=4, range=[(-2, 2), None], allreduce=True)
+    assert np.allclose(counts.merge(np.maximum), np.histogramdd((ref_x.ravel(), ref_y.ravel()), bins=4, range=[(-2, 2),\
+        (ref_y.min(), ref_y.max())])[0])
+
+def test_sorting(init_pyDive):
+    ref = np.random.randint(0, 50, size=(30, 17)).astype(np.float64)
+    test_array = pyDive.array(ref)
+
+    test_sorted = pyDive.sorting.sort(test_array)
+    assert test_sorted.shape == (ref.size,) and test_sorted.distaxes == (0,)
+    assert np.array_equal(test_sorted.gather(), np.sort(ref, axis=None))
+
+    test_indices = pyDive.sorting.argsort(test_array)
+    assert np.array_equal(ref.flat[test_indices.gather()], np.sort(ref, axis=None))
+
+    ref_unique, ref_inverse = np.unique(ref, return_inverse=True)
+    ref_counts = np.bincount(ref_inverse)
+    test_unique, test_counts = pyDive.sorting.unique(test_array, return_counts=True)
+    assert np.array_equal(test_unique.gather(), ref_unique)
+    assert np.array_equal(test_counts.gather(), ref_counts)
+
+    with pyDive.futures.nonblocking():
+        test_unique = pyDive.sorting.unique(test_array)
+    assert np.array_equal(test_unique.gather(), ref_unique)
+
+    ref = np.random.rand(1000)
+    assert np.array_equal(pyDive.sorting.sort(pyDive.array(ref)).gather(), np.sort(ref))
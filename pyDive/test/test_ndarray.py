@@ -175,4 +175,398 @@ def test_misc(init_pyDive):
         do_funny_stuff(pd_a, pd_b)
 
         assert np.array_equal(pd_a, np_a)
-        assert np.array_equal(pd_b, np_b)
\ No newline at end of file
+        assert np.array_equal(pd_b, np_b)
+
+def test_lazy(init_pyDive):
+    sizes = ((10,20,30), (64,), (13,29,37))
+
+    for size in sizes:
+        np_a = np.random.rand(*size)
+        np_b = np.random.rand(*size)
+        np_c = (np.random.rand(*size) * 100.0).astype(np.int)
+
+        pd_a = pyDive.array(np_a)
+        pd_b = pyDive.array(np_b, distaxes=0)
+        pd_c = pyDive.array(np_c)
+
+        with pyDive.lazy():
+            pd_d = pd_a * pd_b + pd_c**2 - pyDive.sin(pd_a)
+        np_d = np_a * np_b + np_c**2 - np.sin(np_a)
+
+        assert pd_d.dtype == np_d.dtype
+        assert np.allclose(pd_d.evaluate().gather(), np_d)
+
+        with pyDive.lazy():
+            pd_a[:] = 2.0 * pd_b - pd_c
+            pd_a += pd_b
+        np_a[:] = 2.0 * np_b - np_c
+        np_a += np_b
+
+        assert np.allclose(pd_a.gather(), np_a)
+
+def test_lazy_overlap(init_pyDive):
+    from pyDive.distribution import expression
+    # local arrays are larger than a block of the block-wise evaluation
+    np_a = np.random.rand(expression.block_bytes // 32, 64)
+    pd_a = pyDive.array(np_a, distaxes=1)
+
+    with pyDive.lazy():
+        pd_b = pd_a[1:, :]
+        pd_b[:] = pd_a[:-1, :] * 2.0
+    np_a[1:] = np_a[:-1] * 2.0
+
+    assert np.array_equal(pd_a.gather(), np_a)
+
+def test_dtype_inference(init_pyDive):
+    from pyDive.distribution import multiple_axes
+    multiple_axes.verify_dtypes = True
+
+    try:
+        for dtype in (np.int8, np.int32, np.float32, np.float64, np.bool_):
+            a = pyDive.ones((8, 8), dtype=dtype)
+            for b in (a, 1, 300, 2.5, pyDive.ones((8, 8), dtype=np.float32)):
+                a + b
+                a * b
+                a > b
+            pyDive.sqrt(a)
+            pyDive.absolute(a)
+    finally:
+        multiple_axes.verify_dtypes = False
+
+def test_deferred_free(init_pyDive):
+    from pyDive import IPParallelClient as com
+    from IPython.parallel import interactive
+    view = com.getView()
+    num_remote_arrays = interactive(lambda: len([k for k in globals() if k.startswith("dist_array")]))
+    count_arrays = lambda: sum(view.apply_sync(num_remote_arrays))
+
+    a = pyDive.array(np.arange(100))
+    com.flush_free_list()
+    num_arrays = count_arrays()
+
+    for i in range(3 * com.free_threshold):
+        b = a[i % 10:] + 1
+
+    assert len(com.free_list) < com.free_threshold
+    assert np.array_equal(b.gather(), np.arange(100)[(3 * com.free_threshold - 1) % 10:] + 1)
+
+    del b
+    com.flush_free_list()
+    assert count_arrays() == num_arrays
+
+def test_slicing_plan_cache(init_pyDive):
+    from pyDive.distribution import multiple_axes
+
+    np_a = np.arange(64*64).reshape(64, 64)
+    a = pyDive.array(np_a)
+    b = pyDive.array(np_a + 1)
+
+    slices = [(slice(3, 50, 2), slice(None)), (5, slice(1, 60, 3)), (slice(10, 11), 7)]
+    for s in slices:
+        assert np.array_equal(a[s].gather(), np_a[s])
+    num_plans = len(multiple_axes.slicing_plans)
+
+    # same distribution: plans are reused
+    for i in range(3):
+        for s in slices:
+            assert np.array_equal(a[s].gather(), np_a[s])
+            assert np.array_equal(b[s].gather(), np_a[s] + 1)
+    assert len(multiple_axes.slicing_plans) == num_plans
+
+    # eviction
+    maxsize = multiple_axes.slicing_plans.maxsize
+    multiple_axes.slicing_plans.maxsize = 2
+    try:
+        for i in range(5):
+            assert np.array_equal(a[i:, :].gather(), np_a[i:, :])
+        assert len(multiple_axes.slicing_plans) == 2
+        assert np.array_equal(a[0:, :].gather(), np_a[0:, :])
+    finally:
+        multiple_axes.slicing_plans.maxsize = maxsize
+
+def test_gather_mpi(init_pyDive):
+    for size in sizes:
+        ref_array = np.random.rand(*size)
+        test_array = pyDive.array(ref_array)
+
+        assert np.array_equal(ref_array, test_array.gather(mode='mpi'))
+
+        out = np.empty(size)
+        assert test_array.gather(out=out, mode='mpi') is out
+        assert np.array_equal(ref_array, out)
+
+        out = np.empty(size)
+        assert test_array.gather(out=out) is out
+        assert np.array_equal(ref_array, out)
+
+def test_shm(init_pyDive):
+    from pyDive.distribution import shm
+    threshold = shm.threshold
+    shm.threshold = 1
+
+    try:
+        for size in sizes:
+            ref_array = np.random.rand(*size)
+            test_array = pyDive.array(ref_array)
+
+            assert np.array_equal(ref_array, test_array.gather())
+            assert np.array_equal(ref_array, test_array.gather(mode='pull'))
+
+            out = np.empty(size)
+            assert test_array.gather(out=out) is out
+            assert np.array_equal(ref_array, out)
+
+        # transfers not fitting into the free space fall back to pulling
+        test_array = pyDive.array(np.random.rand(64))
+        assert not shm.available(test_array.target_ranks, shm.free_bytes() + 1)
+    finally:
+        shm.threshold = threshold
+
+def test_decomposition(init_pyDive):
+    num_targets = len(pyDive.IPParallelClient.getView().targets)
+
+    for shape in ((64, 64, 64), (1000, 7), (5, 300)):
+        ref = np.random.rand(*shape)
+        for planner in ("cost", "cubic"):
+            test_array = pyDive.array(ref, planner=planner)
+            assert len(test_array.grid) == len(test_array.distaxes)
+            assert np.prod(test_array.grid) <= num_targets
+            assert np.array_equal(test_array.gather(), ref)
+
+    # the last axis stays contiguous if there are enough slabs along the first one
+    a = pyDive.zeros((num_targets * 16, 32, 32))
+    assert a.grid == (num_targets, 1, 1)
+
+    planner = lambda shape, distaxes, num_targets, itemsize: (1,) * (len(distaxes) - 1) + (num_targets,)
+    a = pyDive.zeros((8, num_targets * 4), planner=planner)
+    assert a.grid == (1, num_targets)
+
+def test_rebalance(init_pyDive):
+    num_targets = len(pyDive.IPParallelClient.getView().targets)
+    ref = np.random.rand(100 * num_targets)
+    ref[:len(ref)//2] = 0.0
+    test_array = pyDive.array(ref, distaxes=0)
+
+    masked = test_array[test_array > 0.5]
+    assert np.array_equal(masked.gather(), ref[ref > 0.5])
+    # engines without selected elements do not keep empty local arrays
+    view = pyDive.IPParallelClient.getView()
+    dropped = [target for target in test_array.target_ranks if target not in masked.target_ranks]
+    if dropped:
+        view.execute("kept = '%s' in globals()" % masked.name, targets=dropped)
+        assert not any(view.pull("kept", targets=dropped, block=True))
+    assert test_array[test_array > 2.0].gather().shape == (0,)
+
+    balanced = masked.rebalance()
+    sizes = [shape[0] for shape in balanced.target_shapes()]
+    assert max(sizes) - min(sizes) <= 1
+    assert np.array_equal(balanced.gather(), ref[ref > 0.5])
+
+    subset = test_array.rebalance(targets=test_array.target_ranks[:2])
+    assert len(subset.target_ranks) == min(2, num_targets)
+    assert np.array_equal(subset.gather(), ref)
+
+    pyDive.distribution.multiple_axes.auto_rebalance = True
+    try:
+        masked = test_array[test_array > 0.5]
+    finally:
+        pyDive.distribution.multiple_axes.auto_rebalance = False
+    assert len(masked.target_ranks) == len(test_array.target_ranks)
+    assert np.array_equal(masked.gather(), ref[ref > 0.5])
+
+    ref2d = np.random.rand(7, 13)
+    test_array = pyDive.array(ref2d, distaxes=1)
+    assert np.array_equal(test_array.rebalance().gather(), ref2d)
+
+def test_redistribution_cache(init_pyDive):
+    view = pyDive.IPParallelClient.getView()
+    redistributions = pyDive.distribution.multiple_axes.redistributions
+
+    ref = np.random.rand(32, 24)
+    a = pyDive.array(ref, distaxes=0)
+    b = pyDive.array(ref, distaxes=1)
+
+    num_msgs = len(view.history)
+    c = b.dist_like(a)
+    first_msgs = len(view.history) - num_msgs
+    assert np.array_equal(c.gather(), ref)
+
+    # a cached redistribution skips the transfer of the schedule
+    num_schedules = len(redistributions)
+    num_msgs = len(view.history)
+    d = b.dist_like(a)
+    assert len(view.history) - num_msgs < first_msgs
+    assert len(redistributions) == num_schedules
+    assert np.array_equal(d.gather(), ref)
+    assert np.array_equal((a + b).gather(), 2 * ref)
+
+def test_dist_like_dtypes(init_pyDive):
+    for dtype in (np.int8, np.complex128, np.dtype([("x", np.float32), ("y", np.int16)])):
+        ref = np.zeros((17, 9, 5), dtype=dtype)
+        ref.view(np.uint8)[...] = np.random.randint(0, 256, size=ref.view(np.uint8).shape)
+        a = pyDive.array(ref, distaxes=(0, 2))
+        b = pyDive.array(ref, distaxes=1)
+        assert np.array_equal(a.dist_like(b).gather().view(np.uint8), ref.view(np.uint8))
+        assert np.array_equal(b.dist_like(a).gather().view(np.uint8), ref.view(np.uint8))
+
+def test_roll_shift_pad(init_pyDive):
+    ref = np.random.rand(13, 10, 7)
+
+    for distaxes in ('all', 0, (1, 2)):
+        test_array = pyDive.array(ref, distaxes=distaxes)
+
+        for shift, axis in ((3, 0), (-4, 1), (25, 2), ((2, -1), (0, 2))):
+            test_result = test_array.roll(shift, axis)
+            assert test_result.is_distributed_like(test_array)
+            assert np.array_equal(test_result.gather(), np.roll(ref, shift, axis))
+
+        ref_shifted = np.zeros_like(ref)
+        ref_shifted[2:] = ref[:-2]
+        assert np.array_equal(test_array.shift(2, 0).gather(), ref_shifted)
+        ref_shifted = np.full_like(ref, -1.0)
+        ref_shifted[:, :, :-3] = ref[:, :, 3:]
+        assert np.array_equal(test_array.shift(-3, 2, fill_value=-1.0).gather(), ref_shifted)
+
+        for pad_width in (2, (1, 3), ((0, 1), (2, 2), (3, 0))):
+            for mode in ("constant", "edge", "wrap"):
+                test_result = test_array.pad(pad_width, mode)
+                assert np.array_equal(test_result.gather(), np.pad(ref, pad_width, mode))
+
+def test_transpose(init_pyDive):
+    ref = np.random.rand(9, 14, 6)
+
+    for distaxes in ('all', 0, (0, 2)):
+        test_array = pyDive.array(ref, distaxes=distaxes)
+
+        assert np.array_equal(test_array.T.gather(), ref.T)
+        assert np.array_equal(test_array.transpose(1, 2, 0).gather(), ref.transpose(1, 2, 0))
+        assert np.array_equal(test_array.swapaxes(0, -1).gather(), ref.swapaxes(0, -1))
+        assert np.array_equal(test_array.moveaxis(0, -1).gather(), np.moveaxis(ref, 0, -1))
+
+        test_result = test_array.transpose((2, 0, 1), distaxes=0)
+        assert test_result.distaxes == (0,)
+        assert np.array_equal(test_result.gather(), ref.transpose(2, 0, 1))
+        assert np.array_equal((test_result + test_array.transpose(2, 0, 1)).gather(), 2 * ref.transpose(2, 0, 1))
+
+def test_integer_array_indexing(init_pyDive):
+    ref = np.random.rand(13, 9, 7)
+    test_array = pyDive.array(ref)
+
+    flat = np.random.randint(-ref.size, ref.size, size=50)
+    assert np.array_equal(test_array.take(flat), ref.take(flat))
+    assert np.array_equal(test_array.take(flat.reshape(5, 10)), ref.take(flat.reshape(5, 10)))
+
+    i, j, k = [np.random.randint(0, s, size=(4, 6)) for s in ref.shape]
+    assert np.array_equal(test_array[i, j, k], ref[i, j, k])
+    assert np.array_equal(test_array[i, 3, -k], ref[i, 3, -k])
+
+    # distributed indices
+    test_flat = pyDive.array(flat)
+    test_result = test_array.take(test_flat)
+    assert test_result.is_distributed_like(test_flat)
+    assert np.array_equal(test_result.gather(), ref.take(flat))
+    test_i, test_k = pyDive.array(i), pyDive.array(k, distaxes=1)
+    assert np.array_equal(test_array[test_i, 2, test_k].gather(), ref[i, 2, k])
+    # local and distributed indices mixed
+    assert np.array_equal(test_array[i, 2, test_k].gather(), ref[i, 2, k])
+    assert np.array_equal(test_array[i[0], pyDive.array(j), test_k].gather(), ref[i[0], j, k])
+
+    # assignment
+    i, j, k = [np.random.permutation(s)[:5] for s in ref.shape]
+    ref[i, j, k] = np.arange(5)
+    test_array[i, j, k] = np.arange(5)
+    assert np.array_equal(test_array.gather(), ref)
+
+    ref[i, 0, k] = -1.0
+    test_array[pyDive.array(i), 0, pyDive.array(k)] = -1.0
+    assert np.array_equal(test_array.gather(), ref)
+
+    ref[i, 1, k] = 2 * np.arange(5)
+    test_array[pyDive.array(i), 1, pyDive.array(k)] = pyDive.array(2 * np.arange(5))
+    assert np.array_equal(test_array.gather(), ref)
+
+    ref[i, 0, k] = 3 * np.arange(5)
+    test_array[pyDive.array(i), 0, k] = 3 * np.arange(5)
+    assert np.array_equal(test_array.gather(), ref)
+
+def test_points(init_pyDive):
+    ref = np.random.rand(11, 8, 6)
+    test_array = pyDive.array(ref)
+
+    points = np.column_stack([np.random.randint(-s, s, size=200) for s in ref.shape])
+    assert np.array_equal(test_array.get_points(points), ref[tuple(points.T)])
+    assert test_array.get_points(np.empty((0, 3), dtype=int)).shape == (0,)
+
+    values = np.random.rand(len(points))
+    test_array.set_points(points, values)
+    ref[tuple(points.T)] = values
+    assert np.array_equal(test_array.gather(), ref)
+
+    test_array.set_points([[0, -1, 2], [-1, 0, 0]], 7.0)
+    ref[0, -1, 2] = ref[-1, 0, 0] = 7.0
+    assert np.array_equal(test_array.gather(), ref)
+
+    # scalar access with negative indices
+    test_array[-2, 3, -1] = 5.0
+    ref[-2, 3, -1] = 5.0
+    assert test_array[-2, 3, -1] == 5.0
+    assert np.array_equal(test_array.gather(), ref)
+
+def test_local_copy_cache(init_pyDive):
+    from pyDive.distribution import multiple_axes
+    ref = np.random.rand(20, 10)
+    test_array = pyDive.array(ref)
+
+    assert test_array.sum() == ref.sum() # gathers a local copy
+    assert test_array.local_copy is test_array.local_copy
+
+    # writes through a slice invalidate the local copy of the array
+    test_slice = test_array[2:8, ::2]
+    test_slice[:] = 1.0
+    ref[2:8, ::2] = 1.0
+    assert np.array_equal(test_array.local_copy, ref)
+
+    pyDive.map(lambda a: a.fill(3.0), test_array.T)
+    assert np.all(test_array.local_copy == 3.0)
+
+    test_array += 1.0
+    assert np.all(test_array.local_copy == 4.0)
+
+    # byte budget
+    budget = multiple_axes.local_copy_bytes
+    try:
+        multiple_axes.local_copy_bytes = test_array.nbytes
+        other = pyDive.ones_like(test_array)
+        test_array.local_copy, other.local_copy
+        assert multiple_axes.local_copies.nbytes <= test_array.nbytes
+        assert other.name in multiple_axes.local_copies and test_array.name not in multiple_axes.local_copies
+    finally:
+        multiple_axes.local_copy_bytes = budget
+
+def test_iter_gather(init_pyDive):
+    import os, tempfile
+    from pyDive.distribution import multiple_axes
+    ref = np.random.rand(12, 37, 5)
+    test_array = pyDive.array(ref, distaxes=(0, 1))
+    num_plans = len(multiple_axes.slicing_plans)
+
+    for order in ((0, 1, 2), (2, 0, 1)):
+        for prefetch in (True, False):
+            result = np.zeros_like(ref)
+            max_bytes = 3 * 7 * 5 * ref.itemsize
+            for window, block in test_array.iter_gather(max_bytes, order, prefetch):
+                assert block.nbytes <= max_bytes // 3
+                assert np.all(result[window] == 0.0)
+                result[window] = block
+            assert np.array_equal(result, ref)
+    # blocks are pulled without slicing plans
+    assert len(multiple_axes.slicing_plans) == num_plans
+
+    handle, filename = tempfile.mkstemp(suffix=".npy")
+    os.close(handle)
+    try:
+        mapped = test_array.gather_to(filename, max_bytes=1000)
+        assert np.array_equal(mapped, ref)
+        assert np.array_equal(np.load(filename), ref)
+    finally:
+        os.remove(filename)